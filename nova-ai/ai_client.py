@@ -1,20 +1,13 @@
 from __future__ import annotations
 
 import os
-import sys
 import base64
 from pathlib import Path
 from typing import Optional
 
-def _debug(msg: str) -> None:
-    if sys.stderr is not None:
-        try:
-            sys.stderr.write(msg + "\n")
-            sys.stderr.flush()
-        except Exception:
-            # Windowed executables may not have a writable stderr handle.
-            pass
-
+from debug_log import get_logger
+from ocr_context import OCR_CONTEXT_TOKEN_BUDGET, format_ocr_context
+from ocr_pipeline import MAX_IMAGE_DIM as OCR_MAX_IMAGE_DIM, ImageInput, PreparedImage
 from prompt_loader import get_image_instructions_prompt
 from backend.oauth_desktop import get_stored_user
 from backend.firebase_profile import (
@@ -24,10 +17,16 @@ from backend.firebase_profile import (
     get_plan_limit,
 )
 
+_log = get_logger("AI Debug")
 
 MAX_IMAGE_DIM = 2048  # Higher cap to improve recognition
 
 
+def _has_image(image: Optional[ImageInput]) -> bool:
+    # "" (no path) means text-only, as before in-memory images were accepted.
+    return image is not None and not (isinstance(image, str) and not image)
+
+
 SYSTEM_PROMPT = """
 You are generating a minimal Python script for HWP automation.
 Use ONLY the following functions:
@@ -180,7 +179,35 @@ class AIClient:
         except Exception:
             return None
 
-    def generate_script(self, prompt: str, image_path: Optional[str] = None) -> str:
+    @staticmethod
+    def _image_for_upload(image: ImageInput):  # type: ignore[no-untyped-def]
+        """
+        PIL image capped at MAX_IMAGE_DIM from a path, PIL image, numpy array
+        (e.g. a crop view) or PreparedImage; in-memory inputs are not re-encoded.
+        """
+        from PIL import Image  # type: ignore[import-not-found]
+
+        prepared = PreparedImage.from_any(image)
+        if OCR_MAX_IMAGE_DIM == MAX_IMAGE_DIM:
+            # Same LANCZOS cap as the OCR input; reuse it when OCR already made it.
+            return prepared.ocr_image()
+        image = prepared.original
+        max_dim = max(image.size)
+        if max_dim > MAX_IMAGE_DIM:
+            scale = MAX_IMAGE_DIM / max_dim
+            new_size = (int(image.size[0] * scale), int(image.size[1] * scale))
+            image = image.resize(new_size, Image.LANCZOS)
+        return image
+
+    def generate_script(
+        self, prompt: str, image_path: Optional[ImageInput] = None, *, image: Optional[ImageInput] = None
+    ) -> str:
+        """
+        `image` (or the older `image_path`) may be a path or an in-memory image;
+        see _image_for_upload.
+        """
+        if image is None:
+            image = image_path
         if not prompt.strip():
             return ""
 
@@ -189,16 +216,8 @@ class AIClient:
 
         try:
             model = self._genai.GenerativeModel(self.model)
-            if image_path:
-                from PIL import Image  # type: ignore[import-not-found]
-
-                image = Image.open(image_path).convert("RGB")
-                max_dim = max(image.size)
-                if max_dim > MAX_IMAGE_DIM:
-                    scale = MAX_IMAGE_DIM / max_dim
-                    new_size = (int(image.size[0] * scale), int(image.size[1] * scale))
-                    image = image.resize(new_size, Image.LANCZOS)
-                response = model.generate_content([prompt, image])
+            if _has_image(image):
+                response = model.generate_content([prompt, self._image_for_upload(image)])
             else:
                 response = model.generate_content(prompt)
             
@@ -216,35 +235,35 @@ class AIClient:
                                 if hasattr(part, "text"):
                                     result_text += part.text
             except Exception as text_err:
-                _debug(f"[AI Debug] 응답 텍스트 추출 실패: {text_err}")
+                _log.warning("응답 텍스트 추출 실패: %s", text_err)
                 # 차단 사유 확인
                 if hasattr(response, "prompt_feedback"):
-                    _debug(f"[AI Debug] Prompt feedback: {response.prompt_feedback}")
+                    _log.debug("Prompt feedback: %s", response.prompt_feedback)
                 if hasattr(response, "candidates") and response.candidates:
                     for i, c in enumerate(response.candidates):
                         if hasattr(c, "finish_reason"):
-                            _debug(f"[AI Debug] Candidate {i} finish_reason: {c.finish_reason}")
+                            _log.debug("Candidate %d finish_reason: %s", i, c.finish_reason)
                         if hasattr(c, "safety_ratings"):
-                            _debug(f"[AI Debug] Candidate {i} safety_ratings: {c.safety_ratings}")
+                            _log.debug("Candidate %d safety_ratings: %s", i, c.safety_ratings)
                 result_text = ""
             
         except AIClientError:
             raise
         except Exception as exc:
-            _debug(f"[AI Debug] generate_content 예외: {exc}")
+            _log.warning("generate_content 예외: %s", exc)
             raise AIClientError(str(exc)) from exc
 
         if not result_text.strip():
             # 빈 결과일 때 디버그 정보 출력
-            _debug(f"[AI Debug] 빈 응답 받음")
+            _log.warning("빈 응답 받음")
             if hasattr(response, "prompt_feedback"):
-                _debug(f"[AI Debug] Prompt feedback: {response.prompt_feedback}")
+                _log.debug("Prompt feedback: %s", response.prompt_feedback)
             if hasattr(response, "candidates") and response.candidates:
                 for i, c in enumerate(response.candidates):
                     if hasattr(c, "finish_reason"):
-                        _debug(f"[AI Debug] Candidate {i} finish_reason: {c.finish_reason}")
+                        _log.debug("Candidate %d finish_reason: %s", i, c.finish_reason)
                     if hasattr(c, "safety_ratings"):
-                        _debug(f"[AI Debug] Candidate {i} safety_ratings: {c.safety_ratings}")
+                        _log.debug("Candidate %d safety_ratings: %s", i, c.safety_ratings)
             return ""
         
         # 성공 시 사용량 기록
@@ -255,19 +274,23 @@ class AIClient:
     def build_prompt(
         self,
         description: str,
-        image_path: Optional[str] = None,
+        image_path: Optional[ImageInput] = None,
         ocr_text: str = "",
+        ocr_token_budget: int = OCR_CONTEXT_TOKEN_BUDGET,
     ) -> str:
         parts = [SYSTEM_PROMPT]
-        if image_path:
+        if _has_image(image_path):
             instructions = get_image_instructions_prompt()
             if instructions:
                 parts.append(instructions)
-        if ocr_text:
+        # Raw Tesseract output is normalized, de-duplicated and budgeted so
+        # every split call carries only compact context.
+        ocr_context = format_ocr_context(ocr_text, max_tokens=ocr_token_budget) if ocr_text else ""
+        if ocr_context:
             parts.append(
                 "OCR extracted text (use this to improve accuracy; "
                 "verify with the image and fix obvious OCR errors):\n"
-                f"{ocr_text}"
+                f"{ocr_context}"
             )
         if description:
             parts.append(f"User request: {description}")
@@ -276,7 +299,7 @@ class AIClient:
         return "\n\n".join(parts)
 
     def generate_script_for_image(
-        self, image_path: str, description: str = "", ocr_text: str = ""
+        self, image: ImageInput, description: str = "", ocr_text: str = ""
     ) -> str:
-        prompt = self.build_prompt(description, image_path=image_path, ocr_text=ocr_text)
-        return self.generate_script(prompt, image_path=image_path)
+        prompt = self.build_prompt(description, image_path=image, ocr_text=ocr_text)
+        return self.generate_script(prompt, image=image)
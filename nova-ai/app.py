@@ -14,6 +14,7 @@ if __package__ in (None, ""):
 
 from ai_client import AIClient, AIClientError
 from hwp_controller import HwpController, HwpControllerError
+from script_profile import ScriptProfiler
 from script_runner import ScriptRunner
 
 
@@ -70,6 +71,7 @@ def cmd_insert_text(args: argparse.Namespace) -> int:
     controller.insert_text(args.text)
     if args.paragraph:
         controller.insert_enter()
+    controller.flush()
     return 0
 
 
@@ -94,11 +96,35 @@ def cmd_insert_equation(args: argparse.Namespace) -> int:
     return 0
 
 
+def _report_profile(profiler: ScriptProfiler | None, path: str | None) -> None:
+    if profiler is None or not path:
+        return
+    print(profiler.table())
+    profiler.write_chrome_trace(path)
+    print(f"프로파일 저장: {path} (chrome://tracing 또는 Perfetto에서 열기)")
+
+
 def cmd_run_script(args: argparse.Namespace) -> int:
+    script = _read_file(Path(args.file))
+    profiler = ScriptProfiler() if args.profile else None
+    if args.dry_run:
+        from hwp_recorder import RecordingHwpController
+
+        recorder = RecordingHwpController(com_latency_ms=args.com_latency_ms)
+        ScriptRunner(recorder).run(script, log=print, timings=profiler)
+        for index, op in enumerate(recorder.ops, 1):
+            print(f"{index:5d} {op.describe()}")
+        summary = recorder.summary()
+        print(
+            f"드라이런: 호출 {summary['ops']}개, COM 왕복 {summary['com_round_trips']}회, "
+            f"InsertText {summary['insert_text']}회, 예상 {summary['simulated_ms']:.1f}ms"
+        )
+        _report_profile(profiler, args.profile)
+        return 0
     controller = _connect_controller()
     runner = ScriptRunner(controller)
-    script = _read_file(Path(args.file))
-    runner.run(script, log=print)
+    runner.run(script, log=print, timings=profiler)
+    _report_profile(profiler, args.profile)
     return 0
 
 
@@ -140,6 +166,36 @@ def cmd_ai_run(args: argparse.Namespace) -> int:
     return 0
 
 
+def cmd_layout_batch(args: argparse.Namespace) -> int:
+    from layout_batch import iter_images, run_batch
+    from layout_cache import default_cache_dir
+
+    images = (path for source in args.inputs for path in iter_images(source, recursive=args.recursive))
+
+    def _progress(record: dict) -> None:
+        if args.quiet:
+            return
+        if record.get("error"):
+            print(f"실패: {record['image']} ({record['error']})")
+        else:
+            print(f"{record.get('template') or '-'}\t{record['image']}")
+
+    summary = run_batch(
+        images,
+        Path(args.output),
+        workers=args.workers,
+        mode=args.mode,
+        resume=not args.no_resume,
+        cache_dir=None if args.no_cache else (Path(args.cache_dir) if args.cache_dir else default_cache_dir()),
+        on_record=_progress,
+    )
+    print(
+        f"완료: 처리 {summary.processed}, 실패 {summary.failed}, "
+        f"건너뜀 {summary.skipped} ({summary.elapsed_s:.1f}s) -> {args.output}"
+    )
+    return 1 if summary.failed else 0
+
+
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="LitePro - minimal HWP automation")
     subparsers = parser.add_subparsers(dest="command", required=True)
@@ -182,6 +238,9 @@ def build_parser() -> argparse.ArgumentParser:
 
     run_script = subparsers.add_parser("run-script", help="스크립트 실행")
     run_script.add_argument("--file", required=True, help="파이썬 스크립트 경로")
+    run_script.add_argument("--dry-run", action="store_true", help="HWP 없이 기록용 컨트롤러로 실행하고 호출 로그 출력")
+    run_script.add_argument("--com-latency-ms", type=float, default=0.0, help="드라이런에서 COM 왕복 1회당 가정할 지연 (ms)")
+    run_script.add_argument("--profile", metavar="TRACE_JSON", help="단계/호출별 시간 표를 출력하고 Chrome trace JSON으로 저장")
     run_script.set_defaults(func=cmd_run_script)
 
     ai_gen = subparsers.add_parser("ai-generate", help="AI로 스크립트 생성")
@@ -195,6 +254,18 @@ def build_parser() -> argparse.ArgumentParser:
     ai_run.add_argument("--model", default="gemini-3-flash-preview")
     ai_run.set_defaults(func=cmd_ai_run)
 
+    layout_batch = subparsers.add_parser("layout-batch", help="이미지 폴더/글롭 일괄 박스 검출 (JSONL)")
+    layout_batch.add_argument("inputs", nargs="+", help="이미지 디렉터리, 파일 또는 글롭 패턴")
+    layout_batch.add_argument("--output", required=True, help="결과 JSONL 경로 (이미 있으면 이어서 처리)")
+    layout_batch.add_argument("--workers", type=int, help="프로세스 수 (기본: CPU 수, 1이면 단일 프로세스)")
+    layout_batch.add_argument("--mode", choices=["full", "pyramid"], help="검출 방식 (기본: NOVA_AI_LAYOUT_MODE)")
+    layout_batch.add_argument("--recursive", action="store_true", help="하위 디렉터리까지 탐색")
+    layout_batch.add_argument("--no-resume", action="store_true", help="기존 결과를 무시하고 새로 작성")
+    layout_batch.add_argument("--cache-dir", help="레이아웃 캐시 위치 (기본: NOVA_AI_LAYOUT_CACHE 또는 사용자 캐시 폴더)")
+    layout_batch.add_argument("--no-cache", action="store_true", help="레이아웃 캐시를 쓰지 않음")
+    layout_batch.add_argument("--quiet", action="store_true", help="이미지별 진행 출력 생략")
+    layout_batch.set_defaults(func=cmd_layout_batch)
+
     return parser
 
 
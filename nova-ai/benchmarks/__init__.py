@@ -0,0 +1 @@
+"""Offline benchmarks for Nova AI Lite (run with `python -m benchmarks.<name>`)."""
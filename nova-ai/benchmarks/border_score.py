@@ -0,0 +1,112 @@
+"""
+Micro-benchmark: per-rect border scoring vs the summed-area-table version.
+
+Builds the grid edge map of a synthetic page (optionally with speckle noise,
+which is what produces hundreds of contours on real scans), draws N random
+candidate rects and times `_border_score_on_rect` in a loop against
+`border_scores` (including the integral-image build). Results are checked for
+equality and written as JSON.
+
+    python -m benchmarks.border_score --candidates 10 100 1000 5000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import environment, latency_summary
+from benchmarks.synthetic import BASE_WIDTH, generate_page
+from layout_detector import LayoutAnalysis, _border_score_on_rect, border_scores, edge_integral
+from ocr_pipeline import PreparedImage
+
+
+def _edge_map(width: int, noise: float, seed: int):  # type: ignore[no-untyped-def]
+    page = generate_page(seed, width=width, problems=3, noise=noise)
+    analysis = LayoutAnalysis(PreparedImage(path="<synthetic>", original=page.image))
+    return analysis.grid
+
+
+def _random_rects(count: int, w: int, h: int, rng: random.Random) -> list[tuple[int, int, int, int]]:
+    rects = []
+    for _ in range(count):
+        x = rng.randrange(0, w)
+        y = rng.randrange(0, h)
+        rects.append((x, y, rng.randrange(40, max(41, w - x + 1)), rng.randrange(20, max(21, h - y + 1))))
+    return rects
+
+
+def run(counts: list[int], *, width: int, noise: float, repeat: int, seed: int) -> dict:
+    import numpy as np  # type: ignore[import-not-found]
+
+    edges = _edge_map(width, noise, seed)
+    h, w = edges.shape[:2]
+    rng = random.Random(seed)
+    rows = []
+    for count in counts:
+        rects = _random_rects(count, w, h, rng)
+        loop_ms: list[float] = []
+        vector_ms: list[float] = []
+        lookup_ms: list[float] = []
+        reference = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            reference = [_border_score_on_rect(edges, r) for r in rects]
+            loop_ms.append((time.perf_counter() - started) * 1000.0)
+
+            started = time.perf_counter()
+            integral = edge_integral(edges)
+            built = time.perf_counter()
+            scores = border_scores(edges, rects, integral=integral)
+            done = time.perf_counter()
+            vector_ms.append((done - started) * 1000.0)
+            lookup_ms.append((done - built) * 1000.0)
+        max_diff = float(np.max(np.abs(np.asarray(reference) - scores))) if rects else 0.0
+        loop_p50 = latency_summary(loop_ms)["p50"]
+        vector_p50 = latency_summary(vector_ms)["p50"]
+        rows.append(
+            {
+                "candidates": count,
+                "per_rect_ms": latency_summary(loop_ms),
+                "integral_ms": latency_summary(vector_ms),
+                "integral_lookup_only_ms": latency_summary(lookup_ms),
+                "speedup_p50": round(loop_p50 / vector_p50, 2) if vector_p50 else None,
+                "max_abs_diff": max_diff,
+            }
+        )
+    return {
+        "env": environment(),
+        "edge_map": {"width": w, "height": h, "noise": noise},
+        "repeat": repeat,
+        "results": rows,
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Border scoring micro-benchmark")
+    parser.add_argument("--candidates", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--width", type=int, default=BASE_WIDTH)
+    parser.add_argument("--noise", type=float, default=0.01, help="합성 페이지 잡음 비율")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="결과 JSON 저장 경로 (기본: stdout)")
+    args = parser.parse_args(argv)
+
+    result = run(args.candidates, width=args.width, noise=args.noise, repeat=max(1, args.repeat), seed=args.seed)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,99 @@
+"""
+Answer-choice band detection on synthetic pages.
+
+For each page width, renders single-problem pages (clean and speckled), runs
+`detect_choices_band` and reports how often the band is usable (confidence at
+or above CHOICES_MIN_CONFIDENCE), how much of the rendered ①–⑤ row it covers,
+and the share of image pixels the choices call sends instead of the whole
+page.
+
+    python -m benchmarks.choices_band --count 20 --widths 1240 2480 4000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import environment, latency_summary
+from benchmarks.synthetic import generate_corpus, generate_page
+from layout_detector import CHOICES_MIN_CONFIDENCE, detect_choices_band, detect_container
+from ocr_pipeline import PreparedImage
+
+
+def _coverage(found, truth) -> float:  # type: ignore[no-untyped-def]
+    """Share of the rendered marker row (top 60% of the truth line box) inside `found`."""
+    ax0, ay0, aw, ah = found
+    bx0, by0, bw, bh = truth
+    bh = max(1, int(bh * 0.6))
+    ix = max(0, min(ax0 + aw, bx0 + bw) - max(ax0, bx0))
+    iy = max(0, min(ay0 + ah, by0 + bh) - max(ay0, by0))
+    return ix * iy / float(bw * bh)
+
+
+def run(widths: list[int], *, count: int, seed: int, noise: float) -> dict:
+    rows = []
+    for width in widths:
+        pages = generate_corpus(count, seed=seed, width=width, skew=0.0)
+        if noise > 0:
+            pages += [generate_page(p.seed, width=width, noise=noise) for p in pages]
+        latencies: list[float] = []
+        coverage: list[float] = []
+        sent: list[float] = []
+        usable = 0
+        for page in pages:
+            prepared = PreparedImage(path=f"<synthetic:{page.seed}>", original=page.image)
+            det = detect_container(prepared)
+            started = time.perf_counter()
+            band = detect_choices_band(prepared, exclude=det.rect)
+            latencies.append((time.perf_counter() - started) * 1000.0)
+            w, h = page.image.size
+            if band is None or band.confidence < CHOICES_MIN_CONFIDENCE:
+                sent.append(1.0)
+                continue
+            usable += 1
+            sent.append(band.rect[2] * band.rect[3] / float(w * h))
+            truth = page.problems[0].choices_rect
+            if truth is not None:
+                coverage.append(_coverage(band.rect, truth))
+        rows.append(
+            {
+                "width": width,
+                "pages": len(pages),
+                "latency_ms": latency_summary(latencies),
+                "usable_rate": round(usable / len(pages), 4) if pages else None,
+                "marker_row_coverage_mean": round(statistics.fmean(coverage), 4) if coverage else None,
+                "marker_row_coverage_min": round(min(coverage), 4) if coverage else None,
+                "pixels_sent_fraction_mean": round(statistics.fmean(sent), 4) if sent else None,
+            }
+        )
+    return {"env": environment(), "count": count, "seed": seed, "noise": noise, "results": rows}
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Answer-choice band detection on synthetic pages")
+    parser.add_argument("--count", type=int, default=20, help="폭마다 생성할 합성 페이지 수")
+    parser.add_argument("--widths", type=int, nargs="+", default=[1240, 2480, 4000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--noise", type=float, default=0.004, help="잡음 변형 페이지 비율 (0이면 생략)")
+    parser.add_argument("--output", help="결과 JSON 저장 경로 (기본: stdout)")
+    args = parser.parse_args(argv)
+
+    result = run(args.widths, count=args.count, seed=args.seed, noise=args.noise)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,80 @@
+"""
+COM round trips made by HwpController for the script corpus.
+
+Runs every `benchmarks/script_corpus` script through ScriptRunner and
+hwp_recorder.RecordingHwpController (the real controller logic on a fake HWP
+object). Each attribute read, attribute write and call on the fake counts as
+one COM round trip (what IDispatch costs against a live HWP). Runs once with
+write-combining off and once with it on, and checks that both type the same
+text.
+
+    python -m benchmarks.com_calls --output com.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Optional
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import environment
+from benchmarks.script_normalize import CORPUS, load_corpus
+from hwp_recorder import RecordingHwpController
+from script_runner import ScriptRunner
+
+
+def measure(script: str, *, combine_text: bool) -> RecordingHwpController:
+    controller = RecordingHwpController(combine_text=combine_text)
+    ScriptRunner(controller).run(script)
+    return controller
+
+
+def run(corpus: Path = CORPUS) -> dict:
+    rows = []
+    totals = {"off": 0, "on": 0, "insert_text_off": 0, "insert_text_on": 0}
+    for name, script in load_corpus(corpus):
+        off = measure(script, combine_text=False)
+        on = measure(script, combine_text=True)
+        rows.append(
+            {
+                "script": name,
+                "round_trips_off": off.com.round_trips,
+                "round_trips_on": on.com.round_trips,
+                "insert_text_off": off.com.insert_text,
+                "insert_text_on": on.com.insert_text,
+                "same_text": off.typed_text() == on.typed_text(),
+            }
+        )
+        totals["off"] += off.com.round_trips
+        totals["on"] += on.com.round_trips
+        totals["insert_text_off"] += off.com.insert_text
+        totals["insert_text_on"] += on.com.insert_text
+    return {
+        "environment": environment(),
+        "totals": totals,
+        "round_trip_reduction": round(1.0 - totals["on"] / totals["off"], 4) if totals["off"] else None,
+        "scripts": rows,
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="HwpController COM round-trip count")
+    parser.add_argument("--corpus", default=str(CORPUS), help="스크립트 코퍼스 디렉터리")
+    parser.add_argument("--output", help="결과 JSON 저장 경로 (기본: stdout)")
+    args = parser.parse_args(argv)
+
+    result = run(Path(args.corpus))
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
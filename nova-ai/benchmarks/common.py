@@ -0,0 +1,83 @@
+"""Shared helpers for the benchmark modules (statistics, environment metadata)."""
+from __future__ import annotations
+
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Optional
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def latency_summary(values: list[float]) -> dict[str, float]:
+    """mean / p50 / p90 / p95 / p99 / max of millisecond samples, rounded to µs."""
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(statistics.fmean(values), 3),
+        "p50": round(percentile(values, 0.50), 3),
+        "p90": round(percentile(values, 0.90), 3),
+        "p95": round(percentile(values, 0.95), 3),
+        "p99": round(percentile(values, 0.99), 3),
+        "max": round(max(values), 3),
+    }
+
+
+def peak_rss_kb() -> Optional[int]:
+    """Process memory high-water mark in KiB (None when the platform does not expose it)."""
+    try:
+        import resource  # type: ignore[import-not-found]
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS reports bytes, Linux KiB.
+        return int(peak // 1024) if sys.platform == "darwin" else int(peak)
+    except Exception:
+        pass
+    try:
+        import psutil  # type: ignore[import-not-found]
+
+        info = psutil.Process().memory_info()
+        return int(getattr(info, "peak_wset", info.rss) // 1024)
+    except Exception:
+        return None
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=str(Path(__file__).resolve().parent),
+            capture_output=True,
+            text=True,
+            timeout=5,
+        )
+    except Exception:
+        return None
+    return out.stdout.strip() or None
+
+
+def environment() -> dict:
+    info = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+    try:
+        import cv2  # type: ignore[import-not-found]
+
+        info["opencv"] = cv2.__version__
+    except Exception:
+        info["opencv"] = None
+    return info
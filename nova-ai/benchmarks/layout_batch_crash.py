@@ -0,0 +1,99 @@
+"""
+layout_batch.run_batch with worker processes that die.
+
+Images whose name contains "crash" kill the worker that runs them
+(os._exit, like the OOM killer would); every other image takes `DETECT_MS`
+and succeeds. Detection itself is not run, so no image files are needed.
+The batch is run twice on the same output (the second run resumes) and the
+result checks that:
+
+- only the crashing images have error records (`only_crashers_failed`), even
+  when healthy images were in flight on the pool a crash broke;
+- every image has exactly one record after the resume (`one_record_each`).
+
+    python -m benchmarks.layout_batch_crash --images 40 --workers 4 --crash 3 17 --output crash.json
+    python -m benchmarks.layout_batch_crash --check
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import environment
+from layout_batch import run_batch
+
+DETECT_MS = 5.0
+
+
+def crashing_detect(path: str, mode: object = None, cache_root: object = None) -> dict:
+    """detect_file stand-in; module level so spawned workers can import it."""
+    if "crash" in Path(path).name:
+        os._exit(1)
+    time.sleep(DETECT_MS / 1000.0)
+    return {"image": path, "template": None}
+
+
+def run(images: int, workers: int, crash: list[int]) -> dict:
+    names = [f"img{i:02d}{'_crash' if i in crash else ''}.png" for i in range(images)]
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        paths = [root / name for name in names]
+        output = root / "out.jsonl"
+        runs = []
+        for _ in range(2):
+            summary = run_batch(paths, output, workers=workers, detect=crashing_detect)
+            runs.append(
+                {
+                    "processed": summary.processed,
+                    "failed": summary.failed,
+                    "skipped": summary.skipped,
+                    "elapsed_s": summary.elapsed_s,
+                }
+            )
+        records = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    failed = sorted(Path(r["image"]).name for r in records if r.get("error"))
+    expected = sorted(name for name in names if "crash" in name)
+    return {
+        "environment": environment(),
+        "images": images,
+        "workers": workers,
+        "runs": runs,
+        "failed": failed,
+        "only_crashers_failed": failed == expected,
+        "one_record_each": len(records) == images == len({r["image"] for r in records}),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="layout_batch crashing-worker benchmark")
+    parser.add_argument("--images", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--crash", type=int, nargs="*", default=[3, 17], help="워커를 죽이는 이미지 번호")
+    parser.add_argument("--check", action="store_true", help="결과 조건만 확인 (실패 시 종료 코드 1)")
+    parser.add_argument("--output", help="결과 JSON 저장 경로 (기본: stdout)")
+    args = parser.parse_args(argv)
+
+    result = run(args.images, max(2, args.workers), args.crash)
+    if args.check:
+        ok = result["only_crashers_failed"] and result["one_record_each"]
+        print(f"{'ok' if ok else 'FAILED'}: failed={result['failed']} runs={result['runs']}")
+        return 0 if ok else 1
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
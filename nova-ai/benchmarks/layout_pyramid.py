@@ -0,0 +1,139 @@
+"""
+Accuracy/latency curves for pyramid rectangle detection.
+
+For each page width of the synthetic set, runs the full-resolution detector
+(`_detect_best_rectangle`, 2000px working copy) and the pyramid detector at
+several coarse levels, each on a fresh PreparedImage so every run pays for its
+own grayscale/threshold/morphology work. Reports latency percentiles, the
+found-rate, IoU and edge error against the rendered box, and agreement of the
+box/box_white decision with the full detector.
+
+    python -m benchmarks.layout_pyramid --count 20 --widths 1240 2480 4000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import environment, latency_summary
+from benchmarks.synthetic import generate_corpus
+from layout_detector import (
+    BOX_BORDER_MIN_SCORE,
+    LayoutAnalysis,
+    _detect_best_rectangle,
+    _detect_best_rectangle_pyramid,
+)
+from ocr_pipeline import PreparedImage
+
+DEFAULT_LEVELS = (250, 375, 500, 750, 1000)
+
+
+def _iou(a, b) -> float:  # type: ignore[no-untyped-def]
+    ax0, ay0, aw, ah = a
+    bx0, by0, bw, bh = b
+    ix = max(0, min(ax0 + aw, bx0 + bw) - max(ax0, bx0))
+    iy = max(0, min(ay0 + ah, by0 + bh) - max(ay0, by0))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / float(union) if union > 0 else 0.0
+
+
+def _edge_error(a, b) -> float:  # type: ignore[no-untyped-def]
+    ax0, ay0, aw, ah = a
+    bx0, by0, bw, bh = b
+    return max(abs(ax0 - bx0), abs(ay0 - by0), abs(ax0 + aw - bx0 - bw), abs(ay0 + ah - by0 - bh))
+
+
+def _template(rect, score: float) -> Optional[str]:  # type: ignore[no-untyped-def]
+    if rect is None:
+        return None
+    return "box.hwp" if score >= BOX_BORDER_MIN_SCORE else "box_white.hwp"
+
+
+def _run_level(pages, level: Optional[int], reference: list) -> tuple[dict, list]:  # type: ignore[no-untyped-def]
+    latencies: list[float] = []
+    ious: list[float] = []
+    edge_errors: list[float] = []
+    found = 0
+    expected = 0
+    agree = 0
+    outputs = []
+    for i, page in enumerate(pages):
+        prepared = PreparedImage(path=f"<synthetic:{page.seed}>", original=page.image)
+        started = time.perf_counter()
+        if level is None:
+            rect, score = _detect_best_rectangle(LayoutAnalysis.of(prepared))
+        else:
+            rect, score = _detect_best_rectangle_pyramid(LayoutAnalysis.of(prepared, level))
+        latencies.append((time.perf_counter() - started) * 1000.0)
+        outputs.append((rect, score))
+
+        truth = page.problems[0].box_rect if page.problems else None
+        if truth is not None:
+            expected += 1
+            if rect is not None:
+                found += 1
+                ious.append(_iou(rect, truth))
+                edge_errors.append(_edge_error(rect, truth))
+        if reference:
+            agree += int(_template(rect, score) == _template(*reference[i]))
+    row = {
+        "latency_ms": latency_summary(latencies),
+        "found_rate": round(found / expected, 4) if expected else None,
+        "iou_mean": round(statistics.fmean(ious), 4) if ious else None,
+        "iou_hit_0_9": round(sum(1 for v in ious if v >= 0.9) / expected, 4) if expected else None,
+        "edge_error_px_mean": round(statistics.fmean(edge_errors), 2) if edge_errors else None,
+        "template_agreement_with_full": round(agree / len(pages), 4) if reference and pages else None,
+    }
+    return row, outputs
+
+
+def run(widths: list[int], *, count: int, levels: list[int], seed: int, noise_pages: bool) -> dict:
+    curves = []
+    for width in widths:
+        pages = generate_corpus(count, seed=seed, width=width, skew=0.0)
+        if noise_pages:
+            # Every page also in a speckled variant (scanner noise).
+            from benchmarks.synthetic import generate_page
+
+            pages += [generate_page(p.seed, width=width, noise=0.004) for p in pages]
+        # Warm-up so the first measured run does not pay import/initialization costs.
+        _detect_best_rectangle(LayoutAnalysis.of(PreparedImage(path="<warm>", original=pages[0].image)))
+
+        full_row, reference = _run_level(pages, None, [])
+        rows = {"full": full_row}
+        for level in levels:
+            rows[f"pyramid_{level}"], _ = _run_level(pages, level, reference)
+        curves.append({"width": width, "pages": len(pages), "levels": rows})
+    return {"env": environment(), "count": count, "seed": seed, "curves": curves}
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Pyramid rectangle detection accuracy/latency curves")
+    parser.add_argument("--count", type=int, default=20, help="폭마다 생성할 합성 페이지 수")
+    parser.add_argument("--widths", type=int, nargs="+", default=[1240, 2480, 4000])
+    parser.add_argument("--levels", type=int, nargs="+", default=list(DEFAULT_LEVELS), help="coarse 단계 최대 변(px)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-noise", action="store_true", help="잡음 섞인 변형 페이지 생략")
+    parser.add_argument("--output", help="결과 JSON 저장 경로 (기본: stdout)")
+    args = parser.parse_args(argv)
+
+    result = run(args.widths, count=args.count, levels=args.levels, seed=args.seed, noise_pages=not args.no_noise)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
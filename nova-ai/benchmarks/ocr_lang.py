@@ -0,0 +1,133 @@
+"""
+Tesseract language-choice benchmark on a labeled corpus.
+
+Corpus layout: a directory with `labels.jsonl`, one record per image:
+
+    {"image": "p001.png", "text": "ground-truth text", "lang": "kor"}
+
+`lang` (the expected script) is optional and only used to score the detector.
+For every image the script runs OCR with `kor`, `eng`, `kor+eng` and the
+detector's choice (`auto`) and reports latency and character error rate per
+choice as JSON.
+
+    python -m benchmarks.ocr_lang --corpus path/to/corpus --output lang.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import percentile
+from ocr_pipeline import PreparedImage, detect_script, extract_text_from_pil_image, mask_regions
+
+CHOICES = ("kor", "eng", "kor+eng", "auto")
+
+
+def char_error_rate(reference: str, hypothesis: str) -> float:
+    """Levenshtein distance over non-whitespace characters, divided by reference length."""
+    ref = "".join(reference.split())
+    hyp = "".join(hypothesis.split())
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    prev = list(range(len(hyp) + 1))
+    for i, rc in enumerate(ref, 1):
+        cur = [i] + [0] * len(hyp)
+        for j, hc in enumerate(hyp, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (rc != hc))
+        prev = cur
+    return prev[-1] / float(len(ref))
+
+
+def _summary(latencies: list[float], cers: list[float]) -> dict[str, float]:
+    return {
+        "images": len(latencies),
+        "latency_ms_mean": round(statistics.fmean(latencies), 3) if latencies else 0.0,
+        "latency_ms_p50": round(percentile(latencies, 0.50), 3),
+        "latency_ms_p95": round(percentile(latencies, 0.95), 3),
+        "cer_mean": round(statistics.fmean(cers), 4) if cers else 0.0,
+    }
+
+
+def run(corpus: Path, *, equation_mask: bool = False, limit: Optional[int] = None) -> dict:
+    records = []
+    with open(corpus / "labels.jsonl", encoding="utf-8") as fp:
+        for line in fp:
+            if line.strip():
+                records.append(json.loads(line))
+    if limit:
+        records = records[:limit]
+
+    latencies: dict[str, list[float]] = {c: [] for c in CHOICES}
+    cers: dict[str, list[float]] = {c: [] for c in CHOICES}
+    detector_ms: list[float] = []
+    detector_hits = 0
+    detector_labeled = 0
+    picked: dict[str, int] = {}
+    per_image = []
+
+    for record in records:
+        prepared = PreparedImage.load(str(corpus / record["image"]))
+        image = prepared.ocr_image()
+        truth = record.get("text", "")
+
+        started = time.perf_counter()
+        guess = detect_script(image, equation_mask=equation_mask)
+        detector_ms.append((time.perf_counter() - started) * 1000.0)
+        picked[guess.lang] = picked.get(guess.lang, 0) + 1
+        if record.get("lang"):
+            detector_labeled += 1
+            detector_hits += int(record["lang"] == guess.lang)
+
+        row = {"image": record["image"], "detected": guess.lang, "hangul_ratio": guess.hangul_ratio}
+        for choice in CHOICES:
+            lang = guess.lang if choice == "auto" else choice
+            ocr_input = mask_regions(image, guess.equation_rects) if choice == "auto" else image
+            started = time.perf_counter()
+            text = extract_text_from_pil_image(ocr_input, lang=lang)
+            elapsed = (time.perf_counter() - started) * 1000.0
+            cer = char_error_rate(truth, text)
+            latencies[choice].append(elapsed)
+            cers[choice].append(cer)
+            row[choice] = {"ms": round(elapsed, 3), "cer": round(cer, 4)}
+        per_image.append(row)
+
+    return {
+        "corpus": str(corpus),
+        "equation_mask": equation_mask,
+        "choices": {c: _summary(latencies[c], cers[c]) for c in CHOICES},
+        "detector": {
+            "latency_ms_mean": round(statistics.fmean(detector_ms), 3) if detector_ms else 0.0,
+            "accuracy": round(detector_hits / detector_labeled, 4) if detector_labeled else None,
+            "picked": picked,
+        },
+        "images": per_image,
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Tesseract language-choice benchmark")
+    parser.add_argument("--corpus", required=True, help="labels.jsonl 이 있는 디렉터리")
+    parser.add_argument("--equation-mask", action="store_true", help="수식 줄 마스킹 후 kor 단독 실행")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--output", help="결과 JSON 저장 경로 (기본: stdout)")
+    args = parser.parse_args(argv)
+
+    result = run(Path(args.corpus), equation_mask=args.equation_mask, limit=args.limit)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,211 @@
+"""
+OCR / layout throughput benchmark on synthetic exam pages.
+
+Renders pages with `benchmarks.synthetic` (or reads an existing corpus), then
+runs each pipeline stage on a fresh PreparedImage per page:
+
+    load        PreparedImage.load (decode from PNG)
+    quality     measure_image_quality (OCR policy signals)
+    script      detect_script (Tesseract language choice)
+    preprocess  prepare_for_ocr (deskew / rescale / binarize)
+    ocr         extract_words (Tesseract; skipped when not installed)
+    layout      detect_container (reuses the PreparedImage caches)
+
+and reports per-stage wall-clock percentiles, CPU time and memory high-water
+marks as JSON. Pass `--baseline` with an earlier result to add p50/p95 ratios.
+
+    python -m benchmarks.ocr_throughput --count 30 --output ocr.json
+    python -m benchmarks.ocr_throughput --count 30 --baseline ocr.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Optional
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import environment, latency_summary, peak_rss_kb
+from benchmarks.synthetic import BASE_WIDTH, generate_corpus, write_corpus
+from layout_detector import detect_container
+from ocr_pipeline import (
+    OcrError,
+    PreparedImage,
+    detect_script,
+    extract_words,
+    prepare_for_ocr,
+)
+
+STAGES = ("load", "quality", "script", "preprocess", "ocr", "layout")
+
+
+class _StageTimer:
+    def __init__(self, trace_memory: bool) -> None:
+        self.wall: dict[str, list[float]] = {s: [] for s in STAGES}
+        self.cpu: dict[str, list[float]] = {s: [] for s in STAGES}
+        self.mem_peak_kb: dict[str, int] = {s: 0 for s in STAGES}
+        self.errors: dict[str, str] = {}
+        self._trace_memory = trace_memory
+
+    def run(self, stage: str, fn: Callable[[], object]) -> object:
+        if self._trace_memory:
+            tracemalloc.reset_peak()
+        cpu0 = time.process_time()
+        wall0 = time.perf_counter()
+        result = fn()
+        self.wall[stage].append((time.perf_counter() - wall0) * 1000.0)
+        self.cpu[stage].append((time.process_time() - cpu0) * 1000.0)
+        if self._trace_memory:
+            _current, peak = tracemalloc.get_traced_memory()
+            self.mem_peak_kb[stage] = max(self.mem_peak_kb[stage], peak // 1024)
+        return result
+
+
+def _corpus_images(corpus: Path) -> list[Path]:
+    labels = corpus / "labels.jsonl"
+    if labels.exists():
+        with open(labels, encoding="utf-8") as fp:
+            return [corpus / json.loads(line)["image"] for line in fp if line.strip()]
+    return sorted(p for p in corpus.iterdir() if p.suffix.lower() in (".png", ".jpg", ".jpeg"))
+
+
+def run(
+    images: list[Path],
+    *,
+    repeat: int = 1,
+    ocr: bool = True,
+    trace_memory: bool = False,
+) -> dict:
+    if images:
+        # Warm-up: first-call costs (imports, OpenCV kernels) are not per-image costs.
+        warm = PreparedImage.load(str(images[0]))
+        detect_script(warm.ocr_image())
+        prepare_for_ocr(warm)
+        detect_container(warm)
+
+    timer = _StageTimer(trace_memory)
+    if trace_memory:
+        tracemalloc.start()
+    ocr_enabled = ocr
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for path in images:
+            prepared = timer.run("load", lambda: PreparedImage.load(str(path)))
+            quality = timer.run("quality", prepared.quality)
+            guess = timer.run(
+                "script",
+                lambda: detect_script(
+                    prepared.ocr_image(), text_height=quality.text_height * prepared.ocr_scale
+                ),
+            )
+            ocr_input = timer.run("preprocess", lambda: prepare_for_ocr(prepared))
+            if ocr_enabled:
+                try:
+                    timer.run(
+                        "ocr",
+                        lambda: extract_words(ocr_input.image, lang=guess.lang, box_map=ocr_input.to_original),
+                    )
+                except OcrError as e:
+                    # No Tesseract here: report the other stages.
+                    timer.errors["ocr"] = str(e)
+                    ocr_enabled = False
+            timer.run("layout", lambda: detect_container(prepared))
+    total_s = time.perf_counter() - started
+    if trace_memory:
+        tracemalloc.stop()
+
+    processed = len(images) * repeat
+    stages = {}
+    for stage in STAGES:
+        if not timer.wall[stage]:
+            stages[stage] = {"skipped": timer.errors.get(stage, "disabled")}
+            continue
+        stages[stage] = {
+            "wall_ms": latency_summary(timer.wall[stage]),
+            "cpu_ms": latency_summary(timer.cpu[stage]),
+            "cpu_ms_total": round(sum(timer.cpu[stage]), 3),
+        }
+        if trace_memory:
+            stages[stage]["tracemalloc_peak_kb"] = timer.mem_peak_kb[stage]
+    return {
+        "env": environment(),
+        "images": len(images),
+        "repeat": repeat,
+        "total_s": round(total_s, 3),
+        "images_per_s": round(processed / total_s, 3) if total_s > 0 else None,
+        "peak_rss_kb": peak_rss_kb(),
+        "stages": stages,
+    }
+
+
+def compare(result: dict, baseline: dict) -> dict:
+    """Per-stage p50/p95 wall-time ratios (current / baseline; < 1.0 is faster)."""
+    out: dict[str, dict[str, Optional[float]]] = {}
+    for stage, cur in result.get("stages", {}).items():
+        base = baseline.get("stages", {}).get(stage, {})
+        if "wall_ms" not in cur or "wall_ms" not in base:
+            continue
+        out[stage] = {}
+        for key in ("p50", "p95"):
+            b = base["wall_ms"].get(key) or 0.0
+            out[stage][key] = round(cur["wall_ms"][key] / b, 3) if b else None
+    return {"baseline_commit": baseline.get("env", {}).get("commit"), "wall_ratio": out}
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="OCR/layout throughput benchmark")
+    parser.add_argument("--corpus", help="기존 이미지 디렉터리 (없으면 합성 페이지 생성)")
+    parser.add_argument("--count", type=int, default=20, help="합성 페이지 수")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--width", type=int, default=BASE_WIDTH, help="합성 페이지 폭(px)")
+    parser.add_argument("--problems", type=int, default=1, help="페이지당 문항 수")
+    parser.add_argument("--skew", type=float, default=2.0, help="합성 페이지 최대 기울기(도)")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--no-ocr", action="store_true", help="Tesseract 단계 생략")
+    parser.add_argument("--trace-memory", action="store_true", help="단계별 tracemalloc 최고치 기록 (느려짐)")
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON")
+    parser.add_argument("--output", help="결과 JSON 저장 경로 (기본: stdout)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="nova_ai_bench_") as tmp:
+        if args.corpus:
+            corpus = Path(args.corpus)
+        else:
+            corpus = Path(tmp)
+            pages = generate_corpus(
+                args.count, seed=args.seed, width=args.width, problems=args.problems, skew=args.skew
+            )
+            write_corpus(corpus, pages)
+        result = run(
+            _corpus_images(corpus),
+            repeat=max(1, args.repeat),
+            ocr=not args.no_ocr,
+            trace_memory=args.trace_memory,
+        )
+    result["params"] = {
+        "corpus": args.corpus,
+        "count": args.count,
+        "seed": args.seed,
+        "width": args.width,
+        "problems": args.problems,
+        "skew": args.skew,
+    }
+    if args.baseline:
+        result["comparison"] = compare(result, json.loads(Path(args.baseline).read_text(encoding="utf-8")))
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,143 @@
+"""
+exec() vs the script_ast compiler and interpreter loop.
+
+Before script_ast, ScriptRunner ran scripts that were not plain literal calls
+with exec() against an environment of closures that called cancel_check before
+every controller call. This keeps that environment as the reference and, for
+merged corpus scripts of the requested sizes (loops included, see
+script_stress), times:
+
+- `exec_compile` / `exec_run`: Python compile() of the rendered script, then
+  exec() with the wrapped functions;
+- `ast_compile` / `ast_run`: script_ast.compile_ops() on the normalized ops, then
+  ScriptRunner._run_calls() (cancel_check before every call, like exec()).
+
+Both must make the same controller calls. `cancel_checks` counts how often
+each path called cancel_check.
+
+    python -m benchmarks.script_exec --lines 1000 10000 50000 --output exec.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import environment
+from benchmarks.script_normalize import CORPUS, CallRecorder, load_corpus
+from benchmarks.script_stress import build_script, mergeable
+import script_ast
+import script_ir
+from script_runner import SCRIPT_FUNCTIONS, ScriptCancelled, ScriptRunner
+
+EXEC_BUILTINS: dict[str, object] = {
+    "range": range,
+    "len": len,
+    "min": min,
+    "max": max,
+    "enumerate": enumerate,
+    "sum": sum,
+    "print": print,
+    "abs": abs,
+}
+
+
+def exec_env(controller: Any, cancel_check: Callable[[], bool]) -> dict[str, object]:
+    """The previous run() environment: one checking closure per function."""
+
+    def _wrap(fn: Callable[..., Any]) -> Callable[..., Any]:
+        def _inner(*args: Any, **kwargs: Any) -> Any:
+            if cancel_check():
+                raise ScriptCancelled("cancelled")
+            return fn(*args, **kwargs)
+
+        return _inner
+
+    env: dict[str, object] = {"__builtins__": EXEC_BUILTINS}
+    for name in SCRIPT_FUNCTIONS:
+        env[name] = _wrap(getattr(controller, name))
+    return env
+
+
+class _Counter:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def __call__(self) -> bool:
+        self.calls += 1
+        return False
+
+
+def _timed(fn):  # type: ignore[no-untyped-def]
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def run(sizes: list[int], *, corpus: Path = CORPUS) -> dict:
+    # Cleaned per case: a code fence in the middle of a merged script is not one.
+    cases = [
+        script_ir.prepare_source(script)
+        for _name, script in load_corpus(corpus)
+        if mergeable(script) and ScriptRunner.prepare(script).calls
+    ]
+    rows = []
+    for size in sizes:
+        ops = ScriptRunner.compile(build_script(cases, size))
+        source = script_ir.render(ops)
+
+        code, exec_compile_s = _timed(lambda: compile(source, "<script>", "exec"))
+        old = CallRecorder()
+        old_checks = _Counter()
+        env = exec_env(old, old_checks)
+        _, exec_run_s = _timed(lambda: exec(code, env, {}))
+
+        calls, ast_compile_s = _timed(lambda: script_ast.compile_ops(ops, SCRIPT_FUNCTIONS))
+        new = CallRecorder()
+        new_checks = _Counter()
+        runner = ScriptRunner(new)  # type: ignore[arg-type]
+        _, ast_run_s = _timed(lambda: runner._run_calls(calls, new_checks))
+
+        rows.append(
+            {
+                "lines": source.count("\n") + 1,
+                "calls": len(calls),
+                "same_calls": old.calls == new.calls,
+                "exec_compile_s": round(exec_compile_s, 4),
+                "ast_compile_s": round(ast_compile_s, 4),
+                "exec_run_s": round(exec_run_s, 4),
+                "ast_run_s": round(ast_run_s, 4),
+                "run_speedup": round(exec_run_s / ast_run_s, 2) if ast_run_s else None,
+                "total_speedup": round((exec_compile_s + exec_run_s) / (ast_compile_s + ast_run_s), 2)
+                if ast_compile_s + ast_run_s
+                else None,
+                "cancel_checks": {"exec": old_checks.calls, "ast": new_checks.calls},
+            }
+        )
+    return {"environment": environment(), "runs": rows}
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="exec vs script_ast benchmark")
+    parser.add_argument("--lines", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--corpus", default=str(CORPUS), help="스크립트 코퍼스 디렉터리")
+    parser.add_argument("--output", help="결과 JSON 저장 경로 (기본: stdout)")
+    args = parser.parse_args(argv)
+
+    result = run(args.lines, corpus=Path(args.corpus))
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,145 @@
+"""
+Fallback parser on large broken scripts.
+
+When the normalized script does not compile, ScriptRunner types it through
+`_execute_fallback`. This builds merged corpus scripts of the requested sizes,
+appends a line exec() cannot compile, and times:
+
+- `charwise`: the old scanner (every position tested against every function
+  name with str.startswith), kept here as the reference;
+- `regex`: script_ir.call_sites with the runner's single-alternation pattern;
+- `run`: the whole ScriptRunner.run() on the broken script (recording
+  controller).
+
+Both scanners must find the same call sites with the same argument text.
+
+    python -m benchmarks.script_fallback --lines 1000 10000 50000 --output fallback.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, Optional
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import environment
+from benchmarks.script_normalize import CORPUS, CallRecorder, load_corpus
+from benchmarks.script_stress import build_script, mergeable
+import script_ir
+from script_runner import _FALLBACK_CALL_RE, SCRIPT_FUNCTIONS, ScriptRunner
+
+# Two calls on one line without `+`: not repaired by normalization, so exec() fails.
+BROKEN_TAIL = "\ninsert_text('끝') insert_enter()"
+
+
+def charwise_call_sites(text: str) -> Iterator[tuple[str, str]]:
+    """The previous _execute_fallback scan loop (call sites only)."""
+    names = sorted(SCRIPT_FUNCTIONS, key=len, reverse=True)
+    i = 0
+    while i < len(text):
+        matched = None
+        for name in names:
+            if text.startswith(name + "(", i):
+                matched = name
+                break
+        if not matched:
+            i += 1
+            continue
+        i += len(matched) + 1
+        args = []
+        depth = 1
+        quote = None
+        escaped = False
+        while i < len(text) and depth > 0:
+            ch = text[i]
+            if escaped:
+                args.append(ch)
+                escaped = False
+                i += 1
+                continue
+            if ch == "\\":
+                args.append(ch)
+                escaped = True
+                i += 1
+                continue
+            if quote:
+                if ch == quote:
+                    quote = None
+                args.append(ch)
+                i += 1
+                continue
+            if ch in ("'", '"'):
+                quote = ch
+                args.append(ch)
+                i += 1
+                continue
+            if ch == "(":
+                depth += 1
+            elif ch == ")":
+                depth -= 1
+                if depth == 0:
+                    i += 1
+                    break
+            args.append(ch)
+            i += 1
+        yield matched, "".join(args).strip()
+
+
+def _timed(fn):  # type: ignore[no-untyped-def]
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def run(sizes: list[int], *, corpus: Path = CORPUS) -> dict:
+    cases = [script for _name, script in load_corpus(corpus) if mergeable(script)]
+    rows = []
+    for size in sizes:
+        script = build_script(cases, size) + BROKEN_TAIL
+        text = script_ir.render(ScriptRunner(CallRecorder()).compile(script))  # type: ignore[arg-type]
+        old, old_s = _timed(lambda: list(charwise_call_sites(text)))
+        new, new_s = _timed(
+            lambda: [(name, inner.strip()) for name, inner, _ in script_ir.call_sites(text, _FALLBACK_CALL_RE)]
+        )
+        recorder = CallRecorder()
+        logs: list[str] = []
+        _, run_s = _timed(lambda: ScriptRunner(recorder).run(script, log=logs.append))  # type: ignore[arg-type]
+        rows.append(
+            {
+                "lines": text.count("\n") + 1,
+                "call_sites": len(new),
+                "same_sites": old == new,
+                "fallback_used": any(line.startswith("[Fallback] SyntaxError") for line in logs),
+                "charwise_s": round(old_s, 4),
+                "regex_s": round(new_s, 4),
+                "speedup": round(old_s / new_s, 1) if new_s else None,
+                "run_s": round(run_s, 4),
+                "controller_calls": len(recorder.calls),
+            }
+        )
+    return {"environment": environment(), "runs": rows}
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="ScriptRunner fallback parser benchmark")
+    parser.add_argument("--lines", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--corpus", default=str(CORPUS), help="스크립트 코퍼스 디렉터리")
+    parser.add_argument("--output", help="결과 JSON 저장 경로 (기본: stdout)")
+    args = parser.parse_args(argv)
+
+    result = run(args.lines, corpus=Path(args.corpus))
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,149 @@
+"""
+ScriptRunner normalization: golden check and throughput.
+
+Corpus: `benchmarks/script_corpus/NN_name.txt` model scripts, each with
+`NN_name.expected.txt` (normalized script) and `NN_name.calls.json`
+(controller calls `[name, args, kwargs]` the run must make).
+
+    python -m benchmarks.script_normalize --check
+    python -m benchmarks.script_normalize --repeat 200 --output normalize.json
+
+`--check` exits non-zero on the first mismatch. The throughput run compiles
+every corpus script `--repeat` times and then runs it against a recording
+controller, reporting compile and run latency per script, lines per second and
+the ops the peephole pass removed from each script.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import environment, latency_summary
+import script_ir
+from script_runner import ScriptRunner
+
+CORPUS = Path(__file__).resolve().parent / "script_corpus"
+
+
+class CallRecorder:
+    """Stands in for HwpController and records every public call."""
+
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, tuple, dict]] = []
+
+    def flush(self) -> None:
+        # HwpController write-combining flush; not a script-level call.
+        pass
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def _record(*args: Any, **kwargs: Any) -> None:
+            self.calls.append((name, args, kwargs))
+
+        return _record
+
+
+def load_corpus(corpus: Path = CORPUS) -> list[tuple[str, str]]:
+    cases = []
+    for path in sorted(corpus.glob("*.txt")):
+        if path.name.endswith(".expected.txt"):
+            continue
+        cases.append((path.stem, path.read_text(encoding="utf-8")))
+    return cases
+
+
+def run_script(script: str) -> list[list[Any]]:
+    recorder = CallRecorder()
+    ScriptRunner(recorder).run(script)  # type: ignore[arg-type]
+    # JSON round-trip so tuples compare equal to the stored lists.
+    return json.loads(json.dumps([[n, list(a), k] for n, a, k in recorder.calls], ensure_ascii=False))
+
+
+def check(corpus: Path = CORPUS) -> list[str]:
+    """Names of corpus cases whose normalized text or calls differ from the expected files."""
+    failures = []
+    for name, script in load_corpus(corpus):
+        expected = (corpus / f"{name}.expected.txt").read_text(encoding="utf-8").strip()
+        got = script_ir.render(ScriptRunner(CallRecorder()).compile(script))  # type: ignore[arg-type]
+        if got != expected:
+            failures.append(f"{name}: normalized text differs")
+            continue
+        calls_path = corpus / f"{name}.calls.json"
+        if calls_path.exists():
+            expected_calls = json.loads(calls_path.read_text(encoding="utf-8"))
+            if run_script(script) != expected_calls:
+                failures.append(f"{name}: controller calls differ")
+    return failures
+
+
+def run(corpus: Path = CORPUS, *, repeat: int = 100) -> dict:
+    cases = load_corpus(corpus)
+    compile_ms: list[float] = []
+    run_ms: list[float] = []
+    lines = 0
+    compile_total = 0.0
+    removed: dict[str, dict[str, int]] = {}
+    for name, script in cases:
+        counts: dict[str, int] = {}
+        ScriptRunner(CallRecorder()).compile(script, removed=counts)  # type: ignore[arg-type]
+        if counts:
+            removed[name] = counts
+    for _ in range(repeat):
+        for _name, script in cases:
+            runner = ScriptRunner(CallRecorder())  # type: ignore[arg-type]
+            started = time.perf_counter()
+            runner.compile(script)
+            elapsed = time.perf_counter() - started
+            compile_total += elapsed
+            compile_ms.append(elapsed * 1000.0)
+            lines += script.count("\n") + 1
+            started = time.perf_counter()
+            runner.run(script)
+            run_ms.append((time.perf_counter() - started) * 1000.0)
+    return {
+        "environment": environment(),
+        "corpus": str(corpus),
+        "scripts": len(cases),
+        "repeat": repeat,
+        "compile_ms": latency_summary(compile_ms),
+        "run_ms": latency_summary(run_ms),
+        "compile_lines_per_sec": round(lines / compile_total, 1) if compile_total else None,
+        "peephole_removed": removed,
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="ScriptRunner normalization benchmark")
+    parser.add_argument("--corpus", default=str(CORPUS), help="스크립트 코퍼스 디렉터리")
+    parser.add_argument("--check", action="store_true", help="기대 결과(.expected.txt / .calls.json)와 비교만 수행")
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--output", help="결과 JSON 저장 경로 (기본: stdout)")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        failures = check(Path(args.corpus))
+        for failure in failures:
+            print(failure)
+        print(f"{len(load_corpus(Path(args.corpus))) - len(failures)} ok, {len(failures)} failed")
+        return 1 if failures else 0
+
+    result = run(Path(args.corpus), repeat=max(1, args.repeat))
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
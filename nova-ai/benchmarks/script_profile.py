@@ -0,0 +1,91 @@
+"""
+Cost of the ScriptRunner profiler (script_profile.ScriptProfiler).
+
+Compiles a merged corpus script (see script_stress) once and runs its calls
+`--repeat` times against a recording controller through the interpreter loop
+(ScriptRunner._run_calls), where the per-call hook sits:
+
+- `off`: no profiler (the default GUI path);
+- `profiler`: one span per call.
+
+Reports loop latency per mode, the added cost per call, and the summary rows
+of one full profiled run() (stages plus calls), so the table can be checked
+without HWP.
+
+    python -m benchmarks.script_profile --lines 10000 --repeat 7 --output profile.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import environment, latency_summary
+from benchmarks.script_normalize import CORPUS, CallRecorder, load_corpus
+from benchmarks.script_stress import build_script, mergeable
+import script_ir
+from script_profile import ScriptProfiler
+from script_runner import ScriptRunner
+
+MODES = ("off", "profiler")
+
+
+def run(lines: int, repeat: int, *, corpus: Path = CORPUS) -> dict:
+    # Only cases the interpreter runs (the fallback parser is not profiled per call).
+    cases = [
+        script_ir.prepare_source(script)
+        for _name, script in load_corpus(corpus)
+        if mergeable(script) and ScriptRunner.prepare(script).calls
+    ]
+    script = build_script(cases, lines)
+    calls = ScriptRunner.prepare(script).calls
+    samples: dict[str, list[float]] = {mode: [] for mode in MODES}
+    for _ in range(repeat):
+        # Interleaved so that drift affects both modes alike.
+        for mode in MODES:
+            runner = ScriptRunner(CallRecorder())  # type: ignore[arg-type]
+            profiler = ScriptProfiler() if mode == "profiler" else None
+            started = time.perf_counter()
+            runner._run_calls(calls, None, profiler)
+            samples[mode].append((time.perf_counter() - started) * 1000.0)
+
+    full = ScriptProfiler()
+    ScriptRunner(CallRecorder()).run(script, timings=full)  # type: ignore[arg-type]
+    added_ms = min(samples["profiler"]) - min(samples["off"])
+    return {
+        "environment": environment(),
+        "lines": script.count("\n") + 1,
+        "calls": len(calls),
+        "repeat": repeat,
+        "loop_ms": {mode: latency_summary(values) for mode, values in samples.items()},
+        "profiler_us_per_call": round(added_ms * 1000.0 / len(calls), 3) if calls else None,
+        "spans": len(full.spans),
+        "summary": full.summary()[:15],
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="ScriptRunner profiler overhead benchmark")
+    parser.add_argument("--lines", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--corpus", default=str(CORPUS), help="스크립트 코퍼스 디렉터리")
+    parser.add_argument("--output", help="결과 JSON 저장 경로 (기본: stdout)")
+    args = parser.parse_args(argv)
+
+    result = run(args.lines, max(1, args.repeat), corpus=Path(args.corpus))
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,134 @@
+"""
+Streaming ScriptRunner: equivalence with run() and lookahead per rule.
+
+Feeds every corpus script, and merged scripts of the requested sizes (see
+script_stress), to `ScriptRunner.run_stream()` one line at a time and reports:
+
+- `same_calls`: the recording controller saw exactly the calls run() makes;
+- `lookahead`: the most ops each normalization rule held back;
+- `held_to_end`: the rule that made the stream wait for the end, if any;
+- `first_call_line`: lines fed before the first controller call (how soon
+  typing could start while the model is still writing);
+- stream vs batch seconds.
+
+    python -m benchmarks.script_stream --lines 1000 10000 --output stream.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import environment
+from benchmarks.script_normalize import CORPUS, CallRecorder, load_corpus
+from benchmarks.script_stress import build_script, mergeable
+import script_ir
+from script_runner import ScriptRunner
+
+
+class _FedLines:
+    """Yields the script line by line and counts what was handed out."""
+
+    def __init__(self, script: str) -> None:
+        self.lines = script.split("\n")
+        self.fed = 0
+
+    def __iter__(self) -> Iterator[str]:
+        for line in self.lines:
+            self.fed += 1
+            yield line
+
+
+class _StreamRecorder(CallRecorder):
+    def __init__(self, source: _FedLines) -> None:
+        super().__init__()
+        self.first_call_line: Optional[int] = None
+        self._source = source
+
+    def __getattr__(self, name: str) -> Any:
+        record = super().__getattr__(name)
+
+        def _record(*args: Any, **kwargs: Any) -> None:
+            if self.first_call_line is None:
+                self.first_call_line = self._source.fed
+            record(*args, **kwargs)
+
+        return _record
+
+
+def compare(script: str) -> dict:
+    batch = CallRecorder()
+    started = time.perf_counter()
+    ScriptRunner(batch).run(script)  # type: ignore[arg-type]
+    batch_s = time.perf_counter() - started
+
+    source = _FedLines(script)
+    stream = _StreamRecorder(source)
+    lookahead: dict[str, int] = {}
+    logs: list[str] = []
+    started = time.perf_counter()
+    ScriptRunner(stream).run_stream(source, logs.append, lookahead=lookahead)  # type: ignore[arg-type]
+    stream_s = time.perf_counter() - started
+
+    held = [line for line in logs if line.startswith("[Stream]")]
+    return {
+        "lines": len(source.lines),
+        "calls": len(stream.calls),
+        "same_calls": stream.calls == batch.calls,
+        "lookahead": lookahead,
+        "held_to_end": held[0].split()[1] if held else None,
+        "first_call_line": stream.first_call_line,
+        "batch_s": round(batch_s, 4),
+        "stream_s": round(stream_s, 4),
+    }
+
+
+def _first_line_dedent_only(script: str) -> bool:
+    # StreamNormalizer dedents by the first line (documented limitation).
+    return script_ir.prepare_source(script) == script_ir.prepare_source(script.strip())
+
+
+def run(sizes: list[int], *, corpus: Path = CORPUS) -> dict:
+    cases = load_corpus(corpus)
+    per_case = {}
+    skipped = []
+    for name, script in cases:
+        if not _first_line_dedent_only(script):
+            skipped.append(name)
+            continue
+        per_case[name] = compare(script)
+    merged = [script for _name, script in cases if mergeable(script)]
+    runs = [compare(build_script(merged, size)) for size in sizes]
+    return {
+        "environment": environment(),
+        "all_same_calls": all(r["same_calls"] for r in [*per_case.values(), *runs]),
+        "skipped_cases": skipped,
+        "cases": per_case,
+        "runs": runs,
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Streaming ScriptRunner benchmark")
+    parser.add_argument("--lines", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--corpus", default=str(CORPUS), help="스크립트 코퍼스 디렉터리")
+    parser.add_argument("--output", help="결과 JSON 저장 경로 (기본: stdout)")
+    args = parser.parse_args(argv)
+
+    result = run(args.lines, corpus=Path(args.corpus))
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return 0 if result["all_same_calls"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
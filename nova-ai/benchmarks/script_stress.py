@@ -0,0 +1,118 @@
+"""
+Large-script stress test for ScriptRunner normalization.
+
+Builds merged scripts the way the GUI does for multi-image typing (corpus
+scripts joined with four insert_enter() lines, see
+MainWindow._build_typing_script) until each reaches the requested line count,
+runs them through `ScriptRunner.run()` against a recording controller and
+reports seconds per stage (parse, every normalization pass, peephole, ast,
+execute).
+
+    python -m benchmarks.script_stress --lines 10000 30000 100000 --output stress.json
+
+Scripts that are not plain literal calls are left out by default, so the ast
+stage only decodes literal calls: loops are unrolled by script_ast, and one
+case that does not parse would send the whole merged script to the fallback
+parser. `--all-cases` keeps them. Scripts that end inside an unterminated call
+are always left out (see `mergeable`).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import environment, peak_rss_kb
+from benchmarks.script_normalize import CORPUS, CallRecorder, load_corpus
+import script_ir
+from script_runner import SCRIPT_FUNCTIONS, ScriptRunner
+
+SEPARATOR = "\ninsert_enter()\n" * 4
+
+
+def mergeable(script: str) -> bool:
+    """
+    False for scripts that end inside an unterminated string or text call:
+    merged with others, they would swallow every script after them.
+    """
+    ops = script_ir.parse(script_ir.prepare_source(script) + "\ninsert_enter()")
+    return bool(ops) and ops[-1].bare("insert_enter")
+
+
+def build_script(cases: list[str], lines: int) -> str:
+    parts: list[str] = []
+    count = 0
+    i = 0
+    while count < lines:
+        code = cases[i % len(cases)].strip()
+        parts.append(code)
+        count += code.count("\n") + 1 + 4
+        i += 1
+    return SEPARATOR.join(parts)
+
+
+def _dispatchable(script: str) -> bool:
+    """Only literal calls of script functions (nothing for script_ast to evaluate)."""
+    runner = ScriptRunner(CallRecorder())  # type: ignore[arg-type]
+    return script_ir.dispatchable(runner.compile(script), SCRIPT_FUNCTIONS)
+
+
+def run(sizes: list[int], *, corpus: Path = CORPUS, all_cases: bool = False) -> dict:
+    cases = []
+    skipped = []
+    for name, script in load_corpus(corpus):
+        if mergeable(script) and (all_cases or _dispatchable(script)):
+            cases.append(script)
+        else:
+            skipped.append(name)
+
+    results = []
+    for size in sizes:
+        script = build_script(cases, size)
+        recorder = CallRecorder()
+        timings: dict[str, float] = {}
+        started = time.perf_counter()
+        ScriptRunner(recorder).run(script, timings=timings)  # type: ignore[arg-type]
+        total = time.perf_counter() - started
+        results.append(
+            {
+                "lines": script.count("\n") + 1,
+                "calls": len(recorder.calls),
+                "total_s": round(total, 4),
+                "lines_per_sec": round((script.count("\n") + 1) / total, 1) if total else None,
+                "stages_s": {name: round(sec, 4) for name, sec in timings.items()},
+            }
+        )
+    return {
+        "environment": environment(),
+        "skipped_cases": skipped,
+        "runs": results,
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="ScriptRunner large-script stress benchmark")
+    parser.add_argument("--lines", type=int, nargs="+", default=[10000, 30000, 100000])
+    parser.add_argument("--corpus", default=str(CORPUS), help="스크립트 코퍼스 디렉터리")
+    parser.add_argument("--all-cases", action="store_true", help="루프 등 script_ast가 펼치는 스크립트와 문법 오류 스크립트(fallback 파서)도 포함")
+    parser.add_argument("--output", help="결과 JSON 저장 경로 (기본: stdout)")
+    args = parser.parse_args(argv)
+
+    result = run(args.lines, corpus=Path(args.corpus), all_cases=args.all_cases)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,324 @@
+"""
+Synthetic 수능-style problem pages rendered with Pillow and the bundled fonts.
+
+Pages are deterministic for a given seed and carry their ground truth
+(problem text, <보기>/box rectangle, choices band), so OCR and layout
+benchmarks can score accuracy as well as latency without a private corpus.
+
+    python -m benchmarks.synthetic --out path/to/dir --count 20
+
+writes PNGs plus a `labels.jsonl` compatible with `benchmarks.ocr_lang`.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+FONTS_DIR = Path(__file__).resolve().parent.parent / "fonts"
+REGULAR_FONT = "Pretendard-Regular.otf"
+BOLD_FONT = "Pretendard-Bold.otf"
+
+# Reference page: A4 width at ~150 dpi. Everything scales with `width`.
+BASE_WIDTH = 1240
+
+Rect = Tuple[int, int, int, int]
+
+_STEMS = (
+    "다음 조건을 만족시키는 함수 {m} 에 대하여 옳은 것만을 <보기>에서 있는 대로 고른 것은?",
+    "실수 전체의 집합에서 정의된 함수 {m} 의 최솟값을 구하시오.",
+    "두 양수 a, b 에 대하여 {m} 일 때, a+b 의 값은?",
+    "그림과 같이 한 변의 길이가 2인 정삼각형 ABC 가 있다. {m} 일 때 넓이는?",
+    "등차수열 a_n 에 대하여 {m} 이 성립할 때, 첫째항의 값은?",
+    "좌표평면 위의 점 P 가 {m} 을 만족시킬 때, 선분 OP 의 길이는?",
+)
+_MATH = (
+    "f(x)=x^2-4x+3",
+    "g(x)=2x^3+ax",
+    "a^2+b^2=10",
+    "log_2(8)=3",
+    "lim f(x)=5",
+    "a_n+1=a_n+3",
+    "x^2+y^2=25",
+)
+_VIEW_ITEMS = (
+    "ㄱ. f(0)=3 이다.",
+    "ㄴ. 함수 f(x) 는 x=2 에서 최솟값을 갖는다.",
+    "ㄷ. 방정식 f(x)=0 의 서로 다른 실근의 개수는 2 이다.",
+    "ㄹ. 모든 실수 x 에 대하여 f(x)>-1 이다.",
+)
+_CHOICE_SETS = (
+    ("ㄱ", "ㄴ", "ㄱ, ㄴ", "ㄴ, ㄷ", "ㄱ, ㄴ, ㄷ"),
+    ("1", "2", "3", "4", "5"),
+    ("-2", "-1", "0", "1", "2"),
+    ("√2", "2", "2√2", "4", "4√2"),
+)
+CHOICE_MARKS = "①②③④⑤"
+
+
+@dataclass
+class SyntheticProblem:
+    number: int
+    text: str
+    rect: Rect
+    box_rect: Optional[Rect] = None
+    box_template: Optional[str] = None
+    choices_rect: Optional[Rect] = None
+
+
+@dataclass
+class SyntheticPage:
+    """One rendered page and its ground truth (all rects in image coordinates)."""
+
+    seed: int
+    image: Any = field(repr=False)
+    problems: list[SyntheticProblem] = field(default_factory=list)
+    skew: float = 0.0
+
+    @property
+    def text(self) -> str:
+        return "\n".join(p.text for p in self.problems)
+
+    def label(self, image_name: str) -> dict:
+        first = self.problems[0] if self.problems else None
+        return {
+            "image": image_name,
+            "text": self.text,
+            "lang": "kor+eng",
+            "seed": self.seed,
+            "skew": self.skew,
+            "template": first.box_template if first else None,
+            "box_rect": list(first.box_rect) if first and first.box_rect else None,
+            "problems": [asdict(p) for p in self.problems],
+        }
+
+
+def _font(name: str, size: int):  # type: ignore[no-untyped-def]
+    from PIL import ImageFont  # type: ignore[import-not-found]
+
+    return ImageFont.truetype(str(FONTS_DIR / name), size)
+
+
+def _draw_math(draw, xy, text: str, font, small) -> int:  # type: ignore[no-untyped-def]
+    """Draw `text` with '^c' / '_c' rendered as raised/lowered small glyphs; returns end x."""
+    x, y = xy
+    size = font.size
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if ch in "^_" and i + 1 < len(text):
+            dy = -int(size * 0.35) if ch == "^" else int(size * 0.45)
+            glyph = text[i + 1]
+            draw.text((x, y + dy), glyph, fill=(0, 0, 0), font=small)
+            x += int(small.getlength(glyph))
+            i += 2
+            continue
+        draw.text((x, y), ch, fill=(0, 0, 0), font=font)
+        x += int(font.getlength(ch))
+        i += 1
+    return x
+
+
+def _plain_math(text: str) -> str:
+    return text.replace("^", "").replace("_", "")
+
+
+def _wrap(words: list[str], font, width: int) -> list[list[str]]:  # type: ignore[no-untyped-def]
+    lines: list[list[str]] = [[]]
+    used = 0.0
+    space = font.getlength(" ")
+    for word in words:
+        wlen = font.getlength(_plain_math(word))
+        if lines[-1] and used + space + wlen > width:
+            lines.append([])
+            used = 0.0
+        if lines[-1]:
+            used += space
+        lines[-1].append(word)
+        used += wlen
+    return lines
+
+
+def _draw_words(draw, x: int, y: int, words: list[str], font, small) -> None:  # type: ignore[no-untyped-def]
+    space = int(font.getlength(" "))
+    for word in words:
+        if "^" in word or "_" in word:
+            x = _draw_math(draw, (x, y), word, font, small)
+        else:
+            draw.text((x, y), word, fill=(0, 0, 0), font=font)
+            x += int(font.getlength(word))
+        x += space
+
+
+def _render_problem(draw, rng: random.Random, number: int, top: int, width: int, scale: float, box: str):  # type: ignore[no-untyped-def]
+    size = max(10, int(26 * scale))
+    font = _font(REGULAR_FONT, size)
+    bold = _font(BOLD_FONT, size)
+    small = _font(REGULAR_FONT, max(8, int(size * 0.62)))
+    margin = int(80 * scale)
+    line_h = int(size * 1.75)
+    text_w = width - 2 * margin
+
+    math = rng.choice(_MATH)
+    stem = rng.choice(_STEMS).format(m=math)
+    lines_text = [f"{number}. {_plain_math(stem)}"]
+
+    y = top
+    draw.text((margin, y), f"{number}.", fill=(0, 0, 0), font=bold)
+    indent = margin + int(bold.getlength(f"{number}. "))
+    for row in _wrap(stem.split(" "), font, text_w - (indent - margin)):
+        _draw_words(draw, indent, y, row, font, small)
+        y += line_h
+
+    box_rect: Optional[Rect] = None
+    template: Optional[str] = None
+    if box != "none":
+        y += int(line_h * 0.4)
+        items = rng.sample(_VIEW_ITEMS, 3)
+        pad = int(24 * scale)
+        box_h = pad * 2 + line_h * len(items) + (line_h // 2 if box == "view" else 0)
+        x0, x1 = indent, width - margin
+        stroke = max(1, int(2 * scale))
+        gray = (0, 0, 0) if box != "white" else (170, 170, 170)
+        draw.rectangle([x0, y, x1, y + box_h], outline=gray, width=stroke)
+        inner_top = y + pad
+        if box == "view":
+            header = "< 보 기 >"
+            hw = int(font.getlength(header))
+            hx = (x0 + x1 - hw) // 2
+            # Header breaks the top border, as in printed papers.
+            draw.rectangle([hx - pad // 2, y - stroke, hx + hw + pad // 2, y + stroke], fill=(255, 255, 255))
+            draw.text((hx, y - size // 2 - stroke), header, fill=(0, 0, 0), font=font)
+            inner_top += line_h // 2
+            lines_text.append("<보기>")
+        for i, item in enumerate(items):
+            draw.text((x0 + pad, inner_top + i * line_h), item, fill=(0, 0, 0), font=font)
+            lines_text.append(item)
+        box_rect = (x0, y, x1 - x0, box_h)
+        template = {"view": "header.hwp", "box": "box.hwp", "white": "box_white.hwp"}[box]
+        y += box_h + int(line_h * 0.6)
+
+    choices = rng.choice(_CHOICE_SETS)
+    col_w = text_w // 5
+    choices_top = y
+    parts = []
+    for i, value in enumerate(choices):
+        label = f"{CHOICE_MARKS[i]} {value}"
+        draw.text((indent + i * col_w, y), label, fill=(0, 0, 0), font=font)
+        parts.append(label)
+    lines_text.append("  ".join(parts))
+    y += line_h
+    choices_rect = (indent, choices_top, width - margin - indent, line_h)
+
+    problem = SyntheticProblem(
+        number=number,
+        text="\n".join(lines_text),
+        rect=(margin, top, width - 2 * margin, y - top),
+        box_rect=box_rect,
+        box_template=template,
+        choices_rect=choices_rect,
+    )
+    return problem, y
+
+
+def generate_page(
+    seed: int,
+    *,
+    width: int = BASE_WIDTH,
+    problems: int = 1,
+    box: Optional[str] = None,
+    skew: float = 0.0,
+    noise: float = 0.0,
+) -> SyntheticPage:
+    """
+    Render one page.
+
+    - box: 'view' (<보기> header), 'box', 'white' (light border), 'none', or None = random
+    - skew: rotation in degrees applied after rendering (ground-truth rects are pre-rotation)
+    - noise: fraction of pixels flipped to gray speckles (0..1)
+
+    Single-problem pages are cropped below the choices like a screen capture;
+    multi-problem pages keep the full A4 height.
+    """
+    from PIL import Image, ImageDraw  # type: ignore[import-not-found]
+
+    rng = random.Random(seed)
+    scale = width / float(BASE_WIDTH)
+    height = int(width * 1.414)
+    image = Image.new("RGB", (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+
+    page = SyntheticPage(seed=seed, image=image, skew=skew)
+    top = int(90 * scale)
+    gap = int(70 * scale)
+    for i in range(problems):
+        kind = box or rng.choice(("view", "box", "white", "none"))
+        problem, bottom = _render_problem(draw, rng, rng.randint(1, 30) if problems == 1 else i + 1, top, width, scale, kind)
+        if bottom > height - gap:
+            break
+        page.problems.append(problem)
+        top = bottom + gap
+
+    if problems == 1 and page.problems:
+        height = min(height, top - gap + int(90 * scale))
+        image = image.crop((0, 0, width, height))
+
+    if noise > 0:
+        pixels = image.load()
+        for _ in range(int(width * height * noise)):
+            px, py = rng.randrange(width), rng.randrange(height)
+            shade = rng.randint(90, 200)
+            pixels[px, py] = (shade, shade, shade)
+    page.image = image
+    if skew:
+        page.image = image.rotate(skew, resample=Image.BICUBIC, fillcolor=(255, 255, 255))
+    return page
+
+
+def generate_corpus(
+    count: int, *, seed: int = 0, width: int = BASE_WIDTH, problems: int = 1, skew: float = 0.0
+) -> list[SyntheticPage]:
+    """`count` pages; every third page gets a random skew up to ±`skew` degrees."""
+    rng = random.Random(seed)
+    pages = []
+    for i in range(count):
+        page_skew = rng.uniform(-skew, skew) if skew and i % 3 == 2 else 0.0
+        pages.append(generate_page(seed + i, width=width, problems=problems, skew=round(page_skew, 2)))
+    return pages
+
+
+def write_corpus(out: Path, pages: list[SyntheticPage]) -> Path:
+    out.mkdir(parents=True, exist_ok=True)
+    labels = out / "labels.jsonl"
+    with open(labels, "w", encoding="utf-8") as fp:
+        for i, page in enumerate(pages):
+            name = f"synthetic_{i:04d}.png"
+            page.image.save(out / name, format="PNG")
+            fp.write(json.dumps(page.label(name), ensure_ascii=False) + "\n")
+    return labels
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Synthetic exam page generator")
+    parser.add_argument("--out", required=True, help="출력 디렉터리")
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--width", type=int, default=BASE_WIDTH)
+    parser.add_argument("--problems", type=int, default=1, help="페이지당 문항 수")
+    parser.add_argument("--skew", type=float, default=0.0, help="최대 기울기(도)")
+    args = parser.parse_args(argv)
+
+    pages = generate_corpus(args.count, seed=args.seed, width=args.width, problems=args.problems, skew=args.skew)
+    print(write_corpus(Path(args.out), pages))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,126 @@
+"""
+Typing a queue of scripts: compile on the COM thread vs precompiled.
+
+The GUI types one script per problem image (TypingWorker). `serial` does what
+the worker used to do: `ScriptRunner.run()` per item, so item N+1 is
+normalized only after item N is typed. `pipelined` mirrors the current
+worker: a background thread runs `ScriptRunner.prepare()` in queue order and
+the typing thread only calls `execute()`. The controller is
+hwp_recorder.RecordingHwpController with `sleep=True`, so simulated COM
+latency really blocks (and releases the GIL) the way IDispatch calls do.
+
+Reports wall time per mode, per-item compile / COM ms, and whether both
+modes typed the same text.
+
+    python -m benchmarks.typing_pipeline --items 10 --com-latency-ms 0.05 --output pipeline.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import environment, latency_summary
+from benchmarks.script_normalize import CORPUS, load_corpus
+from benchmarks.script_stress import build_script, mergeable
+from hwp_recorder import RecordingHwpController
+from script_runner import ScriptRunner
+
+
+def serial(scripts: list[str], com_latency_ms: float) -> dict:
+    controller = RecordingHwpController(com_latency_ms=com_latency_ms, sleep=True)
+    runner = ScriptRunner(controller)
+    compile_ms: list[float] = []
+    com_ms: list[float] = []
+    started = time.perf_counter()
+    for script in scripts:
+        timings: dict[str, float] = {}
+        runner.run(script, timings=timings)
+        execute = timings.pop("execute", 0.0)
+        compile_ms.append(sum(timings.values()) * 1000.0)
+        com_ms.append(execute * 1000.0)
+    wall = time.perf_counter() - started
+    return _summary(controller, wall, compile_ms, com_ms)
+
+
+def pipelined(scripts: list[str], com_latency_ms: float) -> dict:
+    controller = RecordingHwpController(com_latency_ms=com_latency_ms, sleep=True)
+    runner = ScriptRunner(controller)
+    ready: "queue.Queue" = queue.Queue()
+
+    def _compile() -> None:
+        for script in scripts:
+            ready.put(ScriptRunner.prepare(script))
+
+    compile_ms: list[float] = []
+    com_ms: list[float] = []
+    started = time.perf_counter()
+    threading.Thread(target=_compile, daemon=True).start()
+    for _ in scripts:
+        prepared = ready.get()
+        item_started = time.perf_counter()
+        runner.execute(prepared)
+        compile_ms.append(prepared.compile_s * 1000.0)
+        com_ms.append((time.perf_counter() - item_started) * 1000.0)
+    wall = time.perf_counter() - started
+    return _summary(controller, wall, compile_ms, com_ms)
+
+
+def _summary(
+    controller: RecordingHwpController, wall: float, compile_ms: list[float], com_ms: list[float]
+) -> dict:
+    return {
+        "wall_s": round(wall, 4),
+        "compile_ms": latency_summary(compile_ms),
+        "com_ms": latency_summary(com_ms),
+        "typed": controller.typed_text(),
+    }
+
+
+def run(items: int, lines: int, com_latency_ms: float, *, corpus: Path = CORPUS) -> dict:
+    cases = [script for _name, script in load_corpus(corpus) if mergeable(script)]
+    # Rotate the corpus so every item is a different merged script.
+    scripts = [build_script(cases[i % len(cases) :] + cases[: i % len(cases)], lines) for i in range(items)]
+    before = serial(scripts, com_latency_ms)
+    after = pipelined(scripts, com_latency_ms)
+    same = before.pop("typed") == after.pop("typed")
+    return {
+        "environment": environment(),
+        "items": items,
+        "lines_per_item": lines,
+        "com_latency_ms": com_latency_ms,
+        "same_text": same,
+        "serial": before,
+        "pipelined": after,
+        "speedup": round(before["wall_s"] / after["wall_s"], 2) if after["wall_s"] else None,
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="TypingWorker compile/COM pipeline benchmark")
+    parser.add_argument("--items", type=int, default=10)
+    parser.add_argument("--lines", type=int, default=300, help="스크립트 하나의 줄 수")
+    parser.add_argument("--com-latency-ms", type=float, default=0.05)
+    parser.add_argument("--corpus", default=str(CORPUS), help="스크립트 코퍼스 디렉터리")
+    parser.add_argument("--output", help="결과 JSON 저장 경로 (기본: stdout)")
+    args = parser.parse_args(argv)
+
+    result = run(args.items, args.lines, args.com_latency_ms, corpus=Path(args.corpus))
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
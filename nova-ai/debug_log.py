@@ -0,0 +1,222 @@
+"""
+Low-overhead debug logging shared by layout_detector, ai_client and the GUI.
+
+Messages take %-style arguments and are only formatted when some sink needs
+the text:
+
+- stderr: entries at or above NOVA_AI_LOG_LEVEL (debug / info / warning /
+  error / off, default debug). Disabled automatically when there is no
+  stderr (windowed PyInstaller builds). Lines are written without a flush per
+  call, so threads do not serialize on the console.
+- ring buffer: the last RING_SIZE entries of every level, kept unformatted
+  (see recent()). Slots are claimed with an itertools counter and filled with
+  a single list store, both atomic under the GIL, so recording takes no lock.
+  Exception arguments are kept as their text: a live exception would pin its
+  traceback frames (and the page images in them) until the slot is reused.
+- file: NOVA_AI_LOG_FILE=<path> appends every entry, formatted on a background
+  thread; callers only enqueue.
+
+    _log = get_logger("Layout Debug")
+    _log.debug("Candidate: %s score=%.3f", rect, score)
+"""
+from __future__ import annotations
+
+import atexit
+import itertools
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Any, Optional
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+OFF = 100
+
+LEVEL_NAMES = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR, "off": OFF}
+
+RING_SIZE = 2048
+
+# (seq, time, level, prefix, thread name, msg, args); time and thread name are
+# only read by the file sink, so they are 0.0 / "" while it is off.
+_Entry = tuple
+
+
+def _level_from_env() -> int:
+    value = (os.getenv("NOVA_AI_LOG_LEVEL") or "").strip().lower()
+    if value.isdigit():
+        return int(value)
+    return LEVEL_NAMES.get(value, DEBUG)
+
+
+_stderr_level = _level_from_env()
+_ring: list[Optional[_Entry]] = [None] * RING_SIZE
+_seq = itertools.count()
+
+
+def set_level(level: int | str) -> None:
+    """Change the stderr threshold at runtime (names as in NOVA_AI_LOG_LEVEL)."""
+    global _stderr_level
+    _stderr_level = LEVEL_NAMES[level.lower()] if isinstance(level, str) else int(level)
+
+
+def _format(entry: _Entry) -> str:
+    _seq_no, _ts, _level, prefix, _thread, msg, args = entry
+    if args:
+        try:
+            msg = msg % args
+        except Exception:
+            msg = f"{msg} {args!r}"
+    return f"[{prefix}] {msg}" if prefix else msg
+
+
+def _format_line(entry: _Entry) -> str:
+    ts = entry[1]
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)) + f".{int(ts * 1000) % 1000:03d}"
+    level = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}.get(entry[2], str(entry[2]))
+    return f"{stamp} {level:<7} ({entry[4]}) {_format(entry)}\n"
+
+
+class _FileSink:
+    """Formats and writes entries on a daemon thread; flushed on exit."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._queue: "queue.SimpleQueue[Optional[_Entry]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="nova-ai-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def put(self, entry: _Entry) -> None:
+        self._queue.put(entry)
+
+    def close(self, timeout: float = 2.0) -> None:
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        try:
+            fp = open(self.path, "a", encoding="utf-8")
+        except OSError:
+            return
+        with fp:
+            while True:
+                entry = self._queue.get()
+                lines = []
+                stop = entry is None
+                if entry is not None:
+                    lines.append(_format_line(entry))
+                # Drain whatever queued up meanwhile into the same write.
+                while not stop:
+                    try:
+                        entry = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if entry is None:
+                        stop = True
+                    else:
+                        lines.append(_format_line(entry))
+                try:
+                    fp.write("".join(lines))
+                    fp.flush()
+                except Exception:
+                    # Logging must never break the caller.
+                    pass
+                if stop:
+                    return
+
+
+_file_sink: Optional[_FileSink] = None
+_file_sink_lock = threading.Lock()
+
+
+def set_log_file(path: Optional[str]) -> None:
+    """Start (or stop, with None) the async file sink."""
+    global _file_sink
+    with _file_sink_lock:
+        if _file_sink is not None:
+            _file_sink.close()
+        _file_sink = _FileSink(path) if path else None
+
+
+if os.getenv("NOVA_AI_LOG_FILE"):
+    set_log_file(os.getenv("NOVA_AI_LOG_FILE"))
+
+
+class Logger:
+    """Per-module handle; `prefix` is printed in brackets before each message."""
+
+    __slots__ = ("prefix",)
+
+    def __init__(self, prefix: str = "") -> None:
+        self.prefix = prefix
+
+    def enabled(self, level: int = DEBUG) -> bool:
+        """Whether a message at `level` reaches stderr (use to skip costly arguments)."""
+        return level >= _stderr_level and sys.stderr is not None
+
+    def log(self, level: int, msg: str, *args: Any) -> None:
+        for arg in args:
+            if isinstance(arg, BaseException):
+                args = _detach(args)
+                break
+        sink = _file_sink
+        if sink is not None:
+            entry = (next(_seq), time.time(), level, self.prefix, threading.current_thread().name, msg, args)
+            sink.put(entry)
+        else:
+            entry = (next(_seq), 0.0, level, self.prefix, "", msg, args)
+        _ring[entry[0] % RING_SIZE] = entry
+        if level >= _stderr_level:
+            stream = sys.stderr
+            if stream is not None:
+                try:
+                    stream.write(_format(entry) + "\n")
+                except Exception:
+                    # Windowed executables may not have a writable stderr handle.
+                    pass
+
+    def debug(self, msg: str, *args: Any) -> None:
+        self.log(DEBUG, msg, *args)
+
+    def info(self, msg: str, *args: Any) -> None:
+        self.log(INFO, msg, *args)
+
+    def warning(self, msg: str, *args: Any) -> None:
+        self.log(WARNING, msg, *args)
+
+    def error(self, msg: str, *args: Any) -> None:
+        self.log(ERROR, msg, *args)
+
+
+def _detach(args: tuple) -> tuple:
+    """`args` with exceptions replaced by str(exc) (what %s prints)."""
+    return tuple(str(arg) if isinstance(arg, BaseException) else arg for arg in args)
+
+
+_loggers: dict[str, Logger] = {}
+
+
+def get_logger(prefix: str = "") -> Logger:
+    logger = _loggers.get(prefix)
+    if logger is None:
+        logger = _loggers.setdefault(prefix, Logger(prefix))
+    return logger
+
+
+def recent(limit: Optional[int] = None, *, min_level: int = DEBUG) -> list[str]:
+    """
+    Formatted ring buffer entries, oldest first (e.g. for an error report).
+
+    Entries keep their arguments unformatted until read, so mutable arguments
+    show their state at read time.
+    """
+    entries = [e for e in list(_ring) if e is not None and e[2] >= min_level]
+    entries.sort(key=lambda e: e[0])
+    if limit is not None:
+        entries = entries[-limit:] if limit > 0 else []
+    return [_format(e) for e in entries]
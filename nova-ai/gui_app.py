@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 import concurrent.futures
+import dataclasses
 import os
 import sys
 import queue
+import re
 import threading
 import math
 import tempfile
@@ -45,10 +47,22 @@ from PySide6.QtGui import (
 from PySide6.QtWidgets import QStyledItemDelegate, QStyle
 
 from ai_client import AIClient, AIClientError
+from debug_log import get_logger
 from hwp_controller import HwpController, HwpControllerError
-from ocr_pipeline import extract_text, extract_text_from_pil_image, OcrError
-from layout_detector import detect_container, crop_inside_rect, mask_rect_on_image
-from script_runner import ScriptRunner, ScriptCancelled
+from ocr_pipeline import OcrDecision, OcrError, PreparedImage, extract_words_with_policy
+from ocr_context import format_ocr_context, min_conf_for_mode, split_region_context
+from layout_detector import (
+    CHOICES_MIN_CONFIDENCE,
+    TABLE_MIN_FILLED,
+    crop_inside_rect,
+    detect_choices_band,
+    detect_tables,
+    mask_rect_on_image,
+    mask_rects_on_image,
+)
+from layout_cache import content_digest, default_cache
+from script_profile import ScriptProfiler
+from script_runner import CompiledScript, ScriptRunner, ScriptCancelled
 from backend.oauth_desktop import get_stored_user, start_oauth_flow, logout_user, is_logged_in
 from backend.firebase_profile import (
     refresh_user_profile_from_firebase,
@@ -63,6 +77,11 @@ from backend.firebase_profile import (
     PLAN_LIMITS,
 )
 
+_log = get_logger("GUI Debug")
+
+# Placeholder line the model writes where a detected table goes (see AIWorker).
+_TABLE_MARKER_RE = re.compile(r"^[ \t]*#[ \t]*TABLE[ \t]+(\d+)[ \t]*$", re.MULTILINE | re.IGNORECASE)
+
 
 class LoginWorker(QThread):
     """OAuth ????? ????????????"""
@@ -155,42 +174,26 @@ class AIWorker(QThread):
         self._image_paths = image_paths
 
     def run(self) -> None:  # type: ignore[override]
-        import sys
-        def _log(msg: str) -> None:
-            if sys.stderr is not None:
-                try:
-                    sys.stderr.write(f"[GUI Debug] {msg}\n")
-                    sys.stderr.flush()
-                except Exception:
-                    # In windowed PyInstaller builds, stderr can be an invalid handle.
-                    pass
-        
         try:
             total = len(self._image_paths)
             results: list[str] = [""] * total
-            _log(f"Starting AI generation for {total} images")
-
-            def _job(idx: int, image_path: str) -> str:
-                _log(f"[{idx}] Processing: {image_path}")
-                user = get_stored_user() or {}
-                uid = str(user.get("uid") or "")
-                tier = str(user.get("plan") or user.get("tier") or "free")
+            _log.debug("Starting AI generation for %s images", total)
 
-                # ????? 1??? ??? ????1??? ???.
-                if uid and not check_usage_limit(uid, tier):
-                    limit = get_plan_limit(tier)
-                    raise AIClientError(
-                        f"\uC0AC\uC6A9 \uD55C\uB3C4\uC5D0 \uB3C4\uB2EC\uD588\uC2B5\uB2C8\uB2E4 ({limit}/{limit}).\n"
-                        f"\uD604\uC7AC \uD50C\uB79C: {tier}\n"
-                        "nova-ai.work\uC5D0\uC11C \uD50C\uB79C\uC744 \uC5C5\uADF8\uB808\uC774\uB4DC\uD574\uC8FC\uC138\uC694."
-                    )
+            def _job(
+                idx: int,
+                image_path: str,
+                source: PreparedImage | None = None,
+                part: int = 0,
+                ocr: tuple[list, OcrDecision] | None = None,
+            ) -> str:
+                _log.debug("[%s] Processing: %s (part %s)", idx, image_path, part)
 
                 # 1 image : 1 AIClient (1-to-1 mapping, safe for concurrency)
                 # ???? ??(????????)????? ??????????? ??? ???? ?????.
                 try:
                     client = AIClient(check_usage=False)
                 except Exception as e:
-                    _log(f"[{idx}] AIClient creation failed: {e}")
+                    _log.warning("[%s] AIClient creation failed: %s", idx, e)
                     raise
                 def _extract_code(text: str) -> str:
                     cleaned = (text or "").strip()
@@ -225,76 +228,98 @@ class AIWorker(QThread):
                         out_lines.append(line)
                     return "\n".join(out_lines).strip()
 
-                # 1) Full OCR (fallback context)
-                _log(f"[{idx}] Starting OCR...")
+                def _place_tables(code: str, tables: list) -> str:
+                    # Replace the model's '# TABLE n' marker lines with the detected
+                    # tables; tables the model did not place go at the end.
+                    placed: set[int] = set()
+
+                    def _sub(m: "re.Match[str]") -> str:
+                        n = int(m.group(1)) - 1
+                        if 0 <= n < len(tables) and n not in placed:
+                            placed.add(n)
+                            return tables[n].insert_table_call()
+                        return ""
+
+                    out = _TABLE_MARKER_RE.sub(_sub, code)
+                    missing = [t.insert_table_call() for n, t in enumerate(tables) if n not in placed]
+                    if missing:
+                        _log.debug("[%s] %s table(s) without a marker, appended at the end", idx, len(missing))
+                        out = "\n".join([out.rstrip(), *missing])
+                    return out.strip()
+
+                # Decode once; OCR preprocessing and layout detection share the cached maps.
+                prepared: PreparedImage | str = source if source is not None else image_path
+                if source is None:
+                    try:
+                        prepared = PreparedImage.load(image_path)
+                    except OcrError as e:
+                        _log.warning("[%s] Image load failed: %s", idx, e)
+
+                # 1) Full OCR (fallback context), gated by the OCR policy
+                _log.debug("[%s] Starting OCR...", idx)
                 ocr_text_full = ""
+                ocr_words: list = []
+                ocr_min_conf = min_conf_for_mode("full")
                 try:
-                    ocr_text_full = extract_text(image_path)
-                    _log(f"[{idx}] OCR done, length: {len(ocr_text_full)}")
+                    # An unsplit page reuses the OCR done for segmentation.
+                    if ocr is not None:
+                        ocr_words, ocr_decision = ocr
+                    else:
+                        ocr_words, ocr_decision = extract_words_with_policy(prepared, label=f"full:{idx}.{part}")
+                    ocr_min_conf = min_conf_for_mode(ocr_decision.mode)
+                    ocr_text_full = format_ocr_context(ocr_words, min_conf=ocr_min_conf)
+                    _log.debug(
+                        "[%s] OCR done, mode: %s (%s), length: %d",
+                        idx,
+                        ocr_decision.mode,
+                        ocr_decision.reason,
+                        len(ocr_text_full),
+                    )
                 except Exception as e:
-                    _log(f"[{idx}] OCR failed (skipping): {type(e).__name__}: {e}")
+                    _log.warning("[%s] OCR failed (skipping): %s: %s", idx, type(e).__name__, e)
                     ocr_text_full = ""
 
                 # 2) Detect container + split generation when possible
-                _log(f"[{idx}] Detecting container...")
-                det = detect_container(image_path)
-                _log(f"[{idx}] Container detected: template={det.template}, rect={det.rect}")
+                _log.debug("[%s] Detecting container...", idx)
+                # Retypes of the same image hit the on-disk layout cache.
+                det = default_cache().detect_container(prepared)
+                _log.debug("[%s] Container detected: template=%s, rect=%s", idx, det.template, det.rect)
+
+                # Ruled tables are rebuilt from the line grid + OCR and typed with
+                # insert_table directly; only tables with most cells read are used.
+                tables: list = []
+                try:
+                    tables = [
+                        t for t in detect_tables(prepared, words=ocr_words or None) if t.filled >= TABLE_MIN_FILLED
+                    ]
+                except Exception as e:
+                    _log.warning("[%s] detect_tables failed: %s", idx, e)
+                if tables:
+                    _log.debug("[%s] Tables: %s", idx, [(t.rect, t.rows, t.cols) for t in tables])
+                if det.rect and not det.has_view_text and any(t.overlaps(det.rect) for t in tables):
+                    # The "box" is the table outline, not a problem container.
+                    _log.debug("[%s] Container is a table, typing it with insert_table", idx)
+                    det = dataclasses.replace(det, template=None, rect=None)
                 if det.template and det.rect:
-                    _log(f"[{idx}] Building region images...")
-                    # Build region images
+                    _log.debug("[%s] Building region images...", idx)
+                    # Build region images in memory (numpy arrays); no temp PNG round trip.
                     try:
-                        outside_img = mask_rect_on_image(image_path, det.rect)
-                        _log(f"[{idx}] Outside image: {type(outside_img)}")
+                        outside_img = mask_rect_on_image(prepared, det.rect, as_array=True)
+                        _log.debug("[%s] Outside image: %s", idx, type(outside_img))
                     except Exception as e:
-                        _log(f"[{idx}] mask_rect_on_image failed: {e}")
+                        _log.warning("[%s] mask_rect_on_image failed: %s", idx, e)
                         outside_img = None
-                    
-                    try:
-                        inside_img = crop_inside_rect(image_path, det.rect)
-                        _log(f"[{idx}] Inside image: {type(inside_img)}")
-                    except Exception as e:
-                        _log(f"[{idx}] crop_inside_rect failed: {e}")
-                        inside_img = None
 
-                    tmp_dir = Path(tempfile.gettempdir()) / "nova_ai"
-                    try:
-                        tmp_dir.mkdir(parents=True, exist_ok=True)
-                    except Exception:
-                        tmp_dir = Path.cwd()
+                    # Per-region OCR context from the full-page word boxes
+                    # (no extra Tesseract runs on the region images).
+                    region_ctx = split_region_context(ocr_words, det.rect, min_conf=ocr_min_conf)
+                    outside_ocr = region_ctx.outside
+                    inside_ocr = region_ctx.inside
+                    choices_ocr = region_ctx.choices
 
-                    outside_path = ""
-                    inside_path = ""
-                    try:
-                        if outside_img is not None:
-                            fp = tmp_dir / f"nova_ai_outside_{os.getpid()}_{idx}.png"
-                            outside_img.save(fp, format="PNG")
-                            outside_path = str(fp)
-                    except Exception:
-                        outside_path = ""
-                    try:
-                        if inside_img is not None:
-                            fp = tmp_dir / f"nova_ai_inside_{os.getpid()}_{idx}.png"
-                            inside_img.save(fp, format="PNG")
-                            inside_path = str(fp)
-                    except Exception:
-                        inside_path = ""
-
-                    outside_ocr = ""
-                    inside_ocr = ""
-                    try:
-                        if outside_img is not None:
-                            outside_ocr = extract_text_from_pil_image(outside_img)
-                    except OcrError:
-                        outside_ocr = ""
-                    try:
-                        if inside_img is not None:
-                            inside_ocr = extract_text_from_pil_image(inside_img)
-                    except OcrError:
-                        inside_ocr = ""
-
-                    _log(f"[{idx}] Calling AI for OUTSIDE content...")
+                    _log.debug("[%s] Calling AI for OUTSIDE content...", idx)
                     outside_script_raw = client.generate_script_for_image(
-                        outside_path or image_path,
+                        outside_img if outside_img is not None else prepared,
                         description=(
                             "Type ONLY the content OUTSIDE/BEFORE the box container. "
                             "This includes the problem statement and equation. "
@@ -303,12 +328,12 @@ class AIWorker(QThread):
                         ),
                         ocr_text=outside_ocr or ocr_text_full,
                     )
-                    _log(f"[{idx}] Outside AI response length: {len(outside_script_raw) if outside_script_raw else 0}")
+                    _log.debug("[%s] Outside AI response length: %s", idx, len(outside_script_raw) if outside_script_raw else 0)
                     
-                    _log(f"[{idx}] Calling AI for INSIDE content...")
+                    _log.debug("[%s] Calling AI for INSIDE content...", idx)
                     # For inside content, use the FULL image so AI can find the ?? ?? ?? conditions
                     inside_script_raw = client.generate_script_for_image(
-                        image_path,  # Use full image, not cropped inside
+                        prepared,  # Use full image, not cropped inside
                         description=(
                             "Type ONLY the ?? ?? ?? (or ?? ?? ?? ?? conditions that should go INSIDE the box. "
                             "These are the numbered conditions like '?? k=0???...' or '?? k=3???...' "
@@ -317,29 +342,41 @@ class AIWorker(QThread):
                         ),
                         ocr_text=inside_ocr or ocr_text_full,
                     )
-                    _log(f"[{idx}] Inside AI response length: {len(inside_script_raw) if inside_script_raw else 0}")
+                    _log.debug("[%s] Inside AI response length: %s", idx, len(inside_script_raw) if inside_script_raw else 0)
                     
-                    _log(f"[{idx}] Calling AI for CHOICES content...")
-                    # For choices (????????, use the FULL image
+                    _log.debug("[%s] Calling AI for CHOICES content...", idx)
+                    # For choices, send only the circled-digit band when it is found
+                    # confidently; otherwise use the FULL image
+                    choices_img: object = prepared
+                    try:
+                        band = detect_choices_band(prepared, words=ocr_words, exclude=det.rect)
+                    except Exception as e:
+                        _log.warning("[%s] detect_choices_band failed: %s", idx, e)
+                        band = None
+                    if band is not None and band.confidence >= CHOICES_MIN_CONFIDENCE:
+                        crop = crop_inside_rect(prepared, band.rect, inset=0, as_array=True)
+                        if crop is not None:
+                            choices_img = crop
+                            _log.debug("[%s] Choices band: %s (%s, conf=%s)", idx, band.rect, band.source, band.confidence)
                     choices_script_raw = client.generate_script_for_image(
-                        image_path,
+                        choices_img,
                         description=(
                             "Type ONLY the answer choices (????????or ???? ???? ?? ???? ?? ???? ?? ???? ?? ??. "
                             "These are the multiple choice options at the bottom of the problem. "
                             "Do NOT include the problem text. "
                             "Do NOT include ?? ?? ?? conditions."
                         ),
-                        ocr_text=ocr_text_full,
+                        ocr_text=choices_ocr or ocr_text_full,
                     )
-                    _log(f"[{idx}] Choices AI response length: {len(choices_script_raw) if choices_script_raw else 0}")
+                    _log.debug("[%s] Choices AI response length: %s", idx, len(choices_script_raw) if choices_script_raw else 0)
 
                     outside_part = _sanitize_part(outside_script_raw or "")
                     inside_part = _sanitize_part(inside_script_raw or "")
                     choices_part = _sanitize_part(choices_script_raw or "")
                     
-                    _log(f"[{idx}] Outside part preview: {outside_part[:200] if outside_part else 'EMPTY'}...")
-                    _log(f"[{idx}] Inside part preview: {inside_part[:200] if inside_part else 'EMPTY'}...")
-                    _log(f"[{idx}] Choices part preview: {choices_part[:200] if choices_part else 'EMPTY'}...")
+                    _log.debug("[%s] Outside part preview: %s...", idx, outside_part[:200] if outside_part else 'EMPTY')
+                    _log.debug("[%s] Inside part preview: %s...", idx, inside_part[:200] if inside_part else 'EMPTY')
+                    _log.debug("[%s] Choices part preview: %s...", idx, choices_part[:200] if choices_part else 'EMPTY')
 
                     # Template structure:
                     # 1. Insert box template
@@ -357,17 +394,15 @@ class AIWorker(QThread):
                             choices_part,
                         ]
                     ).strip()
-                    _log(f"[{idx}] Combined script length: {len(combined)}")
-                    if uid and combined.strip():
-                        increment_ai_usage(uid)
+                    _log.debug("[%s] Combined script length: %s", idx, len(combined))
                     return combined
 
                 if det.template and not det.rect:
                     # Header text detected but rectangle not confidently found:
                     # enforce template/placeholder workflow and let the model separate.
-                    _log(f"[{idx}] Template detected (no rect): {det.template}")
-                    script_raw = client.generate_script_for_image(image_path, ocr_text=ocr_text_full) or ""
-                    _log(f"[{idx}] AI response length: {len(script_raw)}")
+                    _log.debug("[%s] Template detected (no rect): %s", idx, det.template)
+                    script_raw = client.generate_script_for_image(prepared, ocr_text=ocr_text_full) or ""
+                    _log.debug("[%s] AI response length: %s", idx, len(script_raw))
                     script_body = _sanitize_part(script_raw)
                     combined = "\n".join(
                         [
@@ -378,51 +413,156 @@ class AIWorker(QThread):
                             "",
                         ]
                     ).strip()
-                    if uid and combined.strip():
-                        increment_ai_usage(uid)
                     return combined
 
+                if tables:
+                    # Tables are masked out of the image and the OCR context; the model
+                    # only marks where each one goes.
+                    _log.debug("[%s] No container detected, calling AI without %s table(s)...", idx, len(tables))
+                    try:
+                        masked_img = mask_rects_on_image(prepared, [t.rect for t in tables], as_array=True)
+                    except Exception as e:
+                        _log.warning("[%s] mask_rects_on_image failed: %s", idx, e)
+                        masked_img = None
+                    text_words = [w for w in ocr_words if not any(t.contains(*w.center) for t in tables)]
+                    raw_result = client.generate_script_for_image(
+                        masked_img if masked_img is not None else prepared,
+                        description=(
+                            f"The image contains {len(tables)} table(s) that were blanked out; "
+                            "they are typed separately. Do NOT type any table. "
+                            "Where table n (numbered 1.. from top to bottom) belongs, "
+                            "write a line containing only '# TABLE n'."
+                        ),
+                        ocr_text=format_ocr_context(text_words, min_conf=ocr_min_conf) or ocr_text_full,
+                    ) or ""
+                    _log.debug("[%s] AI response length: %s", idx, len(raw_result))
+                    final_code = _place_tables(_extract_code(raw_result), tables)
+                    return final_code
+
                 # No container detected: default behavior
-                _log(f"[{idx}] No container detected, calling AI...")
-                raw_result = client.generate_script_for_image(image_path, ocr_text=ocr_text_full) or ""
-                _log(f"[{idx}] AI response length: {len(raw_result)}")
+                _log.debug("[%s] No container detected, calling AI...", idx)
+                raw_result = client.generate_script_for_image(prepared, ocr_text=ocr_text_full) or ""
+                _log.debug("[%s] AI response length: %s", idx, len(raw_result))
                 if not raw_result.strip():
-                    _log(f"[{idx}] WARNING: Empty AI response!")
+                    _log.warning("[%s] WARNING: Empty AI response!", idx)
                 final_code = _extract_code(raw_result)
-                if uid and final_code.strip():
-                    increment_ai_usage(uid)
                 return final_code
 
-            # If you need to cap concurrency (rate limiting), set NOVA_AI_MAX_WORKERS.
-            max_workers_env = os.getenv("NOVA_AI_MAX_WORKERS")
-            max_workers = total
-            if max_workers_env:
-                try:
-                    max_workers = max(1, min(total, int(max_workers_env)))
-                except Exception:
-                    max_workers = total
+            def _check_quota() -> str:
+                """uid of the signed-in user (empty when signed out); raises when the plan limit is reached."""
+                user = get_stored_user() or {}
+                uid = str(user.get("uid") or "")
+                tier = str(user.get("plan") or user.get("tier") or "free")
 
-            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as ex:
-                future_to_idx: dict[concurrent.futures.Future[str], int] = {}
-                for idx, image_path in enumerate(self._image_paths):
-                    self.progress.emit(idx, "\uC0DD\uC131\uC911...")
-                    future_to_idx[ex.submit(_job, idx, image_path)] = idx
+                # ????? 1??? ??? ????1??? ???.
+                if uid and not check_usage_limit(uid, tier):
+                    limit = get_plan_limit(tier)
+                    raise AIClientError(
+                        f"\uC0AC\uC6A9 \uD55C\uB3C4\uC5D0 \uB3C4\uB2EC\uD588\uC2B5\uB2C8\uB2E4 ({limit}/{limit}).\n"
+                        f"\uD604\uC7AC \uD50C\uB79C: {tier}\n"
+                        "nova-ai.work\uC5D0\uC11C \uD50C\uB79C\uC744 \uC5C5\uADF8\uB808\uC774\uB4DC\uD574\uC8FC\uC138\uC694."
+                    )
+                return uid
 
-                for fut in concurrent.futures.as_completed(future_to_idx):
-                    idx = future_to_idx[fut]
+            # If you need to cap concurrency (rate limiting), set NOVA_AI_MAX_WORKERS.
+            def _max_workers(jobs: int) -> int:
+                max_workers_env = os.getenv("NOVA_AI_MAX_WORKERS")
+                if max_workers_env:
                     try:
-                        text = fut.result() or ""
-                        results[idx] = text
-                        if text.strip():
-                            self.progress.emit(idx, "\uCF54\uB4DC \uC0DD\uC131 \uC644\uB8CC")
-                        else:
-                            self.progress.emit(idx, "\uC624\uB958(\uBE48 \uACB0\uACFC)")
-                        # Notify UI for incremental typing / preview.
-                        self.item_finished.emit(idx, text)
+                        return max(1, min(jobs, int(max_workers_env)))
+                    except Exception:
+                        pass
+                return jobs
+
+            segment_pages = (os.getenv("NOVA_AI_SEGMENT_PAGES") or "1").strip() != "0"
+
+            def _split(
+                idx: int, image_path: str
+            ) -> list[tuple[str, PreparedImage | None, tuple[list, OcrDecision] | None]]:
+                """
+                Full exam pages become one job per problem; other images stay whole.
+                Problems are only split at OCR'd problem numbers (see segment_page),
+                so the page is OCR'd once here and an unsplit page keeps those words.
+                """
+                if not segment_pages:
+                    return [(image_path, None, None)]
+                try:
+                    prepared = PreparedImage.load(image_path)
+                except Exception as e:
+                    _log.warning("[%s] Image load failed (using whole image): %s", idx, e)
+                    return [(image_path, None, None)]
+                try:
+                    ocr = extract_words_with_policy(prepared, label=f"page:{idx}")
+                except Exception as e:
+                    _log.warning("[%s] Page OCR failed (not splitting): %s: %s", idx, type(e).__name__, e)
+                    return [(image_path, prepared, None)]
+                try:
+                    segments = default_cache().segment_page(
+                        prepared, words=ocr[0], digest=content_digest(image_path)
+                    )
+                except Exception as e:
+                    _log.warning("[%s] Page segmentation failed (using whole image): %s", idx, e)
+                    segments = []
+                if len(segments) <= 1:
+                    return [(image_path, prepared, ocr)]
+                _log.debug("[%s] Page split into %s problems", idx, len(segments))
+                parts: list[tuple[str, PreparedImage | None, tuple[list, OcrDecision] | None]] = []
+                for seg in segments:
+                    x, y, w, h = seg.rect
+                    # Problem crop stays in memory; the label only names it in logs.
+                    label = f"{image_path}#{seg.index}"
+                    crop = PreparedImage.from_any(prepared.pixels()[y : y + h, x : x + w], path=label)
+                    parts.append((label, crop, None))
+                return parts
+
+            for idx in range(total):
+                self.progress.emit(idx, "\uC0DD\uC131\uC911...")
+            with concurrent.futures.ThreadPoolExecutor(max_workers=_max_workers(total)) as ex:
+                image_parts = list(ex.map(_split, range(total), self._image_paths))
+
+            # Each problem is its own job; parts are re-joined in page order per image.
+            job_count = sum(len(parts) for parts in image_parts)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=_max_workers(job_count)) as ex:
+                part_texts: list[list[str]] = [[""] * len(parts) for parts in image_parts]
+                part_errors: list[list[Exception]] = [[] for _ in image_parts]
+                remaining = [len(parts) for parts in image_parts]
+                future_to_part: dict[concurrent.futures.Future[str], tuple[int, int]] = {}
+                # Quota is checked and charged per source image, however many problems it has.
+                uids = [""] * total
+                for idx, parts in enumerate(image_parts):
+                    try:
+                        uids[idx] = _check_quota()
                     except Exception as exc:
-                        results[idx] = ""
+                        _log.error("[%s] Skipped: %s: %s", idx, type(exc).__name__, exc)
                         self.progress.emit(idx, f"\uC624\uB958: {exc}")
                         self.item_finished.emit(idx, "")
+                        continue
+                    for part, (path, source, ocr) in enumerate(parts):
+                        future_to_part[ex.submit(_job, idx, path, source, part, ocr)] = (idx, part)
+
+                for fut in concurrent.futures.as_completed(future_to_part):
+                    idx, part = future_to_part[fut]
+                    try:
+                        part_texts[idx][part] = (fut.result() or "").strip()
+                    except Exception as exc:
+                        _log.error("[%s] Part %s failed: %s: %s", idx, part, type(exc).__name__, exc)
+                        part_errors[idx].append(exc)
+                    remaining[idx] -= 1
+                    if remaining[idx] > 0:
+                        continue
+                    # A page with a failed problem is not typed partially.
+                    text = "" if part_errors[idx] else ("\ninsert_enter()\n" * 4).join(t for t in part_texts[idx] if t)
+                    results[idx] = text
+                    if uids[idx] and text.strip():
+                        increment_ai_usage(uids[idx])
+                    if text.strip():
+                        self.progress.emit(idx, "\uCF54\uB4DC \uC0DD\uC131 \uC644\uB8CC")
+                    elif part_errors[idx]:
+                        self.progress.emit(idx, f"\uC624\uB958: {part_errors[idx][0]}")
+                    else:
+                        self.progress.emit(idx, "\uC624\uB958(\uBE48 \uACB0\uACFC)")
+                    # Notify UI for incremental typing / preview.
+                    self.item_finished.emit(idx, text)
             self.finished.emit(results)
         except Exception as exc:
             self.error.emit(str(exc))
@@ -2383,6 +2523,7 @@ class NovaAILiteWindow(QWidget):
         self._typing_worker = TypingWorker()
         self._typing_worker.item_started.connect(self._on_typing_item_started)
         self._typing_worker.item_finished.connect(self._on_typing_item_finished)
+        self._typing_worker.item_timing.connect(self._on_typing_item_timing)
         self._typing_worker.cancelled.connect(self._on_typing_cancelled)
         self._typing_worker.error.connect(self._on_typing_error)
         self._typing_worker.start()
@@ -2410,6 +2551,9 @@ class NovaAILiteWindow(QWidget):
         if not self._auto_type_after_ai and self._auto_type_pending_idx is None:
             self._set_typing_status("\uD0C0\uC774\uD551 \uC644\uB8CC")
 
+    def _on_typing_item_timing(self, idx: int, compile_ms: float, com_ms: float) -> None:
+        _log.debug("[%s] Typing latency: compile %.1f ms (background), COM %.1f ms", idx, compile_ms, com_ms)
+
     def _on_typing_cancelled(self) -> None:
         # Stop auto-type chain, keep generated code for manual re-run.
         pending_idx = self._auto_type_pending_idx
@@ -2822,13 +2966,17 @@ def _is_rpc_unavailable_message(message: str) -> bool:
 class TypingWorker(QThread):
     item_started = Signal(int)
     item_finished = Signal(int)
+    item_timing = Signal(int, float, float)  # idx, compile ms, COM ms
     cancelled = Signal()
     error = Signal(str)
 
     def __init__(self) -> None:
         super().__init__()
         self._q: "queue.Queue[tuple[int, str, str | None, str | None]]" = queue.Queue()
+        # Compiled in queue order by _compile_loop; the COM thread only executes.
+        self._ready: "queue.Queue[tuple[int, CompiledScript | Exception, str | None, ScriptProfiler | None]]" = queue.Queue()
         self._cancel = threading.Event()
+        self._stop = threading.Event()
 
     def enqueue(self, idx: int, script: str, target_filename: str | None = None, source_image_path: str | None = None) -> None:
         if not script.strip():
@@ -2838,11 +2986,45 @@ class TypingWorker(QThread):
     def cancel(self) -> None:
         self._cancel.set()
         # best-effort drain
+        for q in (self._q, self._ready):
+            try:
+                while True:
+                    q.get_nowait()
+            except Exception:
+                pass
+
+    def _compile_loop(self) -> None:
+        # Normalize and compile the next scripts while the current one is typing.
+        while not (self._cancel.is_set() or self._stop.is_set()):
+            try:
+                item = self._q.get(timeout=0.1)
+            except Exception:
+                continue
+            source_image_path = None
+            if isinstance(item, tuple) and len(item) == 4:
+                idx, script, target_filename, source_image_path = item
+            elif isinstance(item, tuple) and len(item) == 3:
+                idx, script, target_filename = item
+            else:
+                idx, script = item  # type: ignore[misc]
+                target_filename = None
+            # NOVA_AI_SCRIPT_PROFILE=<dir>: stage/call trace per item (see _save_profile).
+            profiler = ScriptProfiler() if os.getenv("NOVA_AI_SCRIPT_PROFILE") else None
+            try:
+                prepared: CompiledScript | Exception = ScriptRunner.prepare(script, profiler)
+            except Exception as exc:
+                prepared = exc  # reported by the COM thread, in order
+            self._ready.put((idx, prepared, target_filename, profiler))
+
+    def _save_profile(self, idx: int, profiler: ScriptProfiler) -> None:
+        _log.debug("[%s] Script profile:\n%s", idx, profiler.table())
         try:
-            while True:
-                self._q.get_nowait()
-        except Exception:
-            pass
+            folder = Path(os.getenv("NOVA_AI_SCRIPT_PROFILE") or ".")
+            folder.mkdir(parents=True, exist_ok=True)
+            path = folder / f"typing_{time.strftime('%Y%m%d_%H%M%S')}_{idx}.trace.json"
+            profiler.write_chrome_trace(path)
+        except Exception as exc:
+            _log.warning("[%s] Profile save failed: %s", idx, exc)
 
     def run(self) -> None:  # type: ignore[override]
         # COM init (best-effort) to safely control HWP from this thread.
@@ -2857,6 +3039,8 @@ class TypingWorker(QThread):
             except Exception:
                 pass
 
+        compiler = threading.Thread(target=self._compile_loop, name="TypingCompile", daemon=True)
+        compiler.start()
         controller: HwpController | None = None
         runner: ScriptRunner | None = None
         try:
@@ -2865,22 +3049,19 @@ class TypingWorker(QThread):
                     self.cancelled.emit()
                     return
                 try:
-                    item = self._q.get(timeout=0.1)
+                    idx, prepared, target_filename, profiler = self._ready.get(timeout=0.1)
                 except Exception:
                     continue
-                source_image_path = None
-                if isinstance(item, tuple) and len(item) == 4:
-                    idx, script, target_filename, source_image_path = item
-                elif isinstance(item, tuple) and len(item) == 3:
-                    idx, script, target_filename = item
-                else:
-                    idx, script = item  # type: ignore[misc]
-                    target_filename = None
 
                 if self._cancel.is_set():
                     self.cancelled.emit()
                     return
 
+                if isinstance(prepared, Exception):
+                    self.error.emit(str(prepared))
+                    return
+
+                com_started = time.perf_counter()
                 try:
                     resolved_target = (
                         target_filename
@@ -2903,7 +3084,7 @@ class TypingWorker(QThread):
 
                     self.item_started.emit(idx)
                     assert runner is not None
-                    runner.run(script, cancel_check=self._cancel.is_set, source_image_path=source_image_path)
+                    runner.execute(prepared, cancel_check=self._cancel.is_set, timings=profiler)
                 except ScriptCancelled:
                     self.cancelled.emit()
                     return
@@ -2915,7 +3096,7 @@ class TypingWorker(QThread):
                             controller.connect()
                             controller.activate_target_window(resolved_target)
                             runner = ScriptRunner(controller)
-                            runner.run(script, cancel_check=self._cancel.is_set, source_image_path=source_image_path)
+                            runner.execute(prepared, cancel_check=self._cancel.is_set, timings=profiler)
                         except Exception as retry_exc:
                             self.error.emit(str(retry_exc))
                             return
@@ -2930,15 +3111,20 @@ class TypingWorker(QThread):
                             controller.connect()
                             controller.activate_target_window(resolved_target)
                             runner = ScriptRunner(controller)
-                            runner.run(script, cancel_check=self._cancel.is_set, source_image_path=source_image_path)
+                            runner.execute(prepared, cancel_check=self._cancel.is_set, timings=profiler)
                         except Exception as retry_exc:
                             self.error.emit(str(retry_exc))
                             return
                     else:
                         self.error.emit(msg)
                         return
+                com_ms = (time.perf_counter() - com_started) * 1000.0
+                self.item_timing.emit(idx, prepared.compile_s * 1000.0, com_ms)
+                if profiler is not None:
+                    self._save_profile(idx, profiler)
                 self.item_finished.emit(idx)
         finally:
+            self._stop.set()
             if pythoncom is not None:
                 try:
                     pythoncom.CoUninitialize()
@@ -38,7 +38,7 @@ def _format_connect_error(primary_exc: Exception, secondary_exc: Exception | Non
 
 
 class HwpController:
-    def __init__(self, visible: bool = True, register_module: bool = True) -> None:
+    def __init__(self, visible: bool = True, register_module: bool = True, combine_text: bool = True) -> None:
         self._hwp: Any | None = None
         self._visible = visible
         self._register_module = register_module
@@ -53,6 +53,10 @@ class HwpController:
         self._last_was_equation = False
         self._underline_active = False
         self._bold_active = False
+        # Write-combining: adjacent insert_text() runs are typed with one
+        # InsertText when any other COM access (or flush()) comes next.
+        self._combine_text = combine_text
+        self._text_buffer: List[str] = []
         self._template_dir = Path(__file__).resolve().parent / "templates"
 
     @staticmethod
@@ -417,8 +421,29 @@ class HwpController:
     def _ensure_connected(self) -> Any:
         if self._hwp is None:
             raise HwpControllerError("HwpController.connect()를 먼저 호출하세요.")
+        if self._text_buffer:
+            # Every other action goes through here, so buffered text is typed first.
+            self.flush()
         return self._hwp
 
+    def flush(self) -> None:
+        """Type buffered text now. ScriptRunner calls this at the end of a script."""
+        if not self._text_buffer:
+            return
+        text = "".join(self._text_buffer)
+        self._text_buffer.clear()
+        self._insert_text_raw(text)
+
+    def _write_text(self, text: str) -> None:
+        if not text:
+            return
+        if not self._combine_text:
+            self._insert_text_raw(text)
+            return
+        if self._hwp is None:
+            raise HwpControllerError("HwpController.connect()를 먼저 호출하세요.")
+        self._text_buffer.append(text)
+
     def _insert_text_raw(self, text: str) -> None:
         if not text:
             return
@@ -492,7 +517,7 @@ class HwpController:
         if self._in_condition_box:
             return
         if self._line_start and self._first_line_written:
-            self._insert_text_raw(" " * spaces)
+            self._write_text(" " * spaces)
             self._line_start = False
 
     def insert_text(self, text: str) -> None:
@@ -541,7 +566,7 @@ class HwpController:
         if self._in_condition_box and self._box_line_start and not text.startswith(" "):
             text = f" {text}"
             self._box_line_start = False
-        self._insert_text_raw(text)
+        self._write_text(text)
         self._line_start = False
         self._last_was_equation = False
         if not self._first_line_written:
@@ -0,0 +1,241 @@
+"""
+HwpController without HWP, for dry runs and benchmarks.
+
+`RecordingHwpController` is the real HwpController (same public methods, same
+line-start / box / one-line alignment / write-combining logic) whose COM
+object is a `RecordingDispatch`. Each public call is appended to `ops` with
+the state it left behind, and costs simulated time: `op_latency_ms` per call
+plus `com_latency_ms` per COM round trip (attribute read, write or call).
+Text that earlier calls left in the write-combining buffer and that a call
+types before doing its own work is logged as a separate `flush` op just
+before it, so each op only shows its own text, round trips and time.
+Nothing sleeps unless `sleep=True`, so runs stay fast on Linux.
+
+    controller = RecordingHwpController(com_latency_ms=0.05)
+    ScriptRunner(controller).run(script)
+    controller.summary()
+"""
+from __future__ import annotations
+
+import functools
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, List
+
+from hwp_controller import HwpController
+
+# 박스 안으로 커서가 들어가는 호출 (exit_box로 나옴)
+_BOX_TEMPLATES = ("box.hwp", "box_white.hwp")
+_ALIGN_ACTIONS = {
+    "ParagraphShapeAlignLeft": "left",
+    "ParagraphShapeAlignRight": "right",
+    "ParagraphShapeAlignCenter": "center",
+    "ParagraphShapeAlignJustify": "justify",
+}
+
+
+@dataclass(frozen=True)
+class RecordedOp:
+    """One public controller call and the state right after it."""
+
+    name: str
+    args: tuple
+    kwargs: dict
+    com_calls: int
+    typed: str
+    line_start: bool
+    box_depth: int
+    align: str
+    simulated_ms: float
+
+    def describe(self) -> str:
+        params = [repr(a) for a in self.args] + [f"{k}={v!r}" for k, v in self.kwargs.items()]
+        return (
+            f"{self.name}({', '.join(params)})  "
+            f"line_start={self.line_start} box={self.box_depth} align={self.align} "
+            f"com={self.com_calls} {self.simulated_ms:.2f}ms"
+        )
+
+
+@dataclass
+class ComLog:
+    """What the fake HWP object saw: round trips, typed text, paragraph alignment."""
+
+    com_latency_ms: float = 0.0
+    sleep: bool = False
+    round_trips: int = 0
+    insert_text: int = 0
+    typed: List[str] = field(default_factory=list)
+    align: str = "left"
+    simulated_ms: float = 0.0
+
+    def hop(self) -> None:
+        self.round_trips += 1
+        self.wait(self.com_latency_ms)
+
+    def wait(self, ms: float) -> None:
+        if ms <= 0:
+            return
+        self.simulated_ms += ms
+        if self.sleep:
+            time.sleep(ms / 1000.0)
+
+
+class RecordingDispatch:
+    """
+    Stands in for the HWP COM object: any attribute read, write or call
+    answers with another RecordingDispatch and counts as one round trip.
+    """
+
+    def __init__(self, log: ComLog, name: str = "") -> None:
+        object.__setattr__(self, "_log", log)
+        object.__setattr__(self, "_name", name)
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        self._log.hop()
+        return RecordingDispatch(self._log, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        self._log.hop()
+        if name == "Text":
+            self._log.typed.append(value)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        self._log.hop()
+        action = args[0] if args and isinstance(args[0], str) else ""
+        if self._name == "Execute" and action == "InsertText":
+            self._log.insert_text += 1
+        elif self._name == "Run" and action in _ALIGN_ACTIONS:
+            self._log.align = _ALIGN_ACTIONS[action]
+        return RecordingDispatch(self._log)
+
+
+class RecordingHwpController(HwpController):
+    """Used by `app.py run-script --dry-run` and the typing benchmarks."""
+
+    def __init__(
+        self,
+        *,
+        com_latency_ms: float = 0.0,
+        op_latency_ms: float = 0.0,
+        sleep: bool = False,
+        combine_text: bool = True,
+    ) -> None:
+        super().__init__(visible=False, register_module=False, combine_text=combine_text)
+        self.com = ComLog(com_latency_ms=com_latency_ms, sleep=sleep)
+        self.ops: List[RecordedOp] = []
+        self.box_depth = 0
+        self._op_latency_ms = op_latency_ms
+        self._recording = False
+        # Set while the current op may still flush text buffered before it.
+        self._carried = False
+        # (round trips, simulated ms, typed[start:end]) of that flush, once recorded
+        self._carried_flush: tuple[int, float, int, int] | None = None
+
+    def connect(self) -> None:
+        if self._hwp is None:
+            self._hwp = RecordingDispatch(self.com)
+
+    def activate_target_window(self, target_filename: str | None) -> None:
+        return
+
+    def typed_text(self) -> str:
+        return "".join(self.com.typed)
+
+    def summary(self) -> dict:
+        return {
+            "ops": len(self.ops),
+            "com_round_trips": self.com.round_trips,
+            "insert_text": self.com.insert_text,
+            "typed_chars": sum(len(t) for t in self.com.typed),
+            "simulated_ms": round(self.com.simulated_ms, 3),
+        }
+
+    def _track_box(self, name: str, args: tuple) -> None:
+        if name in ("insert_box", "insert_view_box"):
+            self.box_depth += 1
+        elif name == "insert_template" and args:
+            base = str(args[0]).lower().replace("\\", "/").rsplit("/", 1)[-1]
+            if base in _BOX_TEMPLATES:
+                self.box_depth += 1
+        elif name == "exit_box":
+            self.box_depth = max(0, self.box_depth - 1)
+
+
+    def _record(self, name: str, args: tuple, kwargs: dict, trips: int, typed: str, ms: float) -> None:
+        self.ops.append(
+            RecordedOp(
+                name=name,
+                args=args,
+                kwargs=dict(kwargs),
+                com_calls=trips,
+                typed=typed,
+                line_start=self._line_start,
+                box_depth=self.box_depth,
+                align=self.com.align,
+                simulated_ms=ms,
+            )
+        )
+
+    def _carried_flush_call(self, method: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """flush() of text earlier ops buffered, recorded as its own op."""
+        com = self.com
+        self._carried = False
+        trips, typed, started_ms = com.round_trips, len(com.typed), com.simulated_ms
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._carried_flush = (com.round_trips - trips, com.simulated_ms - started_ms, typed, len(com.typed))
+            self._record(
+                "flush", (), {}, com.round_trips - trips, "".join(com.typed[typed:]), com.simulated_ms - started_ms
+            )
+
+
+def _recorded(name: str) -> Callable[..., Any]:
+    method = getattr(HwpController, name)
+
+    @functools.wraps(method)
+    def _call(self: RecordingHwpController, *args: Any, **kwargs: Any) -> Any:
+        if self._recording:
+            if name == "flush" and self._carried and self._text_buffer:
+                return self._carried_flush_call(method, *args, **kwargs)
+            # insert_paragraph -> insert_enter 같은 내부 호출은 바깥 호출에 포함
+            return method(self, *args, **kwargs)
+        self.connect()
+        com = self.com
+        trips = com.round_trips
+        typed = len(com.typed)
+        started_ms = com.simulated_ms
+        self._recording = True
+        # 이전 호출들이 버퍼에 남긴 텍스트를 이 호출이 타이핑하면 따로 flush로 기록
+        self._carried = name != "flush" and bool(self._text_buffer)
+        self._carried_flush = None
+        try:
+            com.wait(self._op_latency_ms)
+            return method(self, *args, **kwargs)
+        finally:
+            self._recording = False
+            self._carried = False
+            self._track_box(name, args)
+            op_trips = com.round_trips - trips
+            op_ms = com.simulated_ms - started_ms
+            op_typed = com.typed[typed:]
+            if self._carried_flush is not None:
+                flush_trips, flush_ms, flush_start, flush_end = self._carried_flush
+                op_trips -= flush_trips
+                op_ms -= flush_ms
+                op_typed = com.typed[typed:flush_start] + com.typed[flush_end:]
+                self._carried_flush = None
+            self._record(name, args, kwargs, op_trips, "".join(op_typed), op_ms)
+
+    return _call
+
+
+for _name, _value in list(vars(HwpController).items()):
+    if _name.startswith("_") or isinstance(_value, staticmethod) or not callable(_value):
+        continue
+    if _name in ("connect", "activate_target_window"):
+        continue
+    setattr(RecordingHwpController, _name, _recorded(_name))
@@ -0,0 +1,327 @@
+"""
+Batch container detection over a directory or glob of images.
+
+Used for preprocessing question banks offline: every image goes through
+`detect_container` in a worker process and one JSON line is appended to the
+output per image, as soon as it finishes. Re-running with the same output file
+skips images that already have a record, so an interrupted run resumes where it
+stopped; failed images are tried again and their old record is replaced. A
+worker process that dies (e.g. out of memory) takes the pool down with it: the
+images it was running are tried again one at a time, so only the image that
+kills a worker on its own gets an error record. With a layout cache, images
+already detected with the same detector parameters (even under another name)
+are answered from the cache without decoding them.
+"""
+from __future__ import annotations
+
+import glob
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+from layout_cache import LayoutCache, content_digest
+from layout_detector import LayoutMode, detect_container
+from ocr_pipeline import OcrError, PreparedImage
+
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+
+
+@dataclass
+class BatchSummary:
+    """Counts for one run_batch() call (skipped = already present in the output)."""
+
+    processed: int = 0
+    failed: int = 0
+    skipped: int = 0
+    elapsed_s: float = 0.0
+
+
+def iter_images(source: str, *, recursive: bool = False) -> Iterator[Path]:
+    """
+    Image files under a directory, or matching a glob pattern, in sorted order.
+
+    Only names are listed up front; images are decoded by the workers.
+    """
+    path = Path(source)
+    if path.is_dir():
+        pattern = "**/*" if recursive else "*"
+        candidates = path.glob(pattern)
+    elif path.is_file():
+        candidates = iter([path])
+    else:
+        candidates = (Path(p) for p in glob.iglob(source, recursive=recursive))
+    for item in sorted(candidates):
+        if item.is_file() and item.suffix.lower() in IMAGE_SUFFIXES:
+            yield item
+
+
+def _record_key(path: Path) -> str:
+    return str(path.resolve())
+
+
+def read_done(output: Path, *, retry_failed: bool = True) -> set[str]:
+    """
+    Image keys that already have a record in `output`.
+
+    A run killed mid-write can leave a truncated last line; it is dropped from the
+    file so appends start on a clean line. Records with an "error" are not counted
+    as done when retry_failed is set, and are removed from the file: the retry
+    writes the image's new record, so failures are not appended again on every
+    resume.
+    """
+    done: set[str] = set()
+    if not output.exists():
+        return done
+    good_bytes = 0
+    failed_bytes = 0
+    # Kept lines are copied as they are read; the copy only replaces the file
+    # when failed records were dropped.
+    fd, tmp = tempfile.mkstemp(prefix=".tmp_", dir=str(output.parent))
+    try:
+        with open(output, "rb") as fp, os.fdopen(fd, "wb") as kept:
+            for raw in fp:
+                if not raw.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(raw.decode("utf-8"))
+                except (UnicodeDecodeError, json.JSONDecodeError):
+                    break
+                good_bytes += len(raw)
+                key = record.get("image") if isinstance(record, dict) else None
+                if key and retry_failed and record.get("error"):
+                    failed_bytes += len(raw)
+                    continue
+                kept.write(raw)
+                if key:
+                    done.add(key)
+        if failed_bytes:
+            os.replace(tmp, output)
+            tmp = None
+        elif good_bytes < output.stat().st_size:
+            with open(output, "r+b") as fp:
+                fp.truncate(good_bytes)
+    finally:
+        if tmp is not None:
+            os.unlink(tmp)
+    return done
+
+
+_caches: dict[str, LayoutCache] = {}
+
+
+def _worker_cache(cache_dir: str) -> LayoutCache:
+    """
+    One LayoutCache per process and directory: a new instance counts the
+    entries on disk before its first write (see LayoutCache.put).
+    """
+    cache = _caches.get(cache_dir)
+    if cache is None:
+        cache = _caches.setdefault(cache_dir, LayoutCache(Path(cache_dir)))
+    return cache
+
+
+def detect_file(path: str, mode: Optional[LayoutMode] = None, cache_dir: Optional[str] = None) -> dict:
+    """One JSONL record for `path`; failures are reported in the record, not raised."""
+    started = time.perf_counter()
+    record: dict = {"image": path}
+    cache = _worker_cache(cache_dir) if cache_dir else None
+    try:
+        digest = content_digest(path) if cache is not None else None
+        detection = cache.cached_container(digest, mode) if cache is not None and digest else None
+        from_cache = detection is not None
+        if from_cache:
+            from PIL import Image  # type: ignore[import-not-found]
+
+            with Image.open(path) as img:  # header only
+                size = img.size
+            loaded = done = time.perf_counter()
+        else:
+            prepared = PreparedImage.load(path)
+            size = prepared.size
+            loaded = time.perf_counter()
+            detection = detect_container(prepared, mode=mode)
+            done = time.perf_counter()
+            if cache is not None and digest:
+                cache.store_container(digest, detection, mode)
+    except OcrError as exc:
+        record["error"] = str(exc)
+        return record
+    except Exception as exc:
+        record["error"] = f"{type(exc).__name__}: {exc}"
+        return record
+    record.update(
+        {
+            "size": list(size),
+            "template": detection.template,
+            "rect": list(detection.rect) if detection.rect is not None else None,
+            "has_view_text": detection.has_view_text,
+            "border_score": round(detection.border_score, 4),
+            "cached": from_cache,
+            "timings_ms": {
+                "load": round((loaded - started) * 1000.0, 3),
+                "detect": round((done - loaded) * 1000.0, 3),
+                "total": round((done - started) * 1000.0, 3),
+            },
+        }
+    )
+    return record
+
+
+def run_batch(
+    images: Iterable[Path],
+    output: Path,
+    *,
+    workers: Optional[int] = None,
+    mode: Optional[LayoutMode] = None,
+    resume: bool = True,
+    cache_dir: Optional[Path] = None,
+    on_record: Optional[Callable[[dict], None]] = None,
+    detect: Callable[..., dict] = detect_file,
+) -> BatchSummary:
+    """
+    Detect containers for `images` and append one JSON line per image to `output`.
+
+    Records are written in completion order and flushed one by one. With
+    resume=True, images that already have a successful record are skipped;
+    otherwise the output is overwritten. workers=1 runs in-process (no pool).
+    `cache_dir` enables the on-disk layout cache (see layout_cache).
+    At most 2×workers images are in flight, so huge directories are streamed.
+    `detect` replaces detect_file (a module-level function, so workers can
+    import it; benchmarks.layout_batch_crash passes one that kills its worker).
+    """
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    done = read_done(output) if resume else set()
+    summary = BatchSummary()
+    workers = max(1, workers or os.cpu_count() or 1)
+    cache_root = str(cache_dir) if cache_dir is not None else None
+    started = time.perf_counter()
+
+    def _pending() -> Iterator[str]:
+        for path in images:
+            key = _record_key(path)
+            if key in done:
+                summary.skipped += 1
+                continue
+            done.add(key)  # same file listed twice (overlapping globs)
+            yield key
+
+    with open(output, "a" if resume else "w", encoding="utf-8") as fp:
+
+        def _write(record: dict) -> None:
+            fp.write(json.dumps(record, ensure_ascii=False) + "\n")
+            fp.flush()
+            if record.get("error"):
+                summary.failed += 1
+            else:
+                summary.processed += 1
+            if on_record is not None:
+                on_record(record)
+
+        if workers == 1:
+            for key in _pending():
+                _write(detect(key, mode, cache_root))
+        else:
+            _run_pool(_pending(), workers, mode, cache_root, _write, detect)
+
+    summary.elapsed_s = round(time.perf_counter() - started, 3)
+    return summary
+
+
+def _run_pool(
+    keys: Iterator[str],
+    workers: int,
+    mode: Optional[LayoutMode],
+    cache_root: Optional[str],
+    write: Callable[[dict], None],
+    detect: Callable[..., dict],
+) -> None:
+    """
+    `detect` for every key on a process pool, at most 2×workers in flight.
+
+    When a worker dies the pool is broken: every image still in flight fails
+    with BrokenProcessPool and so does submit(). Any of them may have killed
+    the worker, so they are run again one at a time on a single-worker pool
+    (_run_isolated) before a fresh pool takes the rest of the queue.
+    """
+    pool = ProcessPoolExecutor(max_workers=workers)
+    in_flight: dict[Future, str] = {}
+
+    def _collect(finished: Iterable[Future]) -> list[str]:
+        """Write the finished records; returns the images lost to a broken pool."""
+        lost = []
+        for future in finished:
+            key = in_flight.pop(future)
+            try:
+                record = future.result()
+            except BrokenProcessPool:
+                lost.append(key)
+                continue
+            except Exception as exc:
+                record = _error_record(key, exc)
+            write(record)
+        return lost
+
+    def _recover(lost: list[str]) -> None:
+        nonlocal pool
+        # Everything still in flight on the broken pool fails (or already finished).
+        finished, _ = wait(list(in_flight))
+        lost += _collect(finished)
+        pool.shutdown(wait=True, cancel_futures=True)
+        _run_isolated(lost, mode, cache_root, write, detect)
+        pool = ProcessPoolExecutor(max_workers=workers)
+
+    try:
+        for key in keys:
+            try:
+                in_flight[pool.submit(detect, key, mode, cache_root)] = key
+            except BrokenProcessPool:
+                _recover([key])
+                continue
+            if len(in_flight) < workers * 2:
+                continue
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            lost = _collect(finished)
+            if lost:
+                _recover(lost)
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            lost = _collect(finished)
+            if lost:
+                _recover(lost)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _run_isolated(
+    keys: list[str],
+    mode: Optional[LayoutMode],
+    cache_root: Optional[str],
+    write: Callable[[dict], None],
+    detect: Callable[..., dict],
+) -> None:
+    """Each key alone on a one-worker pool: a crash now can only be its own."""
+    pool = ProcessPoolExecutor(max_workers=1)
+    try:
+        for key in keys:
+            try:
+                record = pool.submit(detect, key, mode, cache_root).result()
+            except BrokenProcessPool as exc:
+                record = _error_record(key, exc)
+                pool.shutdown(wait=True)
+                pool = ProcessPoolExecutor(max_workers=1)
+            except Exception as exc:
+                record = _error_record(key, exc)
+            write(record)
+    finally:
+        pool.shutdown(wait=True)
+
+
+def _error_record(key: str, exc: BaseException) -> dict:
+    return {"image": key, "error": f"{type(exc).__name__}: {exc}"}
@@ -0,0 +1,280 @@
+"""
+On-disk cache of layout detection results.
+
+detect_container/segment_page are deterministic for a given image and
+parameter set, so their results are stored as small JSON files keyed by
+(content hash, LAYOUT_DETECTOR_VERSION, detector_params()). Retyping an image
+or re-running a batch then skips decoding, the '<보기>' OCR pass and the line
+analysis. Changing any threshold in layout_detector changes the key; stale
+entries are simply never read again (`clear()` removes them).
+
+The cache keeps at most MAX_ENTRIES files: past that, the least recently used
+ones (by mtime, refreshed on every hit) are deleted down to 90% of the cap.
+
+NOVA_AI_LAYOUT_CACHE=<dir> moves the cache, NOVA_AI_LAYOUT_CACHE=0 disables it.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+from layout_detector import (
+    ContainerDetection,
+    ImageSource,
+    LayoutMode,
+    ProblemSegment,
+    detect_container,
+    detector_params,
+    segment_page,
+)
+from ocr_pipeline import OcrError, OcrWord, PreparedImage
+
+_DIGEST_KEY = "content_digest"
+
+MAX_ENTRIES = 20_000  # a few hundred bytes each
+
+
+def default_cache_dir() -> Optional[Path]:
+    configured = (os.getenv("NOVA_AI_LAYOUT_CACHE") or "").strip()
+    if configured == "0":
+        return None
+    if configured:
+        return Path(configured)
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.environ.get("APPDATA")
+        if base:
+            return Path(base) / "Nova AI" / "layout_cache"
+        return Path(tempfile.gettempdir()) / "nova_ai" / "layout_cache"
+    return Path.home() / ".nova-ai" / "layout_cache"
+
+
+def content_digest(image: ImageSource) -> str:
+    """
+    blake2b of the file bytes for paths (no decode needed), of the decoded RGB
+    pixels for in-memory images. Memoized on the PreparedImage.
+    """
+    if isinstance(image, (str, os.PathLike)):
+        h = hashlib.blake2b(digest_size=20)
+        with open(image, "rb") as fp:
+            for chunk in iter(lambda: fp.read(1 << 20), b""):
+                h.update(chunk)
+        return "file:" + h.hexdigest()
+    prepared = PreparedImage.from_any(image)
+    cached = prepared._cache.get(_DIGEST_KEY)
+    if cached is None:
+        pixels = prepared.pixels()
+        h = hashlib.blake2b(digest_size=20)
+        h.update(repr(pixels.shape).encode("ascii"))
+        h.update(pixels.tobytes() if not pixels.flags.c_contiguous else pixels.data)
+        cached = "pixels:" + h.hexdigest()
+        prepared._cache[_DIGEST_KEY] = cached
+    return cached
+
+
+def _words_digest(words: Iterable[OcrWord]) -> str:
+    h = hashlib.blake2b(digest_size=12)
+    for w in words:
+        h.update(f"{w.text}\t{w.left},{w.top},{w.width},{w.height}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _detection_to_json(det: ContainerDetection) -> dict:
+    return asdict(det)
+
+
+def _detection_from_json(data: dict) -> ContainerDetection:
+    rect = data.get("rect")
+    return ContainerDetection(
+        template=data.get("template"),
+        rect=tuple(rect) if rect is not None else None,  # type: ignore[arg-type]
+        has_view_text=bool(data.get("has_view_text")),
+        border_score=float(data.get("border_score") or 0.0),
+    )
+
+
+def _segment_from_json(data: dict) -> ProblemSegment:
+    return ProblemSegment(
+        index=int(data["index"]),
+        rect=tuple(data["rect"]),  # type: ignore[arg-type]
+        number=data.get("number"),
+        containers=tuple(_detection_from_json(c) for c in data.get("containers", ())),
+    )
+
+
+class LayoutCache:
+    """
+    One JSON file per result under `root/<2 hex>/<key>.json`, written via a
+    temp file + os.replace so concurrent workers (layout_batch) never see a
+    partial entry. Read/write errors only cost a recomputation.
+    """
+
+    def __init__(self, root: Optional[Path] = None, *, max_entries: int = MAX_ENTRIES) -> None:
+        self.root = Path(root) if root is not None else default_cache_dir()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._count: Optional[int] = None  # entries on disk, counted on the first new one
+
+    @property
+    def enabled(self) -> bool:
+        return self.root is not None
+
+    def key(self, digest: str, kind: str, params: dict) -> str:
+        payload = json.dumps({"digest": digest, "kind": kind, "params": params}, sort_keys=True)
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=20).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        assert self.root is not None
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Any]:
+        if self.root is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as fp:
+                value = json.load(fp)["value"]
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            os.utime(path)  # recently used entries survive prune()
+        except OSError:
+            pass
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        if self.root is None:
+            return
+        path = self._path(key)
+        tmp = None
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            added = not path.exists()
+            fd, tmp = tempfile.mkstemp(prefix=".tmp_", dir=str(path.parent))
+            with os.fdopen(fd, "w", encoding="utf-8") as fp:
+                json.dump({"value": value}, fp, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError:
+            if tmp is not None:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+            return
+        if added:
+            if self._count is None:
+                self._count = sum(1 for _ in self.root.glob("*/*.json"))
+            else:
+                self._count += 1
+            if self._count > self.max_entries:
+                self.prune(int(self.max_entries * 0.9))
+
+    def prune(self, keep: int) -> int:
+        """Delete all but the `keep` most recently used entries; returns the number removed."""
+        if self.root is None or not self.root.exists():
+            return 0
+        entries = []
+        for entry in self.root.glob("*/*.json"):
+            try:
+                entries.append((entry.stat().st_mtime, entry))
+            except OSError:
+                pass
+        entries.sort(reverse=True)
+        removed = 0
+        for _mtime, entry in entries[max(0, keep):]:
+            try:
+                entry.unlink()
+                removed += 1
+            except OSError:
+                pass
+        self._count = len(entries) - removed
+        return removed
+
+    def clear(self) -> int:
+        """Delete every cached entry; returns the number of files removed."""
+        if self.root is None or not self.root.exists():
+            return 0
+        removed = 0
+        for entry in self.root.glob("*/*.json"):
+            try:
+                entry.unlink()
+                removed += 1
+            except OSError:
+                pass
+        self._count = 0
+        return removed
+
+    # --- cached detector entry points ---------------------------------
+
+    def cached_container(self, digest: str, mode: Optional[LayoutMode] = None) -> Optional[ContainerDetection]:
+        cached = self.get(self.key(digest, "container", detector_params(mode)))
+        return _detection_from_json(cached) if cached is not None else None
+
+    def store_container(self, digest: str, det: ContainerDetection, mode: Optional[LayoutMode] = None) -> None:
+        self.put(self.key(digest, "container", detector_params(mode)), _detection_to_json(det))
+
+    def detect_container(
+        self, image: ImageSource, *, mode: Optional[LayoutMode] = None, digest: Optional[str] = None
+    ) -> ContainerDetection:
+        """
+        layout_detector.detect_container through the cache. Pass `digest`
+        (content_digest of the source file) to skip hashing the pixels.
+        """
+        if self.root is None:
+            return detect_container(image, mode=mode)
+        try:
+            digest = digest or content_digest(image)
+        except (OSError, OcrError):
+            return detect_container(image, mode=mode)
+        det = self.cached_container(digest, mode)
+        if det is None:
+            det = detect_container(image, mode=mode)
+            self.store_container(digest, det, mode)
+        return det
+
+    def segment_page(
+        self,
+        image: ImageSource,
+        *,
+        words: Optional[Iterable[OcrWord]] = None,
+        digest: Optional[str] = None,
+    ) -> list[ProblemSegment]:
+        """layout_detector.segment_page through the cache (OCR words are part of the key)."""
+        if self.root is None:
+            return segment_page(image, words=words)
+        words = list(words) if words is not None else None
+        try:
+            digest = digest or content_digest(image)
+        except (OSError, OcrError):
+            return segment_page(image, words=words)
+        params = detector_params("full")
+        params["words"] = _words_digest(words) if words is not None else None
+        key = self.key(digest, "segments", params)
+        cached = self.get(key)
+        if cached is not None:
+            try:
+                return [_segment_from_json(seg) for seg in cached]
+            except (KeyError, TypeError, ValueError):
+                pass
+        segments = segment_page(image, words=words)
+        self.put(key, [asdict(seg) for seg in segments])
+        return segments
+
+
+_default_cache: Optional[LayoutCache] = None
+
+
+def default_cache() -> LayoutCache:
+    """Process-wide cache at default_cache_dir() (disabled when NOVA_AI_LAYOUT_CACHE=0)."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = LayoutCache()
+    return _default_cache
@@ -1,22 +1,64 @@
 from __future__ import annotations
 
-import sys
+import os
+import re
+import shutil
 from dataclasses import dataclass
-from typing import Literal, Optional, Tuple
+from functools import cached_property
+from typing import Iterable, Literal, Optional, Tuple, Union
 
+from debug_log import get_logger
+from ocr_context import CHOICE_MARKS
+from ocr_pipeline import ImageInput, OcrError, OcrWord, PreparedImage
 
-def _debug(msg: str) -> None:
-    if sys.stderr is not None:
-        try:
-            sys.stderr.write(f"[Layout Debug] {msg}\n")
-            sys.stderr.flush()
-        except Exception:
-            # Windowed executables may not have a writable stderr handle.
-            pass
+
+_log = get_logger("Layout Debug")
 
 
 ContainerTemplate = Literal["header.hwp", "box.hwp", "box_white.hwp"]
 
+# Path, in-memory image (PIL / numpy crop) or an image already loaded for the OCR
+# pipeline; passing the PreparedImage reuses its cached grayscale/binary maps
+# instead of decoding and thresholding again.
+ImageSource = Union[str, PreparedImage, ImageInput]
+
+# Working resolution for layout analysis (rectangle detection, border-gap inference).
+RECT_MAX_DIM = 2000
+# Pyramid mode: candidates on a coarse level, edges refined at full resolution.
+PYRAMID_COARSE_DIM = 500
+LayoutMode = Literal["full", "pyramid"]
+
+Rect = Tuple[int, int, int, int]
+
+# Below this many candidates, slicing bands per rect is cheaper than building
+# a summed-area table (see benchmarks.border_score).
+BORDER_SCORE_INTEGRAL_MIN = 32
+
+# Candidate filters (fractions of the image or problem area) and decision cutoffs.
+# Everything that changes a ContainerDetection belongs here or in
+# LAYOUT_DETECTOR_VERSION: layout_cache keys results on detector_params().
+RECT_MIN_AREA_FRAC = 0.02
+RECT_MAX_AREA_FRAC = 0.90
+RECT_MIN_ASPECT = 1.1
+RECT_MAX_ASPECT = 30.0
+RECT_EDGE_MARGIN_FRAC = 0.02
+# border_score at or above this → box.hwp, below → box_white.hwp
+BOX_BORDER_MIN_SCORE = 0.35
+# '<보기>' border gap: side thirds at least this dense, middle below this ratio of them
+VIEW_GAP_SIDE_MIN = 0.12
+VIEW_GAP_MID_RATIO = 0.45
+
+# Bump when detection/segmentation logic changes in a way the constants above
+# do not capture, so cached results are recomputed.
+LAYOUT_DETECTOR_VERSION = 2
+
+
+def _prepare(image: ImageSource) -> Optional[PreparedImage]:
+    try:
+        return PreparedImage.from_any(image)
+    except OcrError:
+        return None
+
 
 @dataclass(frozen=True)
 class ContainerDetection:
@@ -36,7 +78,154 @@ class ContainerDetection:
     border_score: float
 
 
-def detect_container(image_path: str) -> ContainerDetection:
+class LayoutAnalysis:
+    """
+    Line maps of one image at a working scale, shared by the detector helpers.
+
+    gray/binary come from the PreparedImage cache; horizontal/vertical stroke maps
+    and the grid are derived lazily, once. Rects passed between helpers and
+    returned to callers are in original-image coordinates; use to_work() /
+    to_original() to cross scales.
+    """
+
+    def __init__(self, prepared: PreparedImage, max_dim: Optional[int] = RECT_MAX_DIM) -> None:
+        self.prepared = prepared
+        self.max_dim = max_dim
+        self.scale = prepared.scale_for(max_dim)
+        # Pixel thresholds are tuned at RECT_MAX_DIM; coarser levels shrink them.
+        self.level_ratio = self.scale / prepared.scale_for(RECT_MAX_DIM)
+        self.kernel_floor = max(8, int(round(30 * min(1.0, self.level_ratio))))
+
+    @classmethod
+    def of(cls, image: "ImageSource | LayoutAnalysis", max_dim: Optional[int] = RECT_MAX_DIM) -> Optional["LayoutAnalysis"]:
+        """Analysis for `image`, cached on its PreparedImage (None if the image cannot be loaded)."""
+        if isinstance(image, LayoutAnalysis):
+            return image
+        prepared = _prepare(image)
+        if prepared is None:
+            return None
+        key = ("layout", max_dim)
+        analysis = prepared._cache.get(key)
+        if analysis is None:
+            analysis = cls(prepared, max_dim)
+            prepared._cache[key] = analysis
+        return analysis
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """(w, h) of the working maps."""
+        h, w = self.gray.shape[:2]
+        return w, h
+
+    def to_work(self, rect: Rect) -> Rect:
+        s = self.scale
+        x, y, w, h = rect
+        return (int(x * s), int(y * s), int(w * s), int(h * s))
+
+    def to_original(self, rect: Rect) -> Rect:
+        if self.scale >= 1.0:
+            return tuple(int(v) for v in rect)  # type: ignore[return-value]
+        inv = 1.0 / self.scale
+        x, y, w, h = rect
+        return (int(x * inv), int(y * inv), int(w * inv), int(h * inv))
+
+    @cached_property
+    def gray(self):  # type: ignore[no-untyped-def]
+        if self.level_ratio < 1.0 and self.max_dim is not None:
+            # Coarse pyramid level: never materialize the full-resolution arrays.
+            return self.prepared.thumbnail_gray(self.max_dim)
+        return self.prepared.gray(self.max_dim)
+
+    @cached_property
+    def binary(self):  # type: ignore[no-untyped-def]
+        if self.level_ratio < 1.0:
+            import cv2  # type: ignore[import-not-found]
+
+            return cv2.adaptiveThreshold(
+                self.gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 21, 10
+            )
+        return self.prepared.binary(self.max_dim)
+
+    @cached_property
+    def horizontal(self):  # type: ignore[no-untyped-def]
+        """Long horizontal strokes (open with a max(30, w/25) x 1 kernel at RECT_MAX_DIM)."""
+        import cv2  # type: ignore[import-not-found]
+
+        w, _h = self.size
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(self.kernel_floor, w // 25), 1))
+        return cv2.dilate(cv2.erode(self.binary, kernel, iterations=1), kernel, iterations=1)
+
+    @cached_property
+    def vertical(self):  # type: ignore[no-untyped-def]
+        import cv2  # type: ignore[import-not-found]
+
+        _w, h = self.size
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(self.kernel_floor, h // 25)))
+        return cv2.dilate(cv2.erode(self.binary, kernel, iterations=1), kernel, iterations=1)
+
+    @cached_property
+    def grid(self):  # type: ignore[no-untyped-def]
+        import cv2  # type: ignore[import-not-found]
+        import numpy as np  # type: ignore[import-not-found]
+
+        grid = cv2.add(self.horizontal, self.vertical)
+        return cv2.dilate(grid, np.ones((3, 3), np.uint8), iterations=1)
+
+    @cached_property
+    def grid_rects(self) -> list[Rect]:
+        """Bounding rects of the grid's external contours (working coordinates)."""
+        import cv2  # type: ignore[import-not-found]
+
+        contours, _ = cv2.findContours(self.grid, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        return [tuple(int(v) for v in cv2.boundingRect(c)) for c in contours]  # type: ignore[misc]
+
+    @cached_property
+    def grid_integral(self):  # type: ignore[no-untyped-def]
+        """Summed-area table of grid pixels (see border_scores)."""
+        return edge_integral(self.grid)
+
+
+def _layout_mode() -> LayoutMode:
+    return "pyramid" if (os.getenv("NOVA_AI_LAYOUT_MODE") or "").strip().lower() == "pyramid" else "full"
+
+
+_detector_params: dict[str, dict] = {}
+
+
+def detector_params(mode: Optional[LayoutMode] = None) -> dict:
+    """
+    Everything a ContainerDetection depends on besides the pixels: version,
+    working scales, candidate filters, cutoffs and the '<보기>' OCR engine.
+    Built once per mode (the Tesseract lookup is a PATH search); callers get
+    a copy they may extend.
+    """
+    mode = mode or _layout_mode()
+    params = _detector_params.get(mode)
+    if params is None:
+        params = _detector_params.setdefault(mode, _build_detector_params(mode))
+    return dict(params)
+
+
+def _build_detector_params(mode: LayoutMode) -> dict:
+    return {
+        "version": LAYOUT_DETECTOR_VERSION,
+        "mode": mode,
+        "rect_max_dim": RECT_MAX_DIM,
+        "pyramid_coarse_dim": PYRAMID_COARSE_DIM,
+        "rect_min_area_frac": RECT_MIN_AREA_FRAC,
+        "rect_max_area_frac": RECT_MAX_AREA_FRAC,
+        "rect_min_aspect": RECT_MIN_ASPECT,
+        "rect_max_aspect": RECT_MAX_ASPECT,
+        "rect_edge_margin_frac": RECT_EDGE_MARGIN_FRAC,
+        "box_border_min_score": BOX_BORDER_MIN_SCORE,
+        "view_gap_side_min": VIEW_GAP_SIDE_MIN,
+        "view_gap_mid_ratio": VIEW_GAP_MID_RATIO,
+        # View-text OCR appears/disappears with Tesseract; results differ.
+        "view_text_ocr": os.getenv("TESSERACT_CMD") or shutil.which("tesseract"),
+    }
+
+
+def detect_container(image: ImageSource, *, mode: Optional[LayoutMode] = None) -> ContainerDetection:
     """
     Detect a <보기>/box-like container and choose the correct template.
 
@@ -49,20 +238,33 @@ def detect_container(image_path: str) -> ContainerDetection:
         - Else if rectangle exists and border strong: box.hwp
         - Else if rectangle exists and border weak: box_white.hwp
         - Else: template=None (no container)
+
+    mode 'pyramid' (or NOVA_AI_LAYOUT_MODE=pyramid) finds candidates on a
+    PYRAMID_COARSE_DIM level and refines only the winner at full resolution.
     """
-    _debug(f"Detecting container for: {image_path}")
+    prepared = _prepare(image)
+    if prepared is None:
+        _log.warning("Could not load image: %s", image)
+        return ContainerDetection(template=None, rect=None, has_view_text=False, border_score=0.0)
+    mode = mode or _layout_mode()
+    _log.debug("Detecting container for: %s (mode=%s)", prepared.path, mode)
 
-    has_view_text, view_bbox = _detect_view_text_bbox(image_path)
-    _debug(f"View text detected: {has_view_text}, bbox: {view_bbox}")
+    has_view_text, view_bbox = _detect_view_text_bbox(prepared)
+    _log.debug("View text detected: %s, bbox: %s", has_view_text, view_bbox)
     
-    rect, border_score = _detect_best_rectangle(image_path)
-    _debug(f"Rectangle detected: {rect}, border_score: {border_score:.3f}")
+    if mode == "pyramid":
+        analysis = LayoutAnalysis.of(prepared, PYRAMID_COARSE_DIM)
+        rect, border_score = _detect_best_rectangle_pyramid(analysis)
+    else:
+        analysis = LayoutAnalysis.of(prepared)
+        rect, border_score = _detect_best_rectangle(analysis)
+    _log.debug("Rectangle detected: %s, border_score: %.3f", rect, border_score)
 
     template: Optional[ContainerTemplate] = None
     # If OCR fails to read '<보기>' (common when border breaks), infer from border gap pattern.
     if (not has_view_text) and rect is not None:
         try:
-            if _infer_view_from_border_gap(image_path, rect):
+            if _infer_view_from_border_gap(analysis, rect):
                 has_view_text = True
         except Exception:
             pass
@@ -70,7 +272,7 @@ def detect_container(image_path: str) -> ContainerDetection:
     if has_view_text:
         template = "header.hwp"
     elif rect is not None:
-        template = "box.hwp" if border_score >= 0.35 else "box_white.hwp"
+        template = "box.hwp" if border_score >= BOX_BORDER_MIN_SCORE else "box_white.hwp"
 
     # If view text exists but we also have a rectangle, prefer the rectangle as the rect.
     # If view text exists but no rectangle, keep rect=None and still use header.hwp.
@@ -83,32 +285,29 @@ def detect_container(image_path: str) -> ContainerDetection:
     )
 
 
-def _detect_view_text_bbox(image_path: str) -> tuple[bool, Optional[Tuple[int, int, int, int]]]:
+def _detect_view_text_bbox(image: ImageSource) -> tuple[bool, Optional[Tuple[int, int, int, int]]]:
     """
     Returns (has_view_text, bbox).
     bbox is best-effort union bbox of the detected '<보기>' token(s).
     """
 
     try:
-        from PIL import Image  # type: ignore[import-not-found]
         import pytesseract  # type: ignore[import-not-found]
     except Exception:
         return False, None
 
     # Respect optional environment override used elsewhere in Nova AI Lite.
     try:
-        import os
-
         tesseract_cmd = os.getenv("TESSERACT_CMD")
         if tesseract_cmd:
             pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
     except Exception:
         pass
 
-    try:
-        img = Image.open(image_path).convert("RGB")
-    except Exception:
+    prepared = _prepare(image)
+    if prepared is None:
         return False, None
+    img = prepared.original
 
     # Fallback: raw OCR string (bbox not guaranteed, but better than missing the signal)
     try:
@@ -194,7 +393,7 @@ def _detect_view_text_bbox(image_path: str) -> tuple[bool, Optional[Tuple[int, i
     return False, None
 
 
-def _detect_best_rectangle(image_path: str) -> tuple[Optional[Tuple[int, int, int, int]], float]:
+def _detect_best_rectangle(image: "ImageSource | LayoutAnalysis") -> tuple[Optional[Tuple[int, int, int, int]], float]:
     """
     Detect the most likely container rectangle and return (rect, border_score).
     rect is (x, y, w, h) in original image coords.
@@ -207,79 +406,72 @@ def _detect_best_rectangle(image_path: str) -> tuple[Optional[Tuple[int, int, in
     except Exception:
         return None, 0.0
 
-    img = cv2.imread(image_path)
-    if img is None:
+    analysis = LayoutAnalysis.of(image)
+    if analysis is None:
         return None, 0.0
-    h, w = img.shape[:2]
+    w, h = analysis.prepared.size
     if h < 10 or w < 10:
         return None, 0.0
 
-    # 이미지가 너무 크면 리사이즈해서 처리
-    max_dim = 2000
-    scale = 1.0
-    if max(h, w) > max_dim:
-        scale = max_dim / max(h, w)
-        new_w, new_h = int(w * scale), int(h * scale)
-        img = cv2.resize(img, (new_w, new_h))
-        _debug(f"Resized image from {w}x{h} to {new_w}x{new_h} (scale={scale:.3f})")
-        h, w = new_h, new_w
-
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    # 이미지가 너무 크면 축소본에서 처리 (LayoutAnalysis가 작업 배율의 맵을 공유)
+    scale = analysis.scale
+    w, h = analysis.size
+    if scale < 1.0:
+        _log.debug("Using %dx%d working copy (scale=%.3f)", w, h, scale)
 
     # Line-based detection (more robust when borders are broken by '<보기>' header).
+    grid = None
     try:
-        bw = cv2.adaptiveThreshold(
-            gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 21, 10
-        )
-        # Extract long horizontal/vertical strokes.
-        hk = max(30, w // 25)
-        vk = max(30, h // 25)
-        h_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (hk, 1))
-        v_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, vk))
-        horizontal = cv2.erode(bw, h_kernel, iterations=1)
-        horizontal = cv2.dilate(horizontal, h_kernel, iterations=1)
-        vertical = cv2.erode(bw, v_kernel, iterations=1)
-        vertical = cv2.dilate(vertical, v_kernel, iterations=1)
-        grid = cv2.add(horizontal, vertical)
-        grid = cv2.dilate(grid, np.ones((3, 3), np.uint8), iterations=1)
-        contours, _ = cv2.findContours(grid, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        grid = analysis.grid
+        bounding = analysis.grid_rects
         edge_map = grid
-        _debug(f"Grid-based contours found: {len(contours)}")
+        _log.debug("Grid-based contours found: %d", len(bounding))
     except Exception as e:
-        _debug(f"Grid method failed: {e}, using Canny fallback")
+        _log.warning("Grid method failed: %s, using Canny fallback", e)
         # Edge fallback
-        edges = cv2.Canny(gray, 40, 140)
+        edges = cv2.Canny(analysis.gray, 40, 140)
         edges = cv2.dilate(edges, np.ones((3, 3), np.uint8), iterations=1)
         contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        bounding = [cv2.boundingRect(cnt) for cnt in contours]
         edge_map = edges
-    candidates: list[Tuple[int, int, int, int, float]] = []
+    rects: list[Tuple[int, int, int, int]] = []
     img_area = float(w * h)
-    _debug(f"Image size: {w}x{h}, area: {img_area}")
+    _log.debug("Image size: %dx%d, area: %s", w, h, img_area)
+    min_w = 40 * min(1.0, analysis.level_ratio)
+    min_h = 20 * min(1.0, analysis.level_ratio)
 
-    for cnt in contours:
-        x, y, ww, hh = cv2.boundingRect(cnt)
+    for x, y, ww, hh in bounding:
         area = float(ww * hh)
-        if area < img_area * 0.02:
+        if area < img_area * RECT_MIN_AREA_FRAC:
             continue
-        if area > img_area * 0.90:
+        if area > img_area * RECT_MAX_AREA_FRAC:
             continue
-        if ww < 40 or hh < 20:
+        if ww < min_w or hh < min_h:
             continue
         aspect = ww / max(1.0, float(hh))
-        if aspect < 1.1 or aspect > 30:
+        if aspect < RECT_MIN_ASPECT or aspect > RECT_MAX_ASPECT:
             continue
         # Exclude near full-page frames and very near borders (likely page edge)
-        margin = int(min(w, h) * 0.02)
+        margin = int(min(w, h) * RECT_EDGE_MARGIN_FRAC)
         if x <= margin and y <= margin:
             continue
         if (x + ww) >= (w - margin) and (y + hh) >= (h - margin):
             continue
 
-        score = _border_score_on_rect(edge_map, (x, y, ww, hh))
-        _debug(f"Candidate: ({x},{y},{ww},{hh}) aspect={aspect:.2f} score={score:.3f}")
-        candidates.append((x, y, ww, hh, score))
+        rects.append((x, y, ww, hh))
+
+    # Noisy scans: score all perimeter bands in one pass over a summed-area table.
+    if len(rects) >= BORDER_SCORE_INTEGRAL_MIN:
+        integral = analysis.grid_integral if edge_map is grid else None
+        scores = border_scores(edge_map, rects, integral=integral)
+    else:
+        scores = [_border_score_on_rect(edge_map, r) for r in rects]
+    candidates: list[Tuple[int, int, int, int, float]] = []
+    for (x, y, ww, hh), score in zip(rects, scores):
+        _log.debug("Candidate: (%d,%d,%d,%d) aspect=%.2f score=%.3f", x, y, ww, hh, ww / max(1.0, float(hh)), score)
+        candidates.append((x, y, ww, hh, float(score)))
 
-    _debug(f"Total candidates after filtering: {len(candidates)}")
+    _log.debug("Total candidates after filtering: %d", len(candidates))
     if not candidates:
         return None, 0.0
 
@@ -289,15 +481,117 @@ def _detect_best_rectangle(image_path: str) -> tuple[Optional[Tuple[int, int, in
     
     # 리사이즈한 경우 원래 좌표로 복원
     if scale < 1.0:
-        x = int(x / scale)
-        y = int(y / scale)
-        ww = int(ww / scale)
-        hh = int(hh / scale)
-        _debug(f"Restored coordinates to original scale: ({x},{y},{ww},{hh})")
+        x, y, ww, hh = analysis.to_original((x, y, ww, hh))
+        _log.debug("Restored coordinates to original scale: (%d,%d,%d,%d)", x, y, ww, hh)
     
     return (int(x), int(y), int(ww), int(hh)), float(score)
 
 
+def _detect_best_rectangle_pyramid(image: "ImageSource | LayoutAnalysis") -> tuple[Optional[Tuple[int, int, int, int]], float]:
+    """
+    Coarse-to-fine variant of _detect_best_rectangle with the same return contract.
+
+    The candidate search (threshold, morphology, contours, filters, ranking) runs
+    on a ~PYRAMID_COARSE_DIM level. Only the winner's four edges are then
+    re-located at full resolution inside narrow windows around the coarse
+    estimate, and the border score is measured there with the RECT_MAX_DIM band
+    width, so it stays comparable with the BOX_BORDER_MIN_SCORE cutoff.
+    """
+    coarse = image if isinstance(image, LayoutAnalysis) else LayoutAnalysis.of(image, PYRAMID_COARSE_DIM)
+    if coarse is None:
+        return None, 0.0
+    rect, coarse_score = _detect_best_rectangle(coarse)
+    if rect is None:
+        return None, 0.0
+    try:
+        refined = _refine_rect(coarse, rect)
+    except Exception as e:
+        _log.warning("Pyramid refinement failed (%s); keeping coarse rect", e)
+        return rect, coarse_score
+    if refined is None:
+        return rect, coarse_score
+    _log.debug("Pyramid refined %s -> %s score=%.3f", rect, refined[0], refined[1])
+    return refined
+
+
+def _refine_rect(coarse: LayoutAnalysis, rect: Rect) -> Optional[tuple[Rect, float]]:
+    """Re-locate each edge of `rect` (original coords) at full resolution."""
+    import cv2  # type: ignore[import-not-found]
+    import numpy as np  # type: ignore[import-not-found]
+
+    prepared = coarse.prepared
+    W, H = prepared.size
+    x, y, w, h = rect
+    # Search radius: a few coarse pixels, in original pixels.
+    radius = int(np.ceil(3.0 / coarse.scale)) + 2
+    # Grid-equivalent parameters at the detector's usual working scale.
+    work_scale = prepared.scale_for(RECT_MAX_DIM)
+    band = max(2, int(round(2.0 / work_scale)))
+    work_w = int(W * work_scale)
+    work_h = int(H * work_scale)
+    h_len = int(max(30, work_w // 25) / work_scale)
+    v_len = int(max(30, work_h // 25) / work_scale)
+
+    def line_map(x0: int, y0: int, x1: int, y1: int, horizontal: bool):  # type: ignore[no-untyped-def]
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(W, x1), min(H, y1)
+        if x1 - x0 < 3 or y1 - y0 < 3:
+            return None, x0, y0
+        window = prepared.gray_window(x0, y0, x1, y1)
+        bw = cv2.adaptiveThreshold(window, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 21, 10)
+        if horizontal:
+            length = max(3, min(h_len, (x1 - x0) // 2))
+            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (length, 1))
+        else:
+            length = max(3, min(v_len, (y1 - y0) // 2))
+            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, length))
+        lines = cv2.morphologyEx(bw, cv2.MORPH_OPEN, kernel)
+        return lines, x0, y0
+
+    def outer_edge(profile, coarse_pos: int, offset: int, first: bool) -> int:  # type: ignore[no-untyped-def]
+        if profile.size == 0 or profile.max() <= 0:
+            return coarse_pos
+        strong = np.flatnonzero(profile >= profile.max() * 0.5)
+        return offset + int(strong[0] if first else strong[-1])
+
+    inner = (x + radius, x + w - radius)
+    top_map, tx, ty = line_map(inner[0], y - radius, inner[1], y + radius + 1, True)
+    bottom_map, bx, by = line_map(inner[0], y + h - radius, inner[1], y + h + radius + 1, True)
+    vert = (y + radius, y + h - radius)
+    left_map, lx, ly = line_map(x - radius, vert[0], x + radius + 1, vert[1], False)
+    right_map, rx, ry = line_map(x + w - radius, vert[0], x + w + radius + 1, vert[1], False)
+    if top_map is None or bottom_map is None or left_map is None or right_map is None:
+        return None
+
+    # Outer edges of the border strokes (inclusive); the grid's 3x3 dilation adds 1px.
+    y0 = outer_edge(top_map.mean(axis=1), y, ty, True) - 1
+    y1 = outer_edge(bottom_map.mean(axis=1), y + h - 1, by, False) + 1
+    x0 = outer_edge(left_map.mean(axis=0), x, lx, True) - 1
+    x1 = outer_edge(right_map.mean(axis=0), x + w - 1, rx, False) + 1
+    if x1 - x0 < 10 or y1 - y0 < 10:
+        return None
+
+    # Border score: density of (dilated) stroke pixels in a ±band strip on each edge.
+    kernel3 = np.ones((3, 3), np.uint8)
+    total = 0.0
+    hits = 0.0
+    for lines, ox, oy, pos, horizontal in (
+        (top_map, tx, ty, y0, True),
+        (bottom_map, bx, by, y1 + 1, True),
+        (left_map, lx, ly, x0, False),
+        (right_map, rx, ry, x1 + 1, False),
+    ):
+        lines = cv2.dilate(lines, kernel3, iterations=1)
+        if horizontal:
+            strip = lines[max(0, pos - oy - band) : max(0, pos - oy + band), :]
+        else:
+            strip = lines[:, max(0, pos - ox - band) : max(0, pos - ox + band)]
+        total += float(strip.size)
+        hits += float(np.count_nonzero(strip))
+    score = hits / total if total > 1 else 0.0
+    return (int(x0), int(y0), int(x1 - x0 + 1), int(y1 - y0 + 1)), max(0.0, min(1.0, score))
+
+
 def _border_score_on_rect(edges, rect: Tuple[int, int, int, int]) -> float:
     import numpy as np  # type: ignore[import-not-found]
 
@@ -324,50 +618,94 @@ def _border_score_on_rect(edges, rect: Tuple[int, int, int, int]) -> float:
     return max(0.0, min(1.0, edge_pixels / total_pixels))
 
 
-def _infer_view_from_border_gap(image_path: str, rect: Tuple[int, int, int, int]) -> bool:
+def edge_integral(edges):  # type: ignore[no-untyped-def]
+    """(h+1, w+1) int32 summed-area table of nonzero pixels in `edges`."""
+    import cv2  # type: ignore[import-not-found]
+    import numpy as np  # type: ignore[import-not-found]
+
+    return cv2.integral((edges > 0).astype(np.uint8), sdepth=cv2.CV_32S)
+
+
+def border_scores(edges, rects, *, integral=None, band: int = 2):  # type: ignore[no-untyped-def]
+    """
+    Vectorized _border_score_on_rect for many rects: every perimeter band is an
+    O(1) lookup in the summed-area table, all candidates in one NumPy pass.
+    Returns a float array aligned with `rects` (same clipping rules and values
+    as the per-rect version).
+    """
+    import numpy as np  # type: ignore[import-not-found]
+
+    if len(rects) == 0:
+        return np.zeros(0, dtype=np.float64)
+    if integral is None:
+        integral = edge_integral(edges)
+    hh, ww = edges.shape[:2]
+    r = np.asarray(rects, dtype=np.int64).reshape(-1, 4)
+    x0 = np.maximum(0, r[:, 0])
+    y0 = np.maximum(0, r[:, 1])
+    x1 = np.minimum(ww - 1, r[:, 0] + r[:, 2])
+    y1 = np.minimum(hh - 1, r[:, 1] + r[:, 3])
+    valid = (x1 > x0) & (y1 > y0)
+
+    def box(ya, yb, xa, xb):  # type: ignore[no-untyped-def]
+        # Sum and area of rows [ya, yb) x cols [xa, xb); empty boxes count 0.
+        yb = np.maximum(ya, yb)
+        xb = np.maximum(xa, xb)
+        total = integral[yb, xb] - integral[ya, xb] - integral[yb, xa] + integral[ya, xa]
+        return total.astype(np.float64), ((yb - ya) * (xb - xa)).astype(np.float64)
+
+    top, top_n = box(np.maximum(0, y0 - band), np.minimum(hh, y0 + band), x0, x1)
+    bottom, bottom_n = box(np.maximum(0, y1 - band), np.minimum(hh, y1 + band), x0, x1)
+    left, left_n = box(y0, y1, np.maximum(0, x0 - band), np.minimum(ww, x0 + band))
+    right, right_n = box(y0, y1, np.maximum(0, x1 - band), np.minimum(ww, x1 + band))
+
+    pixels = top_n + bottom_n + left_n + right_n
+    edge_pixels = top + bottom + left + right
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = np.where(valid & (pixels > 1), edge_pixels / np.maximum(pixels, 1.0), 0.0)
+    return np.clip(scores, 0.0, 1.0)
+
+
+def _infer_view_from_border_gap(image: "ImageSource | LayoutAnalysis", rect: Tuple[int, int, int, int]) -> bool:
     """
     Heuristic for '<보기>' header when OCR misses it:
     - In many test sheets, the top border is "broken" around the centered header text.
     - We detect a strong top border on the left/right thirds with a weak middle third.
+
+    Runs on the LayoutAnalysis horizontal map at its working scale; `rect` is in
+    original coordinates and the pixel windows below are scaled to match.
     """
     try:
-        import cv2  # type: ignore[import-not-found]
         import numpy as np  # type: ignore[import-not-found]
     except Exception:
         return False
 
-    img = cv2.imread(image_path)
-    if img is None:
+    analysis = LayoutAnalysis.of(image)
+    if analysis is None:
         return False
-    h, w = img.shape[:2]
+    w, h = analysis.size
     if h < 10 or w < 10:
         return False
+    s = analysis.scale
 
-    x, y, ww, hh = rect
+    x, y, ww, hh = analysis.to_work(rect)
     x0 = max(0, x)
     x1 = min(w, x + ww)
     y0 = max(0, y)
-    if x1 - x0 < 60:
+    if x1 - x0 < 60 * s:
         return False
 
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    bw = cv2.adaptiveThreshold(
-        gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 21, 10
-    )
-    hk = max(30, w // 25)
-    h_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (hk, 1))
-    horizontal = cv2.erode(bw, h_kernel, iterations=1)
-    horizontal = cv2.dilate(horizontal, h_kernel, iterations=1)
+    horizontal = analysis.horizontal
 
     seg_w = (x1 - x0) // 3
     if seg_w <= 0:
         return False
 
     # Search a small vertical window below y0 to find the best "top border" band.
-    band = 3
+    band = max(1, int(round(3 * s)))
     max_side_avg = 0.0
     best_mid_ratio = 1.0
-    search_h = min(24, max(6, hh // 6))
+    search_h = min(max(1, int(round(24 * s))), max(max(1, int(round(6 * s))), hh // 6))
     for dy in range(0, search_h):
         yy = min(h - 1, y0 + dy)
         top_band = horizontal[max(0, yy - band) : min(h, yy + band), x0:x1]
@@ -384,24 +722,658 @@ def _infer_view_from_border_gap(image_path: str, rect: Tuple[int, int, int, int]
             max_side_avg = side_avg
             best_mid_ratio = (mid_score / side_avg) if side_avg > 1e-6 else 1.0
 
-    if max_side_avg < 0.12:
+    if max_side_avg < VIEW_GAP_SIDE_MIN:
         return False
     # Middle must be significantly weaker than sides
-    return best_mid_ratio < 0.45
+    return best_mid_ratio < VIEW_GAP_MID_RATIO
+
 
+# Below this the choices call keeps sending the whole image.
+CHOICES_MIN_CONFIDENCE = 0.6
 
-def crop_inside_rect(image_path: str, rect: Tuple[int, int, int, int], *, inset: int = 4) -> Optional["object"]:
+
+@dataclass(frozen=True)
+class ChoicesBand:
     """
-    Return a PIL Image cropped to the inside of rect (excluding border by `inset`).
+    The ①–⑤ answer-choice band of a problem (see detect_choices_band).
+
+    - rect: (x, y, w, h) in original image coordinates
+    - confidence: 0..1, mostly the share of the five markers that were found
+    - markers: number of marker glyphs found
+    - source: "glyph" (circled-digit shapes in the binary map) or "ocr" (word boxes)
+    """
+
+    rect: Rect
+    confidence: float
+    markers: int
+    source: str
+
+
+def _circled_digits(binary) -> list[Rect]:  # type: ignore[no-untyped-def]
+    """
+    Boxes of circled-digit glyphs: a round ring (outer contour with one large
+    hole) with ink inside the hole. The ink test separates ①–⑤ from 'ㅇ', 'o'.
+    """
+    import cv2  # type: ignore[import-not-found]
+    import numpy as np  # type: ignore[import-not-found]
+
+    contours, hierarchy = cv2.findContours(binary, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+    if hierarchy is None:
+        return []
+    hierarchy = hierarchy[0]
+    found: list[Rect] = []
+    for i, contour in enumerate(contours):
+        # Outer boundaries only (holes have a parent in RETR_CCOMP).
+        if hierarchy[i][3] != -1 or hierarchy[i][2] == -1:
+            continue
+        x, y, w, h = cv2.boundingRect(contour)
+        if w < 7 or h < 7 or w > 120 or h > 120 or not (0.8 <= w / float(h) <= 1.25):
+            continue
+        area = cv2.contourArea(contour)
+        perimeter = cv2.arcLength(contour, True)
+        if perimeter <= 0 or 4.0 * 3.14159 * area / (perimeter * perimeter) < 0.7:
+            continue
+        # Largest hole must cover most of the disc (a ring, not a blob).
+        hole = -1
+        hole_area = 0.0
+        child = hierarchy[i][2]
+        while child != -1:
+            a = cv2.contourArea(contours[child])
+            if a > hole_area:
+                hole, hole_area = child, a
+            child = hierarchy[child][0]
+        if hole < 0 or hole_area < area * 0.35:
+            continue
+        # Ink strictly inside the hole (the ring itself sits in the bbox corners).
+        hx, hy, hw, hh = cv2.boundingRect(contours[hole])
+        mask = np.zeros((hh, hw), np.uint8)
+        cv2.drawContours(mask, [contours[hole] - (hx, hy)], -1, 255, thickness=cv2.FILLED)
+        mask = cv2.erode(mask, np.ones((3, 3), np.uint8), iterations=2)
+        inside = cv2.countNonZero(cv2.bitwise_and(binary[hy : hy + hh, hx : hx + hw], mask))
+        if inside < max(3, cv2.countNonZero(mask) * 0.06):
+            continue
+        found.append((int(x), int(y), int(w), int(h)))
+    return found
+
+
+def _choices_from_glyphs(analysis: LayoutAnalysis, exclude: Optional[Rect]) -> Optional[ChoicesBand]:
+    import numpy as np  # type: ignore[import-not-found]
+
+    binary = analysis.binary
+    marks = _circled_digits(binary)
+    if exclude is not None:
+        ex, ey, ew, eh = analysis.to_work(exclude)
+        marks = [m for m in marks if not (ex <= m[0] + m[2] / 2 <= ex + ew and ey <= m[1] + m[3] / 2 <= ey + eh)]
+    if not marks:
+        return None
+    size = float(np.median([max(m[2], m[3]) for m in marks]))
+    marks = [m for m in marks if 0.7 * size <= max(m[2], m[3]) <= 1.4 * size]
+
+    # Rows of markers, bottom-most group first: choices close a problem, and
+    # come as one row of five or up to five stacked rows.
+    marks.sort(key=lambda m: m[1] + m[3] / 2)
+    rows: list[list[Rect]] = []
+    for m in marks:
+        cy = m[1] + m[3] / 2
+        if rows and abs(cy - (rows[-1][0][1] + rows[-1][0][3] / 2)) <= size * 0.6:
+            rows[-1].append(m)
+        else:
+            rows.append([m])
+    group: list[list[Rect]] = []
+    for row in reversed(rows):
+        if group:
+            gap = group[-1][0][1] - (row[0][1] + row[0][3])
+            if gap > size * 3.0 or sum(len(r) for r in group) + len(row) > len(CHOICE_MARKS):
+                break
+        group.append(row)
+        if sum(len(r) for r in group) >= len(CHOICE_MARKS):
+            break
+    members = [m for row in group for m in row]
+    count = len(members)
+
+    h, w = binary.shape[:2]
+    pad = int(round(size))
+    x0 = max(0, min(m[0] for m in members) - pad // 2)
+    y0 = max(0, min(m[1] for m in members) - pad)
+    y1 = min(h, max(m[1] + m[3] for m in members) + pad)
+    cols = np.flatnonzero(binary[y0:y1, x0:].any(axis=0))
+    x1 = min(w, x0 + int(cols[-1]) + 1 + pad // 2) if cols.size else w
+    confidence = min(1.0, count / float(len(CHOICE_MARKS)))
+    if len(group) > 1 and any(len(r) > 1 for r in group) and count < len(CHOICE_MARKS):
+        # Partial grid of markers: more likely stray round glyphs.
+        confidence *= 0.8
+    return ChoicesBand(
+        rect=analysis.to_original((x0, y0, x1 - x0, y1 - y0)),
+        confidence=round(confidence, 3),
+        markers=count,
+        source="glyph",
+    )
+
+
+def _choices_from_words(
+    words: Iterable[OcrWord], size: Tuple[int, int], exclude: Optional[Rect]
+) -> Optional[ChoicesBand]:
+    outside = [
+        w for w in words
+        if exclude is None
+        or not (exclude[0] <= w.center[0] <= exclude[0] + exclude[2] and exclude[1] <= w.center[1] <= exclude[1] + exclude[3])
+    ]
+    marked = [w for w in outside if any(ch in CHOICE_MARKS for ch in w.text)]
+    if not marked:
+        return None
+    seen = {ch for w in marked for ch in w.text if ch in CHOICE_MARKS}
+    top = min(w.top for w in marked)
+    band = [w for w in outside if w.top + w.height > top]
+    x0 = min(w.left for w in band)
+    y0 = min(w.top for w in band)
+    x1 = max(w.left + w.width for w in band)
+    y1 = max(w.top + w.height for w in band)
+    pad = int(max(w.height for w in marked) * 0.5)
+    x0, y0 = max(0, x0 - pad), max(0, y0 - pad)
+    x1, y1 = min(size[0], x1 + pad), min(size[1], y1 + pad)
+    return ChoicesBand(
+        rect=(x0, y0, x1 - x0, y1 - y0),
+        confidence=round(len(seen) / float(len(CHOICE_MARKS)), 3),
+        markers=len(marked),
+        source="ocr",
+    )
+
+
+def detect_choices_band(
+    image: "ImageSource | LayoutAnalysis",
+    *,
+    words: Optional[Iterable[OcrWord]] = None,
+    exclude: Optional[Rect] = None,
+) -> Optional[ChoicesBand]:
     """
+    Locate the ①–⑤ answer-choice band so only that strip is sent for the
+    choices call.
+
+    Circled digits are found as ring-shaped glyphs with ink inside; OCR
+    `words` (when given) add a second opinion from the recognized marker
+    characters, and the more confident of the two wins. `exclude` (the
+    container rect) is ignored. Callers should fall back to the whole image
+    when the result is None or below CHOICES_MIN_CONFIDENCE.
+    """
+    analysis = LayoutAnalysis.of(image)
+    if analysis is None:
+        return None
+    candidates: list[ChoicesBand] = []
     try:
-        from PIL import Image  # type: ignore[import-not-found]
-    except Exception:
+        band = _choices_from_glyphs(analysis, exclude)
+        if band is not None:
+            candidates.append(band)
+    except Exception as e:
+        _log.warning("detect_choices_band: glyph pass failed: %s", e)
+    if words is not None:
+        band = _choices_from_words(words, analysis.prepared.size, exclude)
+        if band is not None:
+            candidates.append(band)
+    if not candidates:
         return None
+    best = max(candidates, key=lambda b: b.confidence)
+    _log.debug("Choices band: %s", best)
+    return best
+
+
+@dataclass(frozen=True)
+class ProblemSegment:
+    """
+    One problem on a page (see segment_page).
+
+    - index: reading order (column by column, top to bottom)
+    - rect: (x, y, w, h) of the problem in original image coordinates
+    - number: problem number when OCR words were supplied and an anchor was read
+    - containers: boxes inside the problem; templates come from border strength
+      and the border-gap heuristic (no per-box OCR)
+    """
+
+    index: int
+    rect: Rect
+    number: Optional[int]
+    containers: Tuple[ContainerDetection, ...]
+
+
+_PROBLEM_NUMBER_RE = re.compile(r"^(\d{1,2})[.)]?$")
+
+
+def _ink_runs(profile, min_value: float, min_gap: int = 1) -> list[tuple[int, int]]:  # type: ignore[no-untyped-def]
+    """[start, end) runs where profile > min_value; runs closer than min_gap are merged."""
+    import numpy as np  # type: ignore[import-not-found]
+
+    mask = np.asarray(profile) > min_value
+    if not mask.any():
+        return []
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    runs = [(int(a), int(b)) for a, b in zip(edges[::2], edges[1::2])]
+    merged: list[tuple[int, int]] = [runs[0]]
+    for a, b in runs[1:]:
+        if a - merged[-1][1] < min_gap:
+            merged[-1] = (merged[-1][0], b)
+        else:
+            merged.append((a, b))
+    return merged
+
+
+def _page_columns(binary) -> list[tuple[int, int]]:  # type: ignore[no-untyped-def]
+    """Split a two-column exam page at an empty vertical gutter near the middle."""
+    h, w = binary.shape[:2]
+    profile = (binary > 0).sum(axis=0)
+    lo, hi = int(w * 0.3), int(w * 0.7)
+    empty = profile[lo:hi] <= max(1, int(h * 0.005))
+    best: Optional[tuple[int, int]] = None
+    for a, b in _ink_runs(empty, 0):
+        if best is None or (b - a) > (best[1] - best[0]):
+            best = (a, b)
+    if best is None or (best[1] - best[0]) < max(8, int(w * 0.02)):
+        return [(0, w)]
+    g0, g1 = lo + best[0], lo + best[1]
+    # Both sides need real content, otherwise it is just a wide right margin.
+    if profile[:g0].sum() < h or profile[g1:].sum() < h:
+        return [(0, w)]
+    return [(0, g0), (g1, w)]
+
+
+def _text_lines(binary, x0: int, x1: int) -> list[tuple[int, int, int]]:  # type: ignore[no-untyped-def]
+    """(top, bottom, left) of ink bands in columns [x0, x1)."""
+    import numpy as np  # type: ignore[import-not-found]
+
+    region = binary[:, x0:x1] > 0
+    rows = region.sum(axis=1)
+    lines = []
+    for top, bottom in _ink_runs(rows, max(1, int((x1 - x0) * 0.002)), min_gap=2):
+        if bottom - top < 3:
+            continue
+        cols = np.flatnonzero(region[top:bottom].any(axis=0))
+        lines.append((top, bottom, x0 + int(cols[0])))
+    return lines
+
+
+def segment_page(
+    image: "ImageSource | LayoutAnalysis",
+    *,
+    words: Optional[Iterable[OcrWord]] = None,
+) -> list[ProblemSegment]:
+    """
+    Split a page into problems and find the containers inside each.
+
+    Problems start at anchor lines: lines that start with a problem number
+    token in the OCR `words` ('3.', '12'), near the column's left margin and
+    after a larger than usual vertical gap. Two-column pages are read left
+    column first.
+
+    Without `words` the page is not split: a flush-left line after a gap is
+    just as often the stem below a box or a choices row of the same problem.
+    A page without two or more anchors returns a single segment covering the
+    whole image, so single-problem captures keep the existing path.
+    """
+    analysis = LayoutAnalysis.of(image)
+    if analysis is None:
+        return []
+    ow, oh = analysis.prepared.size
+    whole = [ProblemSegment(index=0, rect=(0, 0, ow, oh), number=None, containers=())]
+    s = analysis.scale
+    number_tops: list[tuple[float, float, int]] = []
+    for word in words or ():
+        m = _PROBLEM_NUMBER_RE.match(word.text.strip())
+        if m:
+            number_tops.append((word.left * s, word.top * s, int(m.group(1))))
+    if len(number_tops) < 2:
+        return whole
     try:
-        img = Image.open(image_path).convert("RGB")
-    except Exception:
+        import numpy as np  # type: ignore[import-not-found]
+
+        binary = analysis.binary
+    except Exception as e:
+        _log.warning("segment_page: analysis unavailable: %s", e)
+        return whole
+    h, _w = binary.shape[:2]
+
+    spans: list[tuple[int, int, int, int, Optional[int]]] = []  # (x0, x1, y0, y1, number) in work coords
+    for cx0, cx1 in _page_columns(binary):
+        lines = _text_lines(binary, cx0, cx1)
+        if len(lines) < 2:
+            continue
+        heights = [b - t for t, b, _l in lines]
+        gaps = [lines[i][0] - lines[i - 1][1] for i in range(1, len(lines))]
+        median_h = float(np.median(heights))
+        median_gap = float(np.median(gaps))
+        margin = min(l for _t, _b, l in lines)
+        tol = max(4, int((cx1 - cx0) * 0.01))
+
+        starts: list[tuple[int, Optional[int]]] = []
+        for i, (top, bottom, _left) in enumerate(lines):
+            hits = [n for nx, ny, n in number_tops if cx0 <= nx < cx1 and top - median_h / 2 <= ny < bottom and nx - margin <= tol * 3]
+            if not hits:
+                continue
+            if i > 0 and gaps[i - 1] < max(median_gap * 1.5, median_h * 0.8):
+                continue
+            starts.append((i, hits[0]))
+
+        pad = int(median_h * 0.5)
+        for k, (i, number) in enumerate(starts):
+            y0 = max(0, lines[i][0] - pad)
+            if k + 1 < len(starts):
+                y1 = max(y0 + 1, lines[starts[k + 1][0]][0] - pad)
+            else:
+                y1 = min(h, lines[-1][1] + pad)
+            spans.append((cx0, cx1, y0, y1, number))
+
+    if len(spans) < 2:
+        return whole
+
+    # Containers: grid rectangles (filtered relative to their problem) per span.
+    rects_by_span: list[list[Rect]] = [[] for _ in spans]
+    for x, y, ww, hh in analysis.grid_rects:
+        if ww < 40 or hh < 20:
+            continue
+        aspect = ww / max(1.0, float(hh))
+        if aspect < RECT_MIN_ASPECT or aspect > RECT_MAX_ASPECT:
+            continue
+        cx, cy = x + ww / 2.0, y + hh / 2.0
+        for k, (sx0, sx1, sy0, sy1, _n) in enumerate(spans):
+            if sx0 <= cx < sx1 and sy0 <= cy < sy1:
+                area = float((sx1 - sx0) * (sy1 - sy0))
+                if area * RECT_MIN_AREA_FRAC <= ww * hh <= area * RECT_MAX_AREA_FRAC:
+                    rects_by_span[k].append((x, y, ww, hh))
+                break
+
+    segments: list[ProblemSegment] = []
+    for k, ((sx0, sx1, sy0, sy1, number), rects) in enumerate(zip(spans, rects_by_span)):
+        # Drop rects nested in a larger one (inner table cells, double borders).
+        outer = [
+            r for r in rects
+            if not any(
+                o != r and o[0] <= r[0] and o[1] <= r[1] and o[0] + o[2] >= r[0] + r[2] and o[1] + o[3] >= r[1] + r[3]
+                for o in rects
+            )
+        ]
+        outer.sort(key=lambda r: (r[1], r[0]))
+        scores = border_scores(analysis.grid, outer, integral=analysis.grid_integral) if outer else []
+        containers = []
+        for rect, score in zip(outer, scores):
+            original = analysis.to_original(rect)
+            if _infer_view_from_border_gap(analysis, original):
+                template: ContainerTemplate = "header.hwp"
+            else:
+                template = "box.hwp" if score >= BOX_BORDER_MIN_SCORE else "box_white.hwp"
+            containers.append(
+                ContainerDetection(
+                    template=template,
+                    rect=original,
+                    has_view_text=template == "header.hwp",
+                    border_score=float(score),
+                )
+            )
+        segments.append(
+            ProblemSegment(
+                index=k,
+                rect=analysis.to_original((sx0, sy0, sx1 - sx0, sy1 - sy0)),
+                number=number,
+                containers=tuple(containers),
+            )
+        )
+    _log.debug("segment_page: %d problems", len(segments))
+    return segments
+
+
+# Table cells: a table needs at least this share of cells with OCR text before
+# AIWorker emits insert_table itself instead of leaving the grid to the model.
+TABLE_MIN_FILLED = 0.8
+# Ruling lines must span this share of the table width/height.
+TABLE_LINE_MIN_SPAN = 0.6
+
+_TABLE_NUMBER_RE = re.compile(r"[-+−]?\d[\d,]*(\.\d+)?%?|[-+−]?\.\d+%?")
+_HANGUL_RE = re.compile(r"[가-힣]")
+_MATH_CHARS = set("=<>≤≥^_/()√∑∫±×÷")
+
+
+@dataclass(frozen=True)
+class TableGrid:
+    """
+    A ruled table (see detect_tables). Coordinates are in the original image.
+
+    - rect: outer (x, y, w, h)
+    - row_lines / col_lines: y / x of the ruling lines, outer borders included,
+      so there are len(row_lines) - 1 rows and len(col_lines) - 1 columns
+    - cells: OCR text per cell, row-major ("" when nothing was read); empty
+      tuple when cells were not read
+    """
+
+    rect: Rect
+    row_lines: Tuple[int, ...]
+    col_lines: Tuple[int, ...]
+    cells: Tuple[Tuple[str, ...], ...] = ()
+
+    @property
+    def rows(self) -> int:
+        return len(self.row_lines) - 1
+
+    @property
+    def cols(self) -> int:
+        return len(self.col_lines) - 1
+
+    @property
+    def filled(self) -> float:
+        """Share of cells with text."""
+        total = self.rows * self.cols
+        if not self.cells or total <= 0:
+            return 0.0
+        return sum(1 for row in self.cells for cell in row if cell) / float(total)
+
+    def contains(self, x: float, y: float) -> bool:
+        tx, ty, tw, th = self.rect
+        return tx <= x < tx + tw and ty <= y < ty + th
+
+    def overlaps(self, rect: Rect, min_iou: float = 0.8) -> bool:
+        """True when `rect` (e.g. a detected container) is this table's outline."""
+        ax, ay, aw, ah = self.rect
+        bx, by, bw, bh = rect
+        ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+        iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+        inter = ix * iy
+        union = aw * ah + bw * bh - inter
+        return union > 0 and inter / float(union) >= min_iou
+
+    def cell_rect(self, row: int, col: int) -> Rect:
+        x0, x1 = self.col_lines[col], self.col_lines[col + 1]
+        y0, y1 = self.row_lines[row], self.row_lines[row + 1]
+        return (x0, y0, x1 - x0, y1 - y0)
+
+    def insert_table_call(self) -> str:
+        """
+        The script line for this table: numbers and Hangul stay text, cells with
+        Latin letters or math operators get the "EQ:" prefix (see the TABLE RULE
+        in the image prompt). Mostly numeric tables are centered.
+        """
+        data = [[_table_cell_value(cell) for cell in row] for row in self.cells]
+        numeric = sum(
+            1 for row in data for cell in row if cell.startswith("EQ:") or _TABLE_NUMBER_RE.fullmatch(cell)
+        )
+        center = numeric >= 0.8 * max(1, self.rows * self.cols)
+        lines = [f"insert_table({self.rows}, {self.cols}, cell_data=["]
+        lines += [f"    {row!r}," for row in data]
+        lines.append("], align_center=True)" if center else "])")
+        return "\n".join(lines)
+
+
+def _table_cell_value(text: str) -> str:
+    text = " ".join(text.split())
+    if not text or _TABLE_NUMBER_RE.fullmatch(text) or _HANGUL_RE.search(text):
+        return text
+    if any(ch.isascii() and ch.isalpha() for ch in text) or any(ch in _MATH_CHARS for ch in text):
+        return "EQ:" + text
+    return text
+
+
+def _ruling_lines(coverage, min_span: float) -> list[tuple[int, int]]:  # type: ignore[no-untyped-def]
+    """[start, end) runs of rows/columns whose line coverage reaches min_span."""
+    return _ink_runs(coverage, min_span - 1e-6, min_gap=2)
+
+
+def _table_structure(analysis: LayoutAnalysis, rect: Rect) -> Optional[tuple[list[int], list[int], int]]:
+    """Row/column boundaries of a ruled grid inside `rect` (working coords), plus line thickness."""
+    import cv2  # type: ignore[import-not-found]
+    import numpy as np  # type: ignore[import-not-found]
+
+    x, y, w, h = rect
+    pad = 2
+    H, W = analysis.binary.shape[:2]
+    x0, y0 = max(0, x - pad), max(0, y - pad)
+    x1, y1 = min(W, x + w + pad), min(H, y + h + pad)
+    crop = analysis.binary[y0:y1, x0:x1]
+    # Lines local to the table: the page-wide kernels drop short cell walls.
+    h_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(10, int(w * 0.5)), 1))
+    v_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(10, int(h * 0.5))))
+    horizontal = cv2.morphologyEx(crop, cv2.MORPH_OPEN, h_kernel)
+    vertical = cv2.morphologyEx(crop, cv2.MORPH_OPEN, v_kernel)
+    rows = _ruling_lines((horizontal > 0).sum(axis=1) / float(max(1, w)), TABLE_LINE_MIN_SPAN)
+    cols = _ruling_lines((vertical > 0).sum(axis=0) / float(max(1, h)), TABLE_LINE_MIN_SPAN)
+    if not rows:
+        return None
+    thickness = int(np.median([b - a for a, b in rows + cols]))
+    row_pos = [y0 + (a + b) // 2 for a, b in rows]
+    col_pos = [x0 + (a + b) // 2 for a, b in cols]
+    # Open sides (no outer wall) still bound the grid.
+    tol = max(3, thickness * 2)
+    if row_pos[0] - y > tol:
+        row_pos.insert(0, y)
+    if y + h - 1 - row_pos[-1] > tol:
+        row_pos.append(y + h - 1)
+    if not col_pos or col_pos[0] - x > tol:
+        col_pos.insert(0, x)
+    if x + w - 1 - col_pos[-1] > tol:
+        col_pos.append(x + w - 1)
+    min_cell = max(6, thickness * 3)
+    if any(b - a < min_cell for a, b in zip(row_pos, row_pos[1:])):
+        return None
+    if any(b - a < min_cell for a, b in zip(col_pos, col_pos[1:])):
+        return None
+    return row_pos, col_pos, thickness
+
+
+def detect_tables(
+    image: "ImageSource | LayoutAnalysis",
+    *,
+    words: Optional[Iterable[OcrWord]] = None,
+    read_cells: bool = True,
+    lang: str = "kor+eng",
+) -> list[TableGrid]:
+    """
+    Find ruled tables (at least 2 x 2 cells) and read their cells.
+
+    Candidates are the grid contours the container detector uses; a candidate
+    is a table when ruling lines cross its interior both ways, which is what
+    separates it from a plain box container. Cell text comes from `words` (page
+    OCR, assigned by word center) or, without words, from one Tesseract pass
+    over the table crop with the ruling lines painted out.
+    """
+    analysis = LayoutAnalysis.of(image)
+    if analysis is None:
+        return []
+    try:
+        rects = analysis.grid_rects
+    except Exception as e:
+        _log.warning("detect_tables: grid unavailable: %s", e)
+        return []
+    w, h = analysis.size
+    min_w = 40 * min(1.0, analysis.level_ratio)
+    min_h = 20 * min(1.0, analysis.level_ratio)
+    tables: list[TableGrid] = []
+    for rect in sorted(rects, key=lambda r: (r[1], r[0])):
+        rx, ry, rw, rh = rect
+        if rw < min_w * 2 or rh < min_h * 2 or rw * rh > w * h * RECT_MAX_AREA_FRAC:
+            continue
+        structure = _table_structure(analysis, rect)
+        if structure is None:
+            continue
+        row_pos, col_pos, _thickness = structure
+        if len(row_pos) < 3 or len(col_pos) < 3:
+            continue
+        inv = 1.0 / analysis.scale if analysis.scale < 1.0 else 1.0
+        table = TableGrid(
+            rect=analysis.to_original(rect),
+            row_lines=tuple(int(v * inv) for v in row_pos),
+            col_lines=tuple(int(v * inv) for v in col_pos),
+        )
+        _log.debug("Table: %s %dx%d", table.rect, table.rows, table.cols)
+        tables.append(table)
+    if read_cells and tables:
+        words = list(words) if words is not None else None
+        tables = [read_table_cells(analysis.prepared, t, words=words, lang=lang) for t in tables]
+    return tables
+
+
+def read_table_cells(
+    image: ImageSource,
+    table: TableGrid,
+    *,
+    words: Optional[Iterable[OcrWord]] = None,
+    lang: str = "kor+eng",
+) -> TableGrid:
+    """Return `table` with cells filled from `words`, or from OCR of the de-ruled table crop."""
+    from dataclasses import replace
+
+    prepared = _prepare(image)
+    if prepared is None:
+        return table
+    tx, ty, tw, th = table.rect
+    if words is None:
+        try:
+            from PIL import ImageDraw  # type: ignore[import-not-found]
+
+            from ocr_pipeline import extract_words
+
+            crop = prepared.original.crop((tx, ty, tx + tw, ty + th))
+            draw = ImageDraw.Draw(crop)
+            line = max(2, int(round(3.0 / max(1e-6, prepared.scale_for(RECT_MAX_DIM)))))
+            for yy in table.row_lines:
+                draw.rectangle([0, yy - ty - line, tw, yy - ty + line], fill=(255, 255, 255))
+            for xx in table.col_lines:
+                draw.rectangle([xx - tx - line, 0, xx - tx + line, th], fill=(255, 255, 255))
+            found = extract_words(crop, lang=lang, config="--psm 11")
+        except OcrError as e:
+            _log.warning("read_table_cells: OCR unavailable: %s", e)
+            return table
+        words = [replace(wd, left=wd.left + tx, top=wd.top + ty) for wd in found]
+
+    cells: list[list[list[OcrWord]]] = [[[] for _ in range(table.cols)] for _ in range(table.rows)]
+    for word in words:
+        cx, cy = word.center
+        if not table.contains(cx, cy) or word.conf < 0:
+            continue
+        r = _bisect_cell(table.row_lines, cy)
+        c = _bisect_cell(table.col_lines, cx)
+        if r is not None and c is not None:
+            cells[r][c].append(word)
+    text = tuple(
+        tuple(" ".join(wd.text for wd in sorted(cell, key=lambda wd: (wd.top // max(1, wd.height), wd.left))) for cell in row)
+        for row in cells
+    )
+    return replace(table, cells=text)
+
+
+def _bisect_cell(lines: Tuple[int, ...], pos: float) -> Optional[int]:
+    import bisect
+
+    i = bisect.bisect_right(lines, pos) - 1
+    return i if 0 <= i < len(lines) - 1 else None
+
+
+def crop_inside_rect(
+    image: ImageSource, rect: Tuple[int, int, int, int], *, inset: int = 4, as_array: bool = False
+) -> Optional["object"]:
+    """
+    Return a PIL Image cropped to the inside of rect (excluding border by `inset`).
+
+    as_array=True returns a read-only RGB numpy view into PreparedImage.pixels()
+    instead (no copy); AIClient and the OCR functions accept it directly.
+    """
+    prepared = _prepare(image)
+    if prepared is None:
         return None
+    img = prepared.original
     x, y, w, h = rect
     x0 = max(0, x + inset)
     y0 = max(0, y + inset)
@@ -409,27 +1381,46 @@ def crop_inside_rect(image_path: str, rect: Tuple[int, int, int, int], *, inset:
     y1 = min(img.height, y + h - inset)
     if x1 <= x0 or y1 <= y0:
         return None
+    if as_array:
+        return prepared.pixels()[y0:y1, x0:x1]
     return img.crop((x0, y0, x1, y1))
 
 
-def mask_rect_on_image(image_path: str, rect: Tuple[int, int, int, int], *, pad: int = 2) -> Optional["object"]:
+def mask_rect_on_image(
+    image: ImageSource, rect: Tuple[int, int, int, int], *, pad: int = 2, as_array: bool = False
+) -> Optional["object"]:
     """
     Return a PIL Image with the given rect area masked to white.
+
+    as_array=True returns an RGB numpy array instead (one copy of the pixels,
+    the masked area filled by slice assignment).
     """
-    try:
-        from PIL import Image, ImageDraw  # type: ignore[import-not-found]
-    except Exception:
+    return mask_rects_on_image(image, [rect], pad=pad, as_array=as_array)
+
+
+def mask_rects_on_image(
+    image: ImageSource, rects: Iterable[Tuple[int, int, int, int]], *, pad: int = 2, as_array: bool = False
+) -> Optional["object"]:
+    """mask_rect_on_image for several rects with a single copy of the pixels."""
+    prepared = _prepare(image)
+    if prepared is None:
         return None
+    width, height = prepared.size
+    boxes = []
+    for x, y, w, h in rects:
+        boxes.append((max(0, x - pad), max(0, y - pad), min(width, x + w + pad), min(height, y + h + pad)))
+    if as_array:
+        masked = prepared.pixels().copy()
+        for x0, y0, x1, y1 in boxes:
+            # Same (inclusive) area as ImageDraw.rectangle below.
+            masked[y0 : y1 + 1, x0 : x1 + 1] = 255
+        return masked
     try:
-        img = Image.open(image_path).convert("RGB")
+        from PIL import ImageDraw  # type: ignore[import-not-found]
     except Exception:
         return None
-    x, y, w, h = rect
-    x0 = max(0, x - pad)
-    y0 = max(0, y - pad)
-    x1 = min(img.width, x + w + pad)
-    y1 = min(img.height, y + h + pad)
+    img = prepared.original.copy()
     draw = ImageDraw.Draw(img)
-    draw.rectangle([x0, y0, x1, y1], fill=(255, 255, 255))
+    for x0, y0, x1, y1 in boxes:
+        draw.rectangle([x0, y0, x1, y1], fill=(255, 255, 255))
     return img
-
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Iterable, Optional, Tuple
+
+from ocr_pipeline import DIGEST_MIN_CONF, OcrMode, OcrWord
+
+# Per-call budget for OCR context in the prompt (estimated tokens).
+OCR_CONTEXT_TOKEN_BUDGET = 600
+# Words below this confidence are dropped even in full mode (Tesseract noise).
+FULL_MIN_CONF = 30
+
+CHOICE_MARKS = "①②③④⑤"
+
+_SPACE_RE = re.compile(r"[ \t\u00a0\u3000]+")
+_MEANINGFUL_RE = re.compile(r"[0-9A-Za-z가-힣ㄱ-ㆎ①-⑮]")
+_BRACKETS = str.maketrans({"〈": "<", "〉": ">", "《": "<", "》": ">", "＜": "<", "＞": ">"})
+
+
+@dataclass(frozen=True)
+class RegionContext:
+    """OCR context split per split-call region of a container image."""
+
+    outside: str
+    inside: str
+    choices: str
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough prompt-token estimate without a tokenizer:
+    ~4 ASCII characters per token, ~1 token per non-ASCII (Hangul/symbol) character.
+    """
+    if not text:
+        return 0
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def min_conf_for_mode(mode: OcrMode) -> float:
+    return float(DIGEST_MIN_CONF if mode == "digest" else FULL_MIN_CONF)
+
+
+def _normalize_line(line: str) -> str:
+    line = line.translate(_BRACKETS)
+    return _SPACE_RE.sub(" ", line).strip()
+
+
+def _is_garbage(line: str) -> bool:
+    """Lines that are mostly punctuation/noise (e.g. '|:;_~', '— —')."""
+    if not line:
+        return True
+    meaningful = len(_MEANINGFUL_RE.findall(line))
+    if meaningful == 0:
+        return True
+    compact = line.replace(" ", "")
+    # Short lines are fine when meaningful (problem numbers, '①', 'x').
+    if len(compact) <= 3:
+        return False
+    return meaningful / float(len(compact)) < 0.5
+
+
+def format_ocr_lines(
+    lines: Iterable[str], *, max_tokens: int = OCR_CONTEXT_TOKEN_BUDGET
+) -> str:
+    """
+    Normalize, de-duplicate and budget OCR lines.
+
+    Whitespace runs collapse to one space, bracket variants normalize to '<' '>',
+    noise lines are dropped, repeated lines keep their first occurrence only, and
+    lines are kept in order until `max_tokens` would be exceeded.
+    """
+    out: list[str] = []
+    seen: set[str] = set()
+    used = 0
+    for raw in lines:
+        line = _normalize_line(raw)
+        if _is_garbage(line):
+            continue
+        key = line.replace(" ", "")
+        if key in seen:
+            continue
+        seen.add(key)
+        cost = estimate_tokens(line) + 1
+        if max_tokens > 0 and used + cost > max_tokens:
+            break
+        out.append(line)
+        used += cost
+    return "\n".join(out)
+
+
+def format_ocr_context(
+    source: "str | Iterable[OcrWord]",
+    *,
+    min_conf: float = FULL_MIN_CONF,
+    max_tokens: int = OCR_CONTEXT_TOKEN_BUDGET,
+) -> str:
+    """
+    Build compact prompt context from raw OCR text or structured OCR words.
+    Word input additionally drops tokens with confidence below `min_conf`.
+    """
+    if isinstance(source, str):
+        return format_ocr_lines(source.splitlines(), max_tokens=max_tokens)
+    return format_ocr_lines(_word_lines(source, min_conf), max_tokens=max_tokens)
+
+
+def _word_lines(words: Iterable[OcrWord], min_conf: float) -> list[str]:
+    lines: dict[tuple[int, int, int], list[OcrWord]] = {}
+    for word in words:
+        if word.conf < min_conf:
+            continue
+        lines.setdefault(word.line, []).append(word)
+    ordered = sorted(lines.values(), key=lambda ws: (min(w.top for w in ws), min(w.left for w in ws)))
+    return [" ".join(w.text for w in sorted(ws, key=lambda w: w.left)) for ws in ordered]
+
+
+def _inside(word: OcrWord, rect: Tuple[int, int, int, int]) -> bool:
+    x, y, w, h = rect
+    cx, cy = word.center
+    return x <= cx <= x + w and y <= cy <= y + h
+
+
+def split_region_context(
+    words: Iterable[OcrWord],
+    rect: Optional[Tuple[int, int, int, int]],
+    *,
+    min_conf: float = FULL_MIN_CONF,
+    max_tokens: int = OCR_CONTEXT_TOKEN_BUDGET,
+) -> RegionContext:
+    """
+    Split OCR words into per-call context for the container split path.
+
+    - inside: words whose center falls in the container rect
+    - choices: OCR lines outside the rect that carry ①–⑤ markers, and everything below them
+    - outside: the remaining lines (problem statement)
+
+    Each region gets its own token budget so a split call only carries its own text.
+    """
+    inside_words: list[OcrWord] = []
+    outside_words: list[OcrWord] = []
+    for word in words:
+        if word.conf < min_conf:
+            continue
+        if rect is not None and _inside(word, rect):
+            inside_words.append(word)
+        else:
+            outside_words.append(word)
+
+    by_line: dict[tuple[int, int, int], list[OcrWord]] = {}
+    for word in outside_words:
+        by_line.setdefault(word.line, []).append(word)
+    choice_top: Optional[int] = None
+    for line_words in by_line.values():
+        if any(ch in CHOICE_MARKS for w in line_words for ch in w.text):
+            top = min(w.top for w in line_words)
+            if choice_top is None or top < choice_top:
+                choice_top = top
+
+    question_words: list[OcrWord] = []
+    choice_words: list[OcrWord] = []
+    for line_words in by_line.values():
+        top = min(w.top for w in line_words)
+        if choice_top is not None and top >= choice_top:
+            choice_words.extend(line_words)
+        else:
+            question_words.extend(line_words)
+
+    return RegionContext(
+        outside=format_ocr_lines(_word_lines(question_words, -1.0), max_tokens=max_tokens),
+        inside=format_ocr_lines(_word_lines(inside_words, -1.0), max_tokens=max_tokens),
+        choices=format_ocr_lines(_word_lines(choice_words, -1.0), max_tokens=max_tokens),
+    )
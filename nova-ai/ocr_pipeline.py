@@ -1,21 +1,480 @@
 from __future__ import annotations
 
+import json
+import math
 import os
-from typing import Optional
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Literal, Optional, Tuple
 
 MAX_IMAGE_DIM = 2048  # Higher cap to improve OCR accuracy
 
+OcrMode = Literal["skip", "full", "digest"]
+OcrLang = Literal["kor", "eng", "kor+eng"]
+DEFAULT_LANG: OcrLang = "kor+eng"
+
+# Quality thresholds for the OCR policy (see decide_ocr_mode).
+# Text height is measured in original-image pixels.
+SKIP_MIN_CONTRAST = 0.60
+SKIP_MIN_TEXT_HEIGHT = 18.0
+SKIP_MIN_SHORT_SIDE = 600
+DIGEST_MAX_CONTRAST = 0.35
+DIGEST_MAX_TEXT_HEIGHT = 11.0
+DIGEST_MIN_CONF = 60
+
+_QUALITY_PROBE_DIM = 1024
+
+# OCR preprocessing (see prepare_for_ocr).
+# Text lines are rescaled to about this height (original-image line height as
+# measured by measure_image_quality), which keeps x-height in Tesseract's sweet spot.
+TARGET_TEXT_HEIGHT = 32.0
+MIN_OCR_RESCALE = 0.5
+MAX_OCR_RESCALE = 3.0
+MAX_OCR_DIM = 4096
+DESKEW_MAX_ANGLE = 5.0
+DESKEW_MIN_ANGLE = 0.3
+_DESKEW_PROBE_DIM = 1000
+
+# Script detector: a text line is "Hangul-bearing" when its columns average at
+# least this many vertical ink runs (syllable blocks stack 2-3 jamo) and its top
+# quarter carries ink comparable to the middle (no x-height band as in Latin).
+HANGUL_MIN_COMPLEXITY = 1.95
+HANGUL_MIN_COMPLEXITY_SMALL = 1.70  # lines under 20px merge strokes
+HANGUL_MIN_TOP_RATIO = 0.55
+KOR_ONLY_MIN_RATIO = 0.90
+_decision_log_lock = threading.Lock()
+
 
 class OcrError(RuntimeError):
     """Raised when OCR extraction fails."""
 
 
-def extract_text(image_path: str) -> str:
+@dataclass(frozen=True)
+class ImageQuality:
+    """
+    Fast image-quality signals used by the OCR policy.
+
+    - width/height: original image size in pixels
+    - contrast: 0..1 spread between dark and light grayscale percentiles
+    - text_height: median text line height in original pixels (0 when unknown)
+    """
+
+    width: int
+    height: int
+    contrast: float
+    text_height: float
+
+
+@dataclass(frozen=True)
+class OcrDecision:
+    """Per-image OCR choice: skip OCR, send full OCR, or send a confident-only digest."""
+
+    mode: OcrMode
+    reason: str
+    quality: ImageQuality
+
+
+@dataclass(frozen=True)
+class ScriptGuess:
+    """
+    Result of the glyph-density script detector.
+
+    - lang: Tesseract language string to use
+    - hangul_ratio: share of text lines that carry Hangul
+    - lines: number of text lines measured
+    - equation_rects: Latin/math-only lines (original coords) that can be masked
+      so the rest of the image can run with `kor` alone
+    """
+
+    lang: OcrLang
+    hangul_ratio: float
+    lines: int
+    equation_rects: tuple[tuple[int, int, int, int], ...] = ()
+
+
+@dataclass(frozen=True)
+class OcrWord:
+    """
+    One Tesseract word box.
+
+    - left/top/width/height: box in original-image coordinates
+    - line: (block_num, par_num, line_num) key of the OCR line the word belongs to
+    """
+
+    text: str
+    conf: float
+    left: int
+    top: int
+    width: int
+    height: int
+    line: tuple[int, int, int]
+
+    @property
+    def center(self) -> tuple[float, float]:
+        return (self.left + self.width / 2.0, self.top + self.height / 2.0)
+
+
+@dataclass
+class PreparedImage:
+    """
+    An image loaded once per job, with derived views cached on first use.
+
+    OCR, the OCR policy and layout_detector share this object so the file is
+    decoded once and the resized/grayscale/binary maps, the skew estimate and
+    the preprocessed OCR input are computed once per image.
+    """
+
+    path: str
+    original: Any  # PIL.Image (RGB)
+    _cache: dict[Any, Any] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def load(cls, image_path: str) -> "PreparedImage":
+        try:
+            from PIL import Image  # type: ignore[import-not-found]
+        except Exception as exc:
+            raise OcrError("Pillow is not installed.") from exc
+        try:
+            image = Image.open(image_path).convert("RGB")
+        except Exception as exc:
+            raise OcrError(f"이미지를 열 수 없습니다: {image_path}") from exc
+        return cls(path=image_path, original=image)
+
+    @classmethod
+    def from_any(cls, image: "ImageInput", *, path: str = "<memory>") -> "PreparedImage":
+        """
+        Wrap an in-memory image (PIL image, or uint8 RGB/grayscale numpy array
+        such as a crop view) without a disk round trip. Paths are loaded; a
+        PreparedImage is returned as is.
+        """
+        if isinstance(image, PreparedImage):
+            return image
+        if isinstance(image, (str, os.PathLike)):
+            return cls.load(os.fspath(image))
+        try:
+            from PIL import Image  # type: ignore[import-not-found]
+        except Exception as exc:
+            raise OcrError("Pillow is not installed.") from exc
+        if not isinstance(image, Image.Image):
+            try:
+                import numpy as np  # type: ignore[import-not-found]
+
+                image = Image.fromarray(np.ascontiguousarray(image, dtype=np.uint8))
+            except Exception as exc:
+                raise OcrError(f"지원하지 않는 이미지 형식입니다: {type(image).__name__}") from exc
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        return cls(path=path, original=image)
+
+    @property
+    def size(self) -> tuple[int, int]:
+        return self.original.size
+
+    def pixels(self):  # type: ignore[no-untyped-def]
+        """
+        Read-only RGB uint8 array of the original. Region crops are slices of
+        it (views, no copy); see layout_detector.crop_inside_rect(as_array=True).
+        """
+        cached = self._cache.get("pixels")
+        if cached is None:
+            import numpy as np  # type: ignore[import-not-found]
+
+            cached = np.asarray(self.original)
+            try:
+                cached.flags.writeable = False
+            except ValueError:
+                pass
+            self._cache["pixels"] = cached
+        return cached
+
+    def ocr_image(self):  # type: ignore[no-untyped-def]
+        """RGB image capped at MAX_IMAGE_DIM (LANCZOS), as sent to Tesseract."""
+        cached = self._cache.get("ocr_image")
+        if cached is None:
+            cached = _cap_image(self.original, MAX_IMAGE_DIM)
+            self._cache["ocr_image"] = cached
+        return cached
+
+    @property
+    def ocr_scale(self) -> float:
+        """Factor from original to ocr_image() coordinates."""
+        return self.ocr_image().size[0] / float(self.original.size[0] or 1)
+
+    # --- OpenCV views -------------------------------------------------
+    # Shared between OCR preprocessing and layout_detector. Each view is
+    # keyed by `max_dim` (None = full resolution) and computed once.
+
+    def bgr(self, max_dim: Optional[int] = None):  # type: ignore[no-untyped-def]
+        """
+        BGR uint8 array (cv2 layout), downscaled with cv2.resize when the
+        longest side exceeds max_dim. Use scale_for(max_dim) for the factor.
+        """
+        max_dim = self._view_dim(max_dim)
+        key = ("bgr", max_dim)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        import numpy as np  # type: ignore[import-not-found]
+
+        if max_dim is None:
+            cached = np.ascontiguousarray(self.pixels()[:, :, ::-1])
+        else:
+            import cv2  # type: ignore[import-not-found]
+
+            scale = self.scale_for(max_dim)
+            w, h = self.size
+            cached = cv2.resize(self.bgr(None), (int(w * scale), int(h * scale)))
+        self._cache[key] = cached
+        return cached
+
+    def _view_dim(self, max_dim: Optional[int]) -> Optional[int]:
+        # Views that would not be downscaled share the full-resolution entry.
+        if max_dim is None or max(self.size) <= max_dim:
+            return None
+        return max_dim
+
+    def scale_for(self, max_dim: Optional[int]) -> float:
+        """Factor from original coordinates to the `max_dim` view."""
+        largest = max(self.size)
+        if max_dim is None or largest <= max_dim:
+            return 1.0
+        return max_dim / float(largest)
+
+    def gray(self, max_dim: Optional[int] = None):  # type: ignore[no-untyped-def]
+        max_dim = self._view_dim(max_dim)
+        key = ("gray", max_dim)
+        cached = self._cache.get(key)
+        if cached is None:
+            import cv2  # type: ignore[import-not-found]
+
+            cached = cv2.cvtColor(self.bgr(max_dim), cv2.COLOR_BGR2GRAY)
+            self._cache[key] = cached
+        return cached
+
+    def thumbnail_gray(self, max_dim: int):  # type: ignore[no-untyped-def]
+        """
+        Small grayscale view made with PIL's reducing resize, without building
+        the full-resolution array first (coarse pyramid levels).
+        """
+        max_dim_key = self._view_dim(max_dim)
+        if max_dim_key is None:
+            return self.gray(None)
+        key = ("thumbnail_gray", max_dim_key)
+        cached = self._cache.get(key)
+        if cached is None:
+            import numpy as np  # type: ignore[import-not-found]
+            from PIL import Image  # type: ignore[import-not-found]
+
+            scale = self.scale_for(max_dim_key)
+            w, h = self.size
+            small = self.original.resize(
+                (max(1, int(w * scale)), max(1, int(h * scale))), Image.BILINEAR, reducing_gap=2.0
+            )
+            cached = np.asarray(small.convert("L"))
+            self._cache[key] = cached
+        return cached
+
+    def gray_window(self, x0: int, y0: int, x1: int, y1: int):  # type: ignore[no-untyped-def]
+        """Full-resolution grayscale crop; sliced from gray() when that is already cached."""
+        full = self._cache.get(("gray", None))
+        if full is not None:
+            return full[y0:y1, x0:x1]
+        import numpy as np  # type: ignore[import-not-found]
+
+        return np.asarray(self.original.crop((x0, y0, x1, y1)).convert("L"))
+
+    def binary(self, max_dim: Optional[int] = None):  # type: ignore[no-untyped-def]
+        """
+        Inverted adaptive-mean binary map (ink = 255), block 21 / C 10:
+        the map layout_detector builds its line extraction on.
+        """
+        max_dim = self._view_dim(max_dim)
+        key = ("binary", max_dim)
+        cached = self._cache.get(key)
+        if cached is None:
+            import cv2  # type: ignore[import-not-found]
+
+            cached = cv2.adaptiveThreshold(
+                self.gray(max_dim), 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 21, 10
+            )
+            self._cache[key] = cached
+        return cached
+
+    def skew_angle(self) -> float:
+        """
+        Rotation in degrees (cv2.getRotationMatrix2D convention) that levels the
+        text lines; 0.0 when unknown.
+        """
+        cached = self._cache.get("skew_angle")
+        if cached is None:
+            try:
+                cached = estimate_skew(self.binary(_DESKEW_PROBE_DIM))
+            except Exception:
+                cached = 0.0
+            self._cache["skew_angle"] = cached
+        return cached
+
+    def quality(self) -> ImageQuality:
+        cached = self._cache.get("quality")
+        if cached is None:
+            cached = measure_image_quality(self.original)
+            self._cache["quality"] = cached
+        return cached
+
+
+# Anything PreparedImage.from_any() accepts: a path, a PIL image, a uint8
+# numpy array (RGB or grayscale, views allowed) or a PreparedImage.
+ImageInput = Any
+
+
+@dataclass(frozen=True)
+class OcrInput:
+    """
+    Image handed to Tesseract plus the mapping back to original coordinates.
+
+    - image: PIL image (RGB or binarized L)
+    - scale: factor from (deskewed) original to `image` coordinates
+    - angle: deskew rotation applied around `center`, in degrees
+    """
+
+    image: Any
+    scale: float
+    angle: float = 0.0
+    center: Tuple[float, float] = (0.0, 0.0)
+
+    def to_original(self, box: Tuple[int, int, int, int]) -> Tuple[int, int, int, int]:
+        x, y, w, h = box
+        inv = 1.0 / self.scale if self.scale > 0 else 1.0
+        x, y, w, h = x * inv, y * inv, w * inv, h * inv
+        if self.angle:
+            # Rotate the box center back; boxes are small enough to keep w/h.
+            cx, cy = self.center
+            rad = math.radians(self.angle)
+            px, py = x + w / 2.0 - cx, y + h / 2.0 - cy
+            ox = cx + px * math.cos(rad) - py * math.sin(rad)
+            oy = cy + px * math.sin(rad) + py * math.cos(rad)
+            x, y = ox - w / 2.0, oy - h / 2.0
+        return (int(x), int(y), int(w), int(h))
+
+
+def estimate_skew(binary) -> float:  # type: ignore[no-untyped-def]
+    """
+    Projection-profile deskew estimate on an ink=255 binary map.
+
+    Rotations in ±DESKEW_MAX_ANGLE are scored by the variance of their row
+    ink sums (text lines become sharp peaks when level): a 1° coarse pass,
+    then a 0.1° pass around the best coarse angle.
+    """
+    import cv2  # type: ignore[import-not-found]
+    import numpy as np  # type: ignore[import-not-found]
+
+    h, w = binary.shape[:2]
+    if h < 20 or w < 20 or not np.count_nonzero(binary):
+        return 0.0
+    center = (w / 2.0, h / 2.0)
+
+    def score(angle: float) -> float:
+        matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
+        rotated = cv2.warpAffine(binary, matrix, (w, h), flags=cv2.INTER_NEAREST, borderValue=0)
+        return float(np.var(rotated.sum(axis=1, dtype=np.float64)))
+
+    coarse = [float(a) for a in range(-int(DESKEW_MAX_ANGLE), int(DESKEW_MAX_ANGLE) + 1)]
+    best = max(coarse, key=score)
+    fine = [best + step / 10.0 for step in range(-10, 11)]
+    best = max(fine, key=score)
+    return round(best, 2)
+
+
+def prepare_for_ocr(
+    prepared: "PreparedImage",
+    *,
+    mask_rects: tuple[tuple[int, int, int, int], ...] = (),
+) -> OcrInput:
+    """
+    OpenCV preprocessing for Tesseract, cached on the PreparedImage:
+    deskew (when the estimate exceeds DESKEW_MIN_ANGLE), rescale so text lines
+    are ~TARGET_TEXT_HEIGHT px, then adaptive Gaussian binarization.
+
+    `mask_rects` (original coordinates) are painted white before processing.
+    Falls back to the plain capped RGB image when OpenCV is unavailable or
+    NOVA_AI_OCR_PREPROCESS=0.
+    """
+    if (os.getenv("NOVA_AI_OCR_PREPROCESS") or "1").strip() == "0":
+        return _plain_ocr_input(prepared, mask_rects)
+    key = ("ocr_input", mask_rects)
+    cached = prepared._cache.get(key)
+    if cached is not None:
+        return cached
     try:
+        import cv2  # type: ignore[import-not-found]
         from PIL import Image  # type: ignore[import-not-found]
-    except Exception as exc:
-        raise OcrError("Pillow is not installed.") from exc
+    except Exception:
+        return _plain_ocr_input(prepared, mask_rects)
+
+    gray = prepared.gray()
+    if mask_rects:
+        gray = gray.copy()
+        for x, y, w, h in mask_rects:
+            gray[max(0, y) : max(0, y + h), max(0, x) : max(0, x + w)] = 255
+    h, w = gray.shape[:2]
+    center = (w / 2.0, h / 2.0)
+
+    angle = prepared.skew_angle()
+    text_height = prepared.quality().text_height
+    if abs(angle) >= DESKEW_MIN_ANGLE:
+        matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
+        gray = cv2.warpAffine(
+            gray, matrix, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE
+        )
+        # Row profiles of skewed text smear across lines; re-measure once level.
+        text_height = measure_image_quality(Image.fromarray(gray)).text_height
+    else:
+        angle = 0.0
+
+    if text_height > 0:
+        scale = max(MIN_OCR_RESCALE, min(MAX_OCR_RESCALE, TARGET_TEXT_HEIGHT / text_height))
+    else:
+        scale = min(1.0, MAX_IMAGE_DIM / float(max(w, h)))
+    scale = min(scale, MAX_OCR_DIM / float(max(w, h)))
+    if abs(scale - 1.0) > 0.02:
+        interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+        gray = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=interpolation)
+    else:
+        scale = 1.0
+
+    block = int(TARGET_TEXT_HEIGHT) | 1
+    binary = cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, block, 10
+    )
+    result = OcrInput(image=Image.fromarray(binary), scale=scale, angle=angle, center=center)
+    prepared._cache[key] = result
+    return result
+
+
+def _plain_ocr_input(prepared: "PreparedImage", mask_rects) -> OcrInput:  # type: ignore[no-untyped-def]
+    scale = prepared.ocr_scale
+    image = prepared.ocr_image()
+    if mask_rects:
+        image = mask_regions(
+            image,
+            [(int(x * scale), int(y * scale), int(w * scale), int(h * scale)) for x, y, w, h in mask_rects],
+        )
+    return OcrInput(image=image, scale=scale)
+
+
+def _cap_image(image, max_dim: int):  # type: ignore[no-untyped-def]
+    from PIL import Image  # type: ignore[import-not-found]
+
+    largest = max(image.size)
+    if largest <= max_dim:
+        return image
+    scale = max_dim / largest
+    new_size = (int(image.size[0] * scale), int(image.size[1] * scale))
+    return image.resize(new_size, Image.LANCZOS)
 
+
+def _import_tesseract():  # type: ignore[no-untyped-def]
     try:
         import pytesseract  # type: ignore[import-not-found]
     except Exception as exc:
@@ -24,28 +483,473 @@ def extract_text(image_path: str) -> str:
     tesseract_cmd = os.getenv("TESSERACT_CMD")
     if tesseract_cmd:
         pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    return pytesseract
+
+
+def extract_text(image: "ImageInput") -> str:
+    return extract_text_from_prepared(PreparedImage.from_any(image))
 
-    image = Image.open(image_path).convert("RGB")
-    max_dim = max(image.size)
-    if max_dim > MAX_IMAGE_DIM:
-        scale = MAX_IMAGE_DIM / max_dim
-        new_size = (int(image.size[0] * scale), int(image.size[1] * scale))
-        image = image.resize(new_size, Image.LANCZOS)
-    text = pytesseract.image_to_string(image, lang="kor+eng")
-    return text.strip()
 
+def extract_text_from_prepared(prepared: PreparedImage, *, lang: str = DEFAULT_LANG) -> str:
+    pytesseract = _import_tesseract()
+    try:
+        text = pytesseract.image_to_string(prepare_for_ocr(prepared).image, lang=lang)
+    except Exception as exc:
+        raise OcrError(str(exc)) from exc
+    return (text or "").strip()
 
-def extract_text_from_pil_image(image) -> str:  # type: ignore[no-untyped-def]
+
+def extract_text_from_pil_image(image, *, lang: str = DEFAULT_LANG) -> str:  # type: ignore[no-untyped-def]
     """
     OCR helper for in-memory PIL images.
     """
+    pytesseract = _import_tesseract()
+
     try:
-        import pytesseract  # type: ignore[import-not-found]
+        text = pytesseract.image_to_string(image, lang=lang)
+        return (text or "").strip()
     except Exception as exc:
-        raise OcrError("pytesseract is not installed.") from exc
+        raise OcrError(str(exc)) from exc
+
+
+def extract_words(  # type: ignore[no-untyped-def]
+    image,
+    *,
+    scale: float = 1.0,
+    lang: str = DEFAULT_LANG,
+    box_map: Optional[Callable[[Tuple[int, int, int, int]], Tuple[int, int, int, int]]] = None,
+    config: str = "",
+) -> list[OcrWord]:
+    """
+    Structured OCR of an in-memory PIL image.
 
+    `scale` is the factor the image was resized by; boxes are divided by it so
+    they are returned in original-image coordinates. `box_map` (e.g.
+    OcrInput.to_original) replaces the scale mapping when given. `config` is
+    passed to Tesseract as is (e.g. "--psm 11" for sparse text such as tables).
+    """
+    pytesseract = _import_tesseract()
     try:
-        text = pytesseract.image_to_string(image, lang="kor+eng")
-        return (text or "").strip()
+        data = pytesseract.image_to_data(image, lang=lang, config=config, output_type=pytesseract.Output.DICT)
     except Exception as exc:
         raise OcrError(str(exc)) from exc
+
+    texts = data.get("text", [])
+    n = len(texts)
+    confs = data.get("conf", ["-1"] * n)
+    blocks = data.get("block_num", [0] * n)
+    pars = data.get("par_num", [0] * n)
+    line_nums = data.get("line_num", [0] * n)
+    lefts = data.get("left", [0] * n)
+    tops = data.get("top", [0] * n)
+    widths = data.get("width", [0] * n)
+    heights = data.get("height", [0] * n)
+    inv = 1.0 / scale if scale > 0 else 1.0
+
+    words: list[OcrWord] = []
+    for i in range(n):
+        word = (texts[i] or "").strip()
+        if not word:
+            continue
+        try:
+            conf = float(confs[i])
+        except Exception:
+            conf = -1.0
+        box = (int(lefts[i]), int(tops[i]), int(widths[i]), int(heights[i]))
+        if box_map is not None:
+            left, top, width, height = box_map(box)
+        else:
+            left, top, width, height = (int(v * inv) for v in box)
+        words.append(
+            OcrWord(
+                text=word,
+                conf=conf,
+                left=left,
+                top=top,
+                width=width,
+                height=height,
+                line=(int(blocks[i] or 0), int(pars[i] or 0), int(line_nums[i] or 0)),
+            )
+        )
+    return words
+
+
+def words_to_text(words: list[OcrWord], *, min_conf: float = -1.0) -> str:
+    """Regroup words into their OCR lines, keeping those with conf >= min_conf."""
+    lines: dict[tuple[int, int, int], list[str]] = {}
+    for word in words:
+        if word.conf < min_conf:
+            continue
+        lines.setdefault(word.line, []).append(word.text)
+    return "\n".join(" ".join(parts) for _, parts in sorted(lines.items()))
+
+
+def extract_text_digest(  # type: ignore[no-untyped-def]
+    image, *, min_conf: int = DIGEST_MIN_CONF, lang: str = DEFAULT_LANG
+) -> str:
+    """
+    OCR an in-memory PIL image and keep only words with confidence >= min_conf.
+    Words are regrouped into their original lines; lines left empty are dropped.
+    """
+    return words_to_text(extract_words(image, lang=lang), min_conf=min_conf)
+
+
+def measure_image_quality(image) -> ImageQuality:  # type: ignore[no-untyped-def]
+    """
+    Compute cheap quality signals on a downscaled grayscale probe.
+
+    Contrast comes from the 5th/95th grayscale percentiles. Text height is the
+    median height of dark row-runs in a horizontal ink projection, obtained by
+    box-resizing the binarized probe to a single column.
+    """
+    from PIL import Image  # type: ignore[import-not-found]
+
+    width, height = image.size
+    if width < 2 or height < 2:
+        return ImageQuality(width=width, height=height, contrast=0.0, text_height=0.0)
+
+    probe_scale = min(1.0, _QUALITY_PROBE_DIM / float(max(width, height)))
+    probe = image.convert("L")
+    if probe_scale < 1.0:
+        probe = probe.resize(
+            (max(1, int(width * probe_scale)), max(1, int(height * probe_scale))),
+            Image.BILINEAR,
+        )
+
+    hist = probe.histogram()
+    total = float(sum(hist)) or 1.0
+    low = _histogram_percentile(hist, total, 0.05)
+    high = _histogram_percentile(hist, total, 0.95)
+    contrast = max(0.0, (high - low) / 255.0)
+
+    text_height = 0.0
+    if contrast > 0.05:
+        threshold = (low + high) / 2.0
+        ink = probe.point(lambda v: 255 if v < threshold else 0)
+        profile = list(ink.resize((1, probe.size[1]), Image.BOX).getdata())
+        runs: list[int] = []
+        run = 0
+        for value in profile:
+            # Rows with >2% ink belong to a text line.
+            if value > 5:
+                run += 1
+            elif run:
+                runs.append(run)
+                run = 0
+        if run:
+            runs.append(run)
+        runs = [r for r in runs if r >= 2]
+        if runs:
+            runs.sort()
+            text_height = runs[len(runs) // 2] / probe_scale
+
+    return ImageQuality(
+        width=width,
+        height=height,
+        contrast=round(contrast, 4),
+        text_height=round(text_height, 2),
+    )
+
+
+def _histogram_percentile(hist: list[int], total: float, fraction: float) -> float:
+    target = total * fraction
+    acc = 0
+    for value, count in enumerate(hist):
+        acc += count
+        if acc >= target:
+            return float(value)
+    return 255.0
+
+
+def _otsu_split(hist: list[int]) -> tuple[float, float, float]:
+    """
+    Otsu threshold of a 256-bin grayscale histogram.
+    Returns (threshold, dark_mean, light_mean); sparse text pages still split
+    into ink and paper, unlike fixed percentiles.
+    """
+    total = float(sum(hist))
+    if total <= 0:
+        return 128.0, 0.0, 0.0
+    sum_all = float(sum(i * c for i, c in enumerate(hist)))
+    best_t = 0
+    best_var = -1.0
+    w_dark = 0.0
+    sum_dark = 0.0
+    for t in range(256):
+        w_dark += hist[t]
+        if w_dark == 0:
+            continue
+        w_light = total - w_dark
+        if w_light == 0:
+            break
+        sum_dark += t * hist[t]
+        mean_dark = sum_dark / w_dark
+        mean_light = (sum_all - sum_dark) / w_light
+        between = w_dark * w_light * (mean_dark - mean_light) ** 2
+        if between > best_var:
+            best_var = between
+            best_t = t
+    w_dark = float(sum(hist[: best_t + 1]))
+    w_light = total - w_dark
+    if w_dark == 0 or w_light == 0:
+        mean = sum_all / total
+        return float(best_t) + 0.5, mean, mean
+    dark_sum = float(sum(i * hist[i] for i in range(best_t + 1)))
+    return float(best_t) + 0.5, dark_sum / w_dark, (sum_all - dark_sum) / w_light
+
+
+def _true_runs(mask) -> list[tuple[int, int]]:  # type: ignore[no-untyped-def]
+    import numpy as np  # type: ignore[import-not-found]
+
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return [(int(edges[i]), int(edges[i + 1])) for i in range(0, len(edges), 2)]
+
+
+def detect_script(  # type: ignore[no-untyped-def]
+    image, *, equation_mask: bool = False, text_height: float = 0.0
+) -> ScriptGuess:
+    """
+    Guess which Tesseract language(s) an image needs from glyph density alone.
+
+    Each text line (row-projection band) is measured on a grayscale probe:
+    Hangul syllable blocks give many vertical ink runs per column and ink in
+    the top quarter of the line; Latin text and equations have an x-height
+    band and mostly 1-2 runs per column.
+
+    - every line Hangul-bearing -> "kor"
+    - no Hangul line -> "eng"
+    - otherwise "kor+eng"; with `equation_mask`, Hangul-dominant images return
+      "kor" plus the Latin/math line rects to mask before OCR.
+
+    Falls back to DEFAULT_LANG when numpy is unavailable or no text is found.
+    """
+    try:
+        import numpy as np  # type: ignore[import-not-found]
+        from PIL import Image  # type: ignore[import-not-found]
+    except Exception:
+        return ScriptGuess(lang=DEFAULT_LANG, hangul_ratio=0.0, lines=0)
+
+    width, height = image.size
+    if width < 8 or height < 8:
+        return ScriptGuess(lang=DEFAULT_LANG, hangul_ratio=0.0, lines=0)
+
+    # Bring text lines down to ~32px at most; smaller text stays at full
+    # resolution, where stroke structure is still resolvable.
+    if text_height <= 0:
+        text_height = measure_image_quality(image).text_height
+    scale = min(1.0, 32.0 / text_height) if text_height > 0 else 1.0
+    probe = image.convert("L")
+    if scale < 1.0:
+        probe = probe.resize((max(1, int(width * scale)), max(1, int(height * scale))), Image.BILINEAR)
+    threshold, low, high = _otsu_split(probe.histogram())
+    if high - low < 16:
+        return ScriptGuess(lang=DEFAULT_LANG, hangul_ratio=0.0, lines=0)
+    ink = np.asarray(probe) < threshold
+
+    hangul_lines = 0
+    other_rects: list[tuple[int, int, int, int]] = []
+    measured = 0
+    for y0, y1 in _true_runs(ink.mean(axis=1) > 0.002):
+        line_h = y1 - y0
+        if line_h < 6:
+            continue
+        band = ink[y0:y1]
+        ink_cols = band[:, band.any(axis=0)]
+        if ink_cols.shape[1] < 3:
+            continue
+        measured += 1
+        run_starts = np.count_nonzero(ink_cols[1:] & ~ink_cols[:-1], axis=0) + ink_cols[0]
+        complexity = float(run_starts.mean())
+        profile = band.sum(axis=1).astype(np.float64)
+        quarter = max(1, line_h // 4)
+        middle = profile[quarter : line_h - quarter]
+        top_ratio = float(profile[:quarter].mean() / max(1e-6, middle.mean() if middle.size else 0.0))
+        min_complexity = HANGUL_MIN_COMPLEXITY if line_h >= 20 else HANGUL_MIN_COMPLEXITY_SMALL
+        if complexity >= min_complexity and top_ratio >= HANGUL_MIN_TOP_RATIO:
+            hangul_lines += 1
+        else:
+            cols = np.flatnonzero(band.any(axis=0))
+            inv = 1.0 / scale
+            other_rects.append(
+                (
+                    int(cols[0] * inv),
+                    int(y0 * inv),
+                    int((cols[-1] + 1 - cols[0]) * inv),
+                    int(line_h * inv),
+                )
+            )
+
+    if measured == 0:
+        return ScriptGuess(lang=DEFAULT_LANG, hangul_ratio=0.0, lines=0)
+    ratio = round(hangul_lines / float(measured), 4)
+    if hangul_lines == 0:
+        return ScriptGuess(lang="eng", hangul_ratio=ratio, lines=measured)
+    if ratio >= KOR_ONLY_MIN_RATIO:
+        return ScriptGuess(lang="kor", hangul_ratio=ratio, lines=measured)
+    if equation_mask and ratio >= 0.5:
+        return ScriptGuess(
+            lang="kor", hangul_ratio=ratio, lines=measured, equation_rects=tuple(other_rects)
+        )
+    return ScriptGuess(lang=DEFAULT_LANG, hangul_ratio=ratio, lines=measured)
+
+
+def mask_regions(image, rects) -> Any:  # type: ignore[no-untyped-def]
+    """Return a copy of a PIL image with the given (x, y, w, h) rects painted white."""
+    if not rects:
+        return image
+    from PIL import ImageDraw  # type: ignore[import-not-found]
+
+    masked = image.copy()
+    draw = ImageDraw.Draw(masked)
+    for x, y, w, h in rects:
+        draw.rectangle([x, y, x + w, y + h], fill=(255, 255, 255))
+    return masked
+
+
+def resolve_ocr_lang(image, *, text_height: float = 0.0) -> ScriptGuess:  # type: ignore[no-untyped-def]
+    """
+    Pick the OCR language for an image.
+
+    NOVA_AI_OCR_LANG=kor|eng|kor+eng pins the language; `auto` (default) runs
+    detect_script, `auto-mask` also masks equation lines in Hangul-dominant images.
+    """
+    setting = (os.getenv("NOVA_AI_OCR_LANG") or "auto").strip().lower()
+    if setting in ("kor", "eng", "kor+eng"):
+        return ScriptGuess(lang=setting, hangul_ratio=0.0, lines=0)  # type: ignore[arg-type]
+    return detect_script(image, equation_mask=(setting == "auto-mask"), text_height=text_height)
+
+
+def decide_ocr_mode(quality: ImageQuality) -> OcrDecision:
+    """
+    Choose how OCR is used for one image.
+
+    - skip: clean, high-resolution images; Gemini reads them reliably on its own
+    - digest: low contrast or tiny text; raw OCR is mostly noise, keep confident words
+    - full: everything in between, where OCR text helps the model
+
+    NOVA_AI_OCR_MODE=skip|full|digest forces a mode (default: auto).
+    """
+    forced = (os.getenv("NOVA_AI_OCR_MODE") or "auto").strip().lower()
+    if forced in ("skip", "full", "digest"):
+        return OcrDecision(mode=forced, reason="forced", quality=quality)  # type: ignore[arg-type]
+
+    if quality.text_height <= 0:
+        return OcrDecision(mode="full", reason="text height unknown", quality=quality)
+    if quality.contrast < DIGEST_MAX_CONTRAST:
+        return OcrDecision(mode="digest", reason="low contrast", quality=quality)
+    if quality.text_height < DIGEST_MAX_TEXT_HEIGHT:
+        return OcrDecision(mode="digest", reason="small text", quality=quality)
+    if (
+        quality.contrast >= SKIP_MIN_CONTRAST
+        and quality.text_height >= SKIP_MIN_TEXT_HEIGHT
+        and min(quality.width, quality.height) >= SKIP_MIN_SHORT_SIDE
+    ):
+        return OcrDecision(mode="skip", reason="clean image", quality=quality)
+    return OcrDecision(mode="full", reason="default", quality=quality)
+
+
+def ocr_with_mode(image, mode: OcrMode, *, lang: str = DEFAULT_LANG) -> str:  # type: ignore[no-untyped-def]
+    """OCR an in-memory PIL image according to a policy mode."""
+    if mode == "skip":
+        return ""
+    if mode == "digest":
+        return extract_text_digest(image, lang=lang)
+    return extract_text_from_pil_image(image, lang=lang)
+
+
+def extract_words_with_policy(
+    image: "ImageInput", *, label: str = ""
+) -> tuple[list[OcrWord], OcrDecision]:
+    """
+    Decide the OCR mode from image-quality signals and run structured OCR
+    unless the policy skips it. The decision is appended to the decision log
+    (when NOVA_AI_OCR_DECISION_LOG is set).
+
+    Confidence filtering for the digest mode happens when the words are
+    formatted into prompt context (see ocr_context.min_conf_for_mode).
+    """
+    prepared = PreparedImage.from_any(image)
+    started = time.perf_counter()
+    decision = decide_ocr_mode(prepared.quality())
+    decided = time.perf_counter()
+    words: list[OcrWord] = []
+    lang = ""
+    script_ms = 0.0
+    if decision.mode != "skip":
+        ocr_scale = prepared.ocr_scale
+        guess = resolve_ocr_lang(
+            prepared.ocr_image(), text_height=decision.quality.text_height * ocr_scale
+        )
+        lang = guess.lang
+        script_ms = (time.perf_counter() - decided) * 1000.0
+        inv = 1.0 / ocr_scale
+        mask_rects = tuple(
+            (int(x * inv), int(y * inv), int(w * inv), int(h * inv)) for x, y, w, h in guess.equation_rects
+        )
+        ocr_input = prepare_for_ocr(prepared, mask_rects=mask_rects)
+        words = extract_words(ocr_input.image, lang=lang, box_map=ocr_input.to_original)
+    finished = time.perf_counter()
+    record_ocr_decision(
+        prepared.path,
+        decision,
+        label=label,
+        lang=lang,
+        decide_ms=(decided - started) * 1000.0,
+        script_ms=script_ms,
+        ocr_ms=(finished - decided) * 1000.0 - script_ms,
+        ocr_chars=sum(len(w.text) for w in words),
+    )
+    return words, decision
+
+
+def extract_text_with_policy(
+    image: "ImageInput", *, label: str = ""
+) -> tuple[str, OcrDecision]:
+    """Plain-text variant of extract_words_with_policy."""
+    words, decision = extract_words_with_policy(image, label=label)
+    min_conf = DIGEST_MIN_CONF if decision.mode == "digest" else -1.0
+    return words_to_text(words, min_conf=min_conf), decision
+
+
+def record_ocr_decision(
+    image_path: str,
+    decision: OcrDecision,
+    *,
+    label: str = "",
+    lang: str = "",
+    decide_ms: float = 0.0,
+    script_ms: float = 0.0,
+    ocr_ms: float = 0.0,
+    ocr_chars: int = 0,
+) -> None:
+    """
+    Append one JSON line per decision to NOVA_AI_OCR_DECISION_LOG.
+
+    The records carry the quality signals, the chosen mode and its cost so
+    accuracy versus latency can be re-evaluated offline against the same images.
+    """
+    log_path = os.getenv("NOVA_AI_OCR_DECISION_LOG")
+    if not log_path:
+        return
+    record = {
+        "ts": time.time(),
+        "image": image_path,
+        "label": label,
+        "mode": decision.mode,
+        "reason": decision.reason,
+        "quality": asdict(decision.quality),
+        "lang": lang,
+        "decide_ms": round(decide_ms, 3),
+        "script_ms": round(script_ms, 3),
+        "ocr_ms": round(ocr_ms, 3),
+        "ocr_chars": ocr_chars,
+    }
+    line = json.dumps(record, ensure_ascii=False)
+    try:
+        with _decision_log_lock:
+            with open(log_path, "a", encoding="utf-8") as fp:
+                fp.write(line + "\n")
+    except Exception:
+        # Logging must never break OCR.
+        pass
@@ -0,0 +1,485 @@
+"""
+Whitelisted compiler from a normalized script to a flat list of calls.
+
+ScriptRunner used to exec() every script that was not plain literal calls
+(loops, `a(); b()`, constant assignments). compile_calls() accepts only what
+model scripts use and evaluates all of it while compiling, so running the
+result is a loop over (name, args, kwargs):
+
+- calls of script functions whose arguments are literals, names bound earlier,
+  + - * / // % on them, comparisons, and / or / not, `a if c else b`,
+  f-strings, indexing, the HELPERS functions and the STR_METHODS of strings
+  (', '.join(items), '{}.'.format(i));
+- NAME = expression (also tuple targets and +=); `x = insert_text('b')`
+  makes the call and binds None, as exec() did;
+- `for` over range(...), enumerate(...), a list, tuple or string, and `while`,
+  with the body unrolled as long as each loop stays under `max_iterations`
+  passes and the program under `max_calls` calls and MAX_STEPS statements;
+- if / elif / else, break and continue (decided while compiling);
+- pass, bare literals (strings, numbers, and lists / tuples of them, e.g. a
+  stray `['EQ:X', '0'],` line) and print(...) (dropped: they never reached the
+  document).
+
+Anything else (def, import, other attribute access, calls of other functions,
+shadowing a script function) raises ScriptRejected, and so does an expression
+that fails while compiling. Syntax errors propagate as SyntaxError.
+
+compile_ops() does the same for script_ir ops: top-level literal calls are
+already decoded, so only the runs of other statements go through ast.parse
+(which alone costs more than Python's compile()).
+
+    calls = compile_calls("for i in range(2):\\n    insert_text(f'{i + 1}.')", SCRIPT_FUNCTIONS)
+    # [('insert_text', ('1.',), {}), ('insert_text', ('2.',), {})]
+"""
+from __future__ import annotations
+
+import ast
+import operator
+import re
+import string
+from typing import Any, Callable, Container, Dict, List, Sequence, Tuple
+
+import script_ir
+
+Call = Tuple[str, Tuple[Any, ...], Dict[str, Any]]
+
+# Functions argument expressions may use (run while compiling).
+HELPERS: Dict[str, Callable[..., Any]] = {
+    "range": range,
+    "len": len,
+    "min": min,
+    "max": max,
+    "enumerate": enumerate,
+    "sum": sum,
+    "abs": abs,
+    "str": str,
+}
+
+MAX_CALLS = 200_000
+MAX_STEPS = 1_000_000  # statements evaluated, unrolled loop bodies included
+MAX_ITERATIONS = 10_000
+MAX_VALUE_LEN = 1_000_000  # longest string / list an expression may build
+_MAX_INT = 2**63
+# [[fill]align][sign][z][#][0][width][grouping][.precision]: the padding / digits
+# format() would allocate before the result could be measured.
+# %-conversions: (key) flags width .precision length type; width/precision may be *.
+_PERCENT_RE = re.compile(r"%(\([^)]*\))?[-#0 +]*(\*|\d+)?(?:\.(\*|\d+))?[hlL]?(.)", re.S)
+_SPEC_SIZE_RE = re.compile(r"^(?:.?[<>=^])?[+\- ]?z?#?0?(\d*)[,_]?(?:\.(\d+))?")
+
+_BINOPS: Dict[type, Callable[[Any, Any], Any]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+}
+_UNARYOPS: Dict[type, Callable[[Any], Any]] = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+    ast.Not: operator.not_,
+}
+_CMPOPS: Dict[type, Callable[[Any, Any], Any]] = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+    ast.Is: operator.is_,
+    ast.IsNot: operator.is_not,
+}
+
+# str methods argument expressions may call (join / format are size-checked first).
+STR_METHODS = frozenset(
+    ("join", "format", "strip", "lstrip", "rstrip", "upper", "lower", "split", "startswith", "endswith")
+)
+
+
+class ScriptRejected(RuntimeError):
+    """The script uses something compile_calls() does not allow."""
+
+
+class _Break(Exception):
+    pass
+
+
+class _Continue(Exception):
+    pass
+
+
+def compile_calls(
+    source: str,
+    names: Container[str],
+    *,
+    max_calls: int = MAX_CALLS,
+    max_iterations: int = MAX_ITERATIONS,
+) -> List[Call]:
+    """Flat call list for `source`; `names` are the script functions."""
+    tree = ast.parse(source, "<script>", "exec")
+    lowering = _Lowering(names, max_calls, max_iterations)
+    lowering.block(tree.body)
+    return lowering.calls
+
+
+def compile_ops(
+    ops: Sequence[script_ir.Op],
+    names: Container[str],
+    *,
+    max_calls: int = MAX_CALLS,
+    max_iterations: int = MAX_ITERATIONS,
+) -> List[Call]:
+    """compile_calls(script_ir.render(ops), names) without re-parsing literal calls."""
+    lowering = _Lowering(names, max_calls, max_iterations)
+    run: List[script_ir.Op] = []
+
+    def _flush() -> None:
+        source = "\n".join(op.source for op in run)
+        tree = ast.parse(source.strip("\n"), "<script>", "exec")
+        ast.increment_lineno(tree, run[0].line - 1 if run[0].line else 0)
+        lowering.block(tree.body)
+        run.clear()
+
+    try:
+        for op in ops:
+            if op.kind == "call" and script_ir.dispatchable_op(op, names):
+                if run:
+                    _flush()
+                lowering.call(op.name, op.args, op.kwargs, op)
+            elif op.kind in ("blank", "comment"):
+                if run:
+                    run.append(op)
+            else:
+                run.append(op)
+        if run:
+            _flush()
+    except SyntaxError:
+        # A run that only parses together with its neighbours; decide on the whole script.
+        return compile_calls(script_ir.render(ops), names, max_calls=max_calls, max_iterations=max_iterations)
+    return lowering.calls
+
+
+def _reject(node: ast.AST, what: str) -> ScriptRejected:
+    line = getattr(node, "lineno", None) or getattr(node, "line", None) or "?"
+    return ScriptRejected(f"line {line}: {what}")
+
+
+def _literal(node: ast.expr) -> bool:
+    """A constant, or a list / tuple / set of literals (a statement that does nothing)."""
+    if isinstance(node, ast.Constant):
+        return True
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        return _literal(node.operand)
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        return all(_literal(element) for element in node.elts)
+    return False
+
+
+def _format_fields(template: str) -> List[Tuple[str, Any, Any, Any]]:
+    return list(string.Formatter().parse(template))
+
+
+def _check_spec(node: ast.AST, spec: str) -> None:
+    """Reject a format spec whose width or precision alone exceeds MAX_VALUE_LEN."""
+    m = _SPEC_SIZE_RE.match(spec)
+    for digits in m.groups() if m else ():
+        if digits and (len(digits) > 7 or int(digits) > MAX_VALUE_LEN):
+            raise _reject(node, "format width too large")
+
+
+def _check_percent(node: ast.AST, template: str, values: Any) -> None:
+    """Reject a %-format whose widths or precisions (literal or *) exceed MAX_VALUE_LEN."""
+    args = values if isinstance(values, tuple) else (values,)
+    position = 0
+    for m in _PERCENT_RE.finditer(template):
+        key, width, precision, kind = m.groups()
+        if kind == "%":
+            continue
+        for size in (width, precision):
+            if size == "*":
+                size = args[position] if position < len(args) else 0
+                position += 1
+            elif size:
+                size = int(size) if len(size) <= 7 else MAX_VALUE_LEN + 1
+            if isinstance(size, int) and abs(size) > MAX_VALUE_LEN:
+                raise _reject(node, "format width too large")
+        if key is None:
+            position += 1
+
+
+class _Lowering:
+    def __init__(self, names: Container[str], max_calls: int, max_iterations: int) -> None:
+        self.calls: List[Call] = []
+        self._names = names
+        self._max_calls = max_calls
+        self._max_iterations = max_iterations
+        self._scope: Dict[str, Any] = {}
+        self._steps = 0
+        self._loops = 0
+
+    def block(self, body: List[ast.stmt]) -> None:
+        for node in body:
+            self.statement(node)
+
+    def statement(self, node: ast.stmt) -> None:
+        self._steps += 1
+        if self._steps > MAX_STEPS:
+            raise _reject(node, f"more than {MAX_STEPS} statements")
+        if isinstance(node, ast.Expr):
+            value = node.value
+            if _literal(value):
+                return
+            name = value.func.id if isinstance(value, ast.Call) and isinstance(value.func, ast.Name) else ""
+            if name in self._names:
+                args, kwargs = self.arguments(value)  # type: ignore[arg-type]
+                self.call(name, args, kwargs, node)
+                return
+            if name == "print":
+                return
+            raise _reject(node, "only script function calls can be statements")
+        if isinstance(node, ast.Assign):
+            call = node.value
+            if isinstance(call, ast.Call) and isinstance(call.func, ast.Name) and call.func.id in self._names:
+                args, kwargs = self.arguments(call)
+                self.call(call.func.id, args, kwargs, node)
+                value: Any = None  # script functions return nothing the script can use
+            else:
+                value = self.expr(node.value)
+            for target in node.targets:
+                self.bind(target, value)
+            return
+        if isinstance(node, ast.AugAssign):
+            if not isinstance(node.target, ast.Name):
+                raise _reject(node, "augmented assignment to a non-name")
+            current = self.name(node.target)
+            self.bind(node.target, self.binop(node.op, current, self.expr(node.value), node))
+            return
+        if isinstance(node, ast.For):
+            if node.orelse:
+                raise _reject(node, "for/else")
+            items = self.iterable(node.iter)
+            self._loops += 1
+            try:
+                for item in items:
+                    self.bind(node.target, item)
+                    if not self.loop_body(node.body):
+                        break
+            finally:
+                self._loops -= 1
+            return
+        if isinstance(node, ast.While):
+            if node.orelse:
+                raise _reject(node, "while/else")
+            passes = 0
+            self._loops += 1
+            try:
+                while self.expr(node.test):
+                    passes += 1
+                    if passes > self._max_iterations:
+                        raise _reject(node, f"loop longer than {self._max_iterations}")
+                    if not self.loop_body(node.body):
+                        break
+            finally:
+                self._loops -= 1
+            return
+        if isinstance(node, ast.If):
+            self.block(node.body if self.expr(node.test) else node.orelse)
+            return
+        if isinstance(node, (ast.Break, ast.Continue)):
+            if not self._loops:
+                raise _reject(node, f"{type(node).__name__.lower()} outside a loop")
+            raise _Break() if isinstance(node, ast.Break) else _Continue()
+        if isinstance(node, ast.Pass):
+            return
+        raise _reject(node, f"{type(node).__name__} is not allowed")
+
+    def loop_body(self, body: List[ast.stmt]) -> bool:
+        """One pass of a loop body; False after `break`."""
+        try:
+            self.block(body)
+        except _Continue:
+            pass
+        except _Break:
+            return False
+        return True
+
+    def call(self, name: str, args: Tuple[Any, ...], kwargs: Dict[str, Any], node: Any) -> None:
+        if len(self.calls) >= self._max_calls:
+            raise _reject(node, f"more than {self._max_calls} calls")
+        self.calls.append((name, args, kwargs))
+
+    def bind(self, target: ast.expr, value: Any) -> None:
+        if isinstance(target, ast.Name):
+            if target.id in self._names or target.id in HELPERS:
+                raise _reject(target, f"assignment to {target.id}")
+            self._scope[target.id] = value
+            return
+        if isinstance(target, (ast.Tuple, ast.List)):
+            try:
+                values = list(value)
+            except TypeError:
+                raise _reject(target, "cannot unpack a non-sequence") from None
+            if len(values) != len(target.elts):
+                raise _reject(target, "unpacking length mismatch")
+            for element, item in zip(target.elts, values):
+                self.bind(element, item)
+            return
+        raise _reject(target, f"assignment to {type(target).__name__}")
+
+    def iterable(self, node: ast.expr) -> List[Any]:
+        value = self.expr(node)
+        if not isinstance(value, (range, enumerate, list, tuple, str)):
+            raise _reject(node, f"cannot loop over {type(value).__name__}")
+        items = list(value)
+        if len(items) > self._max_iterations:
+            raise _reject(node, f"loop longer than {self._max_iterations}")
+        return items
+
+    def arguments(self, node: ast.Call) -> Tuple[Tuple[Any, ...], Dict[str, Any]]:
+        args = []
+        for arg in node.args:
+            if isinstance(arg, ast.Starred):
+                raise _reject(arg, "*args")
+            args.append(self.expr(arg))
+        kwargs = {}
+        for keyword in node.keywords:
+            if keyword.arg is None:
+                raise _reject(node, "**kwargs")
+            kwargs[keyword.arg] = self.expr(keyword.value)
+        return tuple(args), kwargs
+
+    def name(self, node: ast.Name) -> Any:
+        try:
+            return self._scope[node.id]
+        except KeyError:
+            raise _reject(node, f"unknown name {node.id}") from None
+
+    def expr(self, node: ast.expr) -> Any:
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bytes):
+                raise _reject(node, "bytes literal")
+            return node.value
+        if isinstance(node, ast.Name):
+            return self.name(node)
+        if isinstance(node, (ast.List, ast.Tuple)):
+            items = []
+            for element in node.elts:
+                if isinstance(element, ast.Starred):
+                    raise _reject(element, "starred element")
+                items.append(self.expr(element))
+            return items if isinstance(node, ast.List) else tuple(items)
+        if isinstance(node, ast.BinOp):
+            return self.binop(node.op, self.expr(node.left), self.expr(node.right), node)
+        if isinstance(node, ast.UnaryOp):
+            fn = _UNARYOPS.get(type(node.op))
+            if fn is None:
+                raise _reject(node, f"{type(node.op).__name__} is not allowed")
+            return self.evaluate(node, fn, self.expr(node.operand))
+        if isinstance(node, ast.Compare):
+            left = self.expr(node.left)
+            for op, comparator in zip(node.ops, node.comparators):
+                right = self.expr(comparator)
+                if not self.evaluate(node, _CMPOPS[type(op)], left, right):
+                    return False
+                left = right
+            return True
+        if isinstance(node, ast.BoolOp):
+            value: Any = None
+            for operand in node.values:
+                value = self.expr(operand)
+                if bool(value) == isinstance(node.op, ast.Or):
+                    break
+            return value
+        if isinstance(node, ast.IfExp):
+            return self.expr(node.body if self.expr(node.test) else node.orelse)
+        if isinstance(node, ast.JoinedStr):
+            return "".join(self.fstring_part(part) for part in node.values)
+        if isinstance(node, ast.Subscript):
+            value = self.expr(node.value)
+            index = node.slice
+            if isinstance(index, ast.Slice):
+                key: Any = slice(
+                    self.expr(index.lower) if index.lower else None,
+                    self.expr(index.upper) if index.upper else None,
+                    self.expr(index.step) if index.step else None,
+                )
+            else:
+                key = self.expr(index)
+            return self.evaluate(node, operator.getitem, value, key)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            return self.method(node, node.func)
+        if isinstance(node, ast.Call):
+            name = node.func.id if isinstance(node.func, ast.Name) else ""
+            helper = HELPERS.get(name)
+            if helper is None or name in self._scope:
+                raise _reject(node, f"call of {name or type(node.func).__name__} in an expression")
+            args, kwargs = self.arguments(node)
+            result = self.evaluate(node, helper, *args, **kwargs)
+            # len() of a range wider than sys.maxsize raises OverflowError.
+            if isinstance(result, range) and self.evaluate(node, len, result) > self._max_iterations:
+                raise _reject(node, f"range longer than {self._max_iterations}")
+            return result
+        raise _reject(node, f"{type(node).__name__} is not allowed")
+
+    def method(self, node: ast.Call, func: ast.Attribute) -> Any:
+        receiver = self.expr(func.value)
+        if not isinstance(receiver, str) or func.attr not in STR_METHODS:
+            raise _reject(node, f"call of {type(receiver).__name__}.{func.attr}")
+        args, kwargs = self.arguments(node)
+        if func.attr == "join" and len(args) == 1 and not kwargs:
+            items = list(args[0]) if isinstance(args[0], (list, tuple, str)) else []
+            size = sum(len(item) for item in items if isinstance(item, str)) + len(receiver) * len(items)
+            if size > MAX_VALUE_LEN:
+                raise _reject(node, "value too long")
+        elif func.attr == "format":
+            for _text, field, spec, _conversion in self.evaluate(node, _format_fields, receiver):
+                if field is not None and ("." in field or "[" in field):
+                    # '{0.__class__}' reads attributes: same rule as attribute access in the script.
+                    raise _reject(node, "attribute or index in a format field")
+                if field is not None and "{" in (spec or ""):
+                    raise _reject(node, "nested format spec")
+                _check_spec(node, spec or "")
+        return self.evaluate(node, getattr(receiver, func.attr), *args, **kwargs)
+
+    def fstring_part(self, node: ast.expr) -> str:
+        if isinstance(node, ast.Constant):
+            return str(node.value)
+        assert isinstance(node, ast.FormattedValue)
+        value = self.expr(node.value)
+        if node.conversion == ord("r"):
+            value = repr(value)
+        elif node.conversion == ord("s"):
+            value = str(value)
+        elif node.conversion == ord("a"):
+            value = ascii(value)
+        spec = self.expr(node.format_spec) if node.format_spec is not None else ""
+        _check_spec(node, spec)
+        return self.evaluate(node, format, value, spec)
+
+    def binop(self, op: ast.operator, left: Any, right: Any, node: ast.AST) -> Any:
+        fn = _BINOPS.get(type(op))
+        if fn is None:
+            raise _reject(node, f"{type(op).__name__} is not allowed")
+        if isinstance(op, ast.Mult):
+            # 'a' * 10**9 must not be built before it is rejected.
+            for seq, count in ((left, right), (right, left)):
+                if isinstance(seq, (str, list, tuple)) and isinstance(count, int):
+                    if len(seq) * count > MAX_VALUE_LEN:
+                        raise _reject(node, "value too long")
+        elif isinstance(op, ast.Mod) and isinstance(left, str):
+            # Same for '%50000000d' % 1 and '%*d' % (10**9, 1).
+            _check_percent(node, left, right)
+        return self.evaluate(node, fn, left, right)
+
+    def evaluate(self, node: ast.AST, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as exc:
+            raise _reject(node, f"{type(exc).__name__}: {exc}") from None
+        if isinstance(result, int) and not isinstance(result, bool) and abs(result) > _MAX_INT:
+            raise _reject(node, "integer too large")
+        if isinstance(result, (str, list, tuple)) and len(result) > MAX_VALUE_LEN:
+            raise _reject(node, "value too long")
+        return result
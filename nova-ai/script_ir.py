@@ -0,0 +1,1557 @@
+"""
+Parse-once representation of model-generated HWP scripts.
+
+`parse()` scans the cleaned script a single time and yields one `Op` per
+statement: the call name, its literal arguments and the source text it came
+from. The lexical repairs that used to be separate string passes happen in
+that scan:
+
+- newlines inside string literals become spaces;
+- newlines inside insert_text / insert_equation / insert_latex_equation
+  calls become spaces, and an unterminated final call is closed;
+- `a(...) + b(...)` lines are split into one op per call.
+
+Every normalization rule is a transform `list[Op] -> list[Op]` (PASSES).
+Transforms test the decoded fields instead of re-running regexes over the
+line text. `render()` gives back the script text; ScriptRunner dispatches
+the ops directly when every statement is a plain literal call (see
+`dispatchable`).
+"""
+from __future__ import annotations
+
+import ast
+import re
+import textwrap
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Container, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+OpKind = str  # "call" | "blank" | "comment" | "assign" | "stmt"
+
+_TEXT_CALLS = frozenset({"insert_text", "insert_equation", "insert_latex_equation"})
+_HEAD_RE = re.compile(r"[ \t]*([A-Za-z_][A-Za-z0-9_]*)\(")
+_ASSIGN_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*\s*=\s*(.+)$")
+_INT_RE = re.compile(r"[-+]?\d+$")
+_CONSTANTS: Dict[str, object] = {"True": True, "False": False, "None": None}
+# Characters the tokenizer has to look at; everything else is copied as is.
+_TOKEN_RE = re.compile(r"""\\[^\n]|['"()\n]| \+ """)
+_CALL_TOKEN_RE = re.compile(r"""\\.|['"()]""", re.S)
+_TEXT_CALL_END_RE = re.compile(r"(?<![A-Za-z0-9_])(?:insert_text|insert_equation|insert_latex_equation)\Z")
+
+
+@dataclass(frozen=True)
+class Op:
+    """
+    One statement of a script.
+
+    - kind: "call" for a single `name(args)` statement (optionally followed by
+      a comment), "blank", "comment", "assign" (NAME = literal) or "stmt" for
+      anything else (loops, `a(); b()`, broken calls). `name` is also set for
+      stmt lines that start with `name(`.
+    - args / kwargs: decoded literal arguments; `literal` is False when they
+      are not plain literals (the op can then only run through exec).
+    - source: statement text as rendered, indentation included.
+    - first_raw / first_span: body of the leading string literal argument as
+      written (escapes not decoded) and its [start, end) span in `source`.
+    """
+
+    kind: OpKind
+    source: str
+    name: str = ""
+    args: Tuple[Any, ...] = ()
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    literal: bool = False
+    line: int = 0
+    first_raw: Optional[str] = None
+    first_span: Optional[Tuple[int, int]] = None
+
+    @property
+    def indent(self) -> str:
+        return self.source[: len(self.source) - len(self.source.lstrip())]
+
+    @property
+    def blank(self) -> bool:
+        return not self.source.strip()
+
+    def bare(self, name: str) -> bool:
+        """`name()` with no arguments."""
+        return self.kind == "call" and self.name == name and not self.args and not self.kwargs
+
+    @property
+    def str_arg(self) -> Optional[str]:
+        """The single positional string argument of a literal call, if that is all it has."""
+        if self.kind == "call" and self.literal and len(self.args) == 1 and not self.kwargs:
+            value = self.args[0]
+            if isinstance(value, str):
+                return value
+        return None
+
+    @property
+    def marker(self) -> Optional[str]:
+        """Placeholder marker of focus_placeholder('...')."""
+        return self.str_arg if self.name == "focus_placeholder" else None
+
+    def template_has(self, *names: str) -> bool:
+        return self.name == "insert_template" and any(n in self.source for n in names)
+
+    def reparse(self, source: str) -> "Op":
+        return parse_statement(source, self.line)
+
+
+def call(name: str, *args: Any) -> Op:
+    """A synthesized `name(args...)` op (arguments written with repr)."""
+    return parse_statement(f"{name}({', '.join(repr(a) for a in args)})")
+
+
+# --------------------------------------------------------------------------
+# Tokenizer
+# --------------------------------------------------------------------------
+
+
+def prepare_source(script: str) -> str:
+    """Dedent, unify line separators, drop ``` fences and [CODE] marker lines."""
+    cleaned = textwrap.dedent(script or "").strip()
+    cleaned = cleaned.replace("\r\n", "\n").replace("\r", "\n").replace("\u2028", "\n").replace("\u2029", "\n")
+    if cleaned.startswith("```"):
+        lines = cleaned.split("\n")[1:]
+        if lines and lines[-1].strip() == "```":
+            lines = lines[:-1]
+        cleaned = "\n".join(lines).strip()
+    lines = [line for line in cleaned.split("\n") if line.strip() not in ("[CODE]", "[/CODE]", "CODE")]
+    return "\n".join(lines).strip()
+
+
+def _decode_literal(body: str, quote: str) -> Tuple[bool, Any]:
+    if "\\" not in body:
+        return True, body
+    try:
+        return True, ast.literal_eval(quote + body + quote)
+    except Exception:
+        return False, None
+
+
+def scan_call(text: str, open_idx: int) -> Tuple[int, Optional[Tuple[int, int]]]:
+    """
+    Index of the ')' closing the '(' at text[open_idx] (-1 if it never closes)
+    and the span of a leading string literal argument. Jumps between quote,
+    paren and backslash characters only.
+    """
+    depth = 0
+    quote: Optional[str] = None
+    first: Optional[Tuple[int, int]] = None
+    first_open = -1
+    first_checked = False
+    for m in _CALL_TOKEN_RE.finditer(text, open_idx):
+        tok = m.group()
+        if len(tok) == 2:
+            continue  # escaped character
+        i = m.start()
+        if quote is not None:
+            if tok == quote:
+                quote = None
+                if first_open >= 0 and first is None:
+                    first = (first_open, i)
+            continue
+        if tok == "'" or tok == '"':
+            quote = tok
+            if not first_checked and depth == 1:
+                first_checked = True
+                if not text[open_idx + 1 : i].strip():
+                    first_open = i + 1
+        elif tok == "(":
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return i, first
+    return -1, first
+
+
+def call_sites(text: str, pattern: "re.Pattern[str]") -> Iterator[Tuple[str, str, Optional[Tuple[int, int]]]]:
+    """
+    Yield (name, argument text, leading literal span) for every `name(` that
+    `pattern` finds (group 1 = name, match ends at the '('), skipping over
+    each call's arguments. An unclosed call takes the rest of the text.
+    """
+    pos = 0
+    while True:
+        m = pattern.search(text, pos)
+        if m is None:
+            return
+        open_idx = m.end() - 1
+        close, first = scan_call(text, open_idx)
+        if close < 0:
+            yield m.group(1), text[open_idx + 1 :], first
+            return
+        yield m.group(1), text[open_idx + 1 : close], first
+        pos = close + 1
+
+
+def decode_args(inner: str, first: Optional[Tuple[int, int]], text: str) -> Tuple[bool, tuple, dict]:
+    """(ok, args, kwargs) of a call's argument text; ok is False unless every argument is a literal."""
+    stripped = inner.strip()
+    if not stripped:
+        return True, (), {}
+    if first is not None and stripped == text[first[0] - 1 : first[1] + 1]:
+        # Fast path: the whole argument list is one plain string literal.
+        ok, value = _decode_literal(text[first[0] : first[1]], text[first[0] - 1])
+        return (True, (value,), {}) if ok else (False, (), {})
+    if stripped in _CONSTANTS:
+        return True, (_CONSTANTS[stripped],), {}
+    if _INT_RE.match(stripped):
+        return True, (int(stripped),), {}
+    try:
+        node = ast.parse(f"_({inner})", mode="eval").body
+        if not isinstance(node, ast.Call):
+            return False, (), {}
+        args = tuple(ast.literal_eval(a) for a in node.args)
+        kwargs = {kw.arg: ast.literal_eval(kw.value) for kw in node.keywords if kw.arg}
+        if len(kwargs) != len(node.keywords):
+            return False, (), {}
+        return True, args, kwargs
+    except Exception:
+        return False, (), {}
+
+
+def parse_statement(text: str, line: int = 0) -> Op:
+    """Classify one statement (one logical line, or one part of a `+`-joined line)."""
+    stripped = text.strip()
+    if not stripped:
+        return Op("blank", text, line=line)
+    if stripped.startswith("#"):
+        return Op("comment", text, line=line)
+    m = _HEAD_RE.match(text)
+    if m is None:
+        a = _ASSIGN_RE.match(stripped)
+        if a is not None and not text[0].isspace():
+            value = a.group(1).strip()
+            if value in _CONSTANTS or _INT_RE.match(value):
+                return Op("assign", text, line=line)
+        return Op("stmt", text, line=line)
+    name = m.group(1)
+    open_idx = m.end() - 1
+    close, first = scan_call(text, open_idx)
+    first_raw = text[first[0] : first[1]] if first is not None else None
+    rest = text[close + 1 :].strip() if close >= 0 else "?"
+    if close < 0 or (rest and not rest.startswith("#")):
+        return Op("stmt", text, name=name, line=line, first_raw=first_raw, first_span=first)
+    inner = text[open_idx + 1 : close]
+    ok, args, kwargs = decode_args(inner, first, text)
+    return Op(
+        "call", text, name=name, args=args, kwargs=kwargs, literal=ok, line=line, first_raw=first_raw, first_span=first
+    )
+
+
+def _split_parts(text: str, cuts: List[int]) -> List[str]:
+    # Same rule as the old _split_concat_calls: parts are stripped, empties dropped.
+    parts: List[str] = []
+    prev = 0
+    for cut in cuts:
+        part = text[prev:cut].strip()
+        if part:
+            parts.append(part)
+        prev = cut + 3
+    tail = text[prev:].strip()
+    if tail:
+        parts.append(tail)
+    return parts or [text]
+
+
+def parse(script: str) -> List[Op]:
+    """
+    Tokenize a prepared script (see prepare_source) into ops in one scan.
+
+    Calls whose parentheses span lines (e.g. insert_table with a cell list)
+    become one op; if the parentheses never close, the statement falls back
+    to one op per physical line.
+    """
+    tokenizer = Tokenizer()
+    ops = tokenizer.feed(script)
+    ops.extend(tokenizer.close())
+    return ops
+
+
+class Tokenizer:
+    """
+    parse() for a script that arrives in pieces. feed() takes whole lines (the
+    last one may lack its newline) and returns the statements completed so
+    far; close() ends the script exactly as parse() does. A newline that ends
+    a chunk inside a string or an open call is kept until more text (or the
+    end) shows what it belongs to.
+    """
+
+    def __init__(self) -> None:
+        self._buf = ""
+        self._pos = 0  # next index of _buf to scan
+        self._seg = 0  # start of the not yet copied slice of _buf
+        self._pieces: List[str] = []  # finished slices of the current statement
+        self._length = 0  # len("".join(pieces))
+        self._cuts: List[int] = []
+        self._quote: Optional[str] = None
+        self._depth = 0
+        self._text_call = False
+        self._line_no = 1
+        self._start_line = 1
+
+    def feed(self, text: str) -> List[Op]:
+        buf = self._buf + text if self._buf else text
+        end = len(buf)
+        if end and buf[-1] == "\n":
+            end -= 1  # decided below, once the state before it is known
+        ops: List[Op] = []
+        pieces = self._pieces
+        length = self._length
+        cuts = self._cuts
+        quote = self._quote
+        depth = self._depth
+        text_call = self._text_call
+        line_no = self._line_no
+        start_line = self._start_line
+        seg = self._seg
+
+        for m in _TOKEN_RE.finditer(buf, self._pos, end):
+            tok = m.group()
+            if len(tok) == 2:
+                continue  # escaped character
+            pos = m.start()
+            if quote is not None:
+                if tok == quote:
+                    quote = None
+                elif tok == "\n":
+                    line_no += 1
+                    pieces.append(buf[seg:pos])
+                    pieces.append(" ")
+                    length += pos - seg + 1
+                    seg = pos + 1
+                continue
+            if tok == "'" or tok == '"':
+                quote = tok
+            elif tok == "(":
+                if depth == 0:
+                    text_call = _TEXT_CALL_END_RE.search(buf, max(0, pos - 22), pos) is not None
+                depth += 1
+            elif tok == ")":
+                if depth > 0:
+                    depth -= 1
+                    if depth == 0:
+                        text_call = False
+            elif tok == "\n":
+                line_no += 1
+                if depth == 0:
+                    pieces.append(buf[seg:pos])
+                    ops.extend(_line_ops("".join(pieces), start_line, cuts))
+                    pieces = []
+                    length = 0
+                    cuts = []
+                    seg = pos + 1
+                    start_line = line_no
+                elif text_call:
+                    pieces.append(buf[seg:pos])
+                    pieces.append(" ")
+                    length += pos - seg + 1
+                    seg = pos + 1
+            else:  # " + "
+                cuts.append(length + pos - seg)
+
+        if end < len(buf) and quote is None and depth == 0:
+            # A final newline outside strings and calls always ends the statement.
+            line_no += 1
+            pieces.append(buf[seg:end])
+            ops.extend(_line_ops("".join(pieces), start_line, cuts))
+            pieces = []
+            length = 0
+            cuts = []
+            seg = end + 1
+            start_line = line_no
+            end += 1
+
+        self._buf = buf[seg:]
+        self._pos = end - seg
+        self._seg = 0
+        self._pieces = pieces
+        self._length = length
+        self._cuts = cuts
+        self._quote = quote
+        self._depth = depth
+        self._text_call = text_call
+        self._line_no = line_no
+        self._start_line = start_line
+        return ops
+
+    def close(self) -> List[Op]:
+        """Statements left at the end of the script (unterminated ones repaired as in parse())."""
+        ops: List[Op] = []
+        pieces = self._pieces
+        tail = self._buf[self._seg :]
+        if tail.endswith("\n") and self._pos == len(self._buf) - 1:
+            tail = tail[:-1]  # a held final newline: the script ends before it
+        pieces.append(tail)
+        if self._quote is not None:
+            pieces.append(self._quote)
+        depth = self._depth
+        if self._text_call and depth > 0:
+            pieces.append(")" * depth)
+            depth = 0
+        text = "".join(pieces)
+        if text:
+            if depth > 0:
+                for offset, physical in enumerate(text.split("\n")):
+                    ops.extend(_line_ops(physical, self._start_line + offset, _plus_cuts(physical)))
+            else:
+                ops.extend(_line_ops(text, self._start_line, self._cuts))
+        return ops
+
+
+def _plus_cuts(text: str) -> List[int]:
+    cuts: List[int] = []
+    quote: Optional[str] = None
+    escaped = False
+    for i, ch in enumerate(text):
+        if escaped:
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif quote is not None:
+            if ch == quote:
+                quote = None
+        elif ch in ("'", '"'):
+            quote = ch
+        elif ch == " " and text.startswith(" + ", i):
+            cuts.append(i)
+    return cuts
+
+
+def _line_ops(text: str, line: int, cuts: List[int]) -> List[Op]:
+    if not cuts:
+        return [parse_statement(text, line)]
+    return [parse_statement(part, line) for part in _split_parts(text, cuts)]
+
+
+def render(ops: Iterable[Op]) -> str:
+    return "\n".join(op.source for op in ops).strip()
+
+
+def dispatchable(ops: Sequence[Op], names: Iterable[str]) -> bool:
+    """
+    True when running the ops one by one is exactly what exec() of the
+    rendered script would do: only top-level literal calls of known functions,
+    plus blanks, comments and constant assignments nothing reads.
+    """
+    known = set(names)
+    return all(dispatchable_op(op, known) for op in ops)
+
+
+def dispatchable_op(op: Op, known: Container[str]) -> bool:
+    """dispatchable() for one op; `known` is the set of script function names."""
+    if op.kind == "call":
+        return op.literal and op.name in known and not op.source[:1].isspace()
+    if op.kind == "assign":
+        return op.source.split("=", 1)[0].strip() not in known
+    return op.kind in ("blank", "comment")
+
+
+# --------------------------------------------------------------------------
+# Normalization transforms (same rules and order as the old line passes)
+# --------------------------------------------------------------------------
+
+_BOX_ITEM_RE = re.compile(r"\s*[ㄱㄴㄷ]\.")
+_BOX_START_RE = re.compile(r"\s*(○|◎|●|•|ㄱ\.|ㄴ\.|ㄷ\.|가\.|나\.|다\.)")
+_SCORE_RE = re.compile(r"\s*\[\s*(\d+)\s*점\s*\]\s*")
+_LEADING_CHOICE_RE = re.compile(r"\s+①")
+_QUESTION_RE = re.compile(
+    r"(이에\s*대한|것은\s*\??|것만을|옳은|옳지|<\s*보\s*기\s*>"
+    r"|보기>|바르게|짝지은|대로\s*고|고른|맞게|맞는|틀린|아닌|설명으로)"
+)
+_CONTENT_NAMES = frozenset(
+    {"insert_text", "insert_equation", "set_bold", "set_align_justify_next_line", "set_align_right_next_line"}
+)
+_TEMPLATES = ("header.hwp", "box.hwp", "box_white.hwp")
+_PARAGRAPHS = ("insert_paragraph", "insert_enter")
+
+
+def _is_para(op: Op) -> bool:
+    return op.bare("insert_paragraph") or op.bare("insert_enter")
+
+
+def _is_box_item(op: Op) -> bool:
+    return op.name == "insert_text" and op.first_raw is not None and _BOX_ITEM_RE.match(op.first_raw) is not None
+
+
+def _is_box_start(op: Op) -> bool:
+    return op.name == "insert_text" and op.first_raw is not None and _BOX_START_RE.match(op.first_raw) is not None
+
+
+def _is_choice(op: Op) -> bool:
+    return op.name in ("insert_text", "insert_equation") and op.first_raw is not None and "①" in op.source
+
+
+def _is_text_or_eq(op: Op) -> bool:
+    return op.name in ("insert_text", "insert_equation")
+
+
+def looks_like_hwpeq_text(text: str) -> bool:
+    s = (text or "").strip()
+    if not s:
+        return False
+    strong_markers = (
+        "{rm",
+        "rm ",
+        "{bold",
+        "bold ",
+        "vec{",
+        "CDOT",
+        "dint",
+        "curl",
+        "div",
+        "LEFT",
+        "RIGHT",
+        "over",
+        "sqrt",
+        "it ",
+        "SIM",
+        "DEG",
+        "ANGLE",
+        "pi",
+    )
+    if not any(marker in s for marker in strong_markers):
+        return False
+    return bool(
+        re.search(
+            r"[=^_{}()]|CDOT|LEFT|RIGHT|dint|curl|div|vec|rm|bold",
+            s,
+        )
+    )
+
+
+def _fix_primes(s: str) -> str:
+    if "'" not in s and "\\" not in s and "′" not in s and "’" not in s and "prime" not in s.lower():
+        return s
+    s = s.replace("′", "'").replace("’", "'")
+    s = re.sub(r"\\+prime\b", "'", s, flags=re.IGNORECASE)
+    # Some models emit backslash as prime marker: F\  -> F'
+    # Only convert when backslash is NOT starting a command (e.g. \sqrt).
+    s = re.sub(r"\\'+", "'", s)  # remove escaped apostrophes: \' -> '
+    s = re.sub(r"([A-Za-z])\\(?![A-Za-z])", r"\1'", s)
+    s = re.sub(r"\brm\s*([A-Za-z])\s*\\(?![A-Za-z])", r"rm\1'", s)
+    # Special rule: F prime should be 'rm F prime' (with single spaces).
+    s = re.sub(r"\brm\s*F\s*'", "rm F prime", s)
+    s = re.sub(r"\brm\s*F\s*\\\\(?![A-Za-z])", "rm F prime", s)
+    s = re.sub(r"\brm\s*F\s*prime\b", "rm F prime", s, flags=re.IGNORECASE)
+    # Prime with rm should be tight: rm X' -> rmX'
+    s = re.sub(r"\brm\s+([A-Za-z])'", r"rm\1'", s)
+    return s
+
+
+def _escape_quote(body: str, quote: str) -> str:
+    """Escape `quote` characters of a literal body that are not escaped yet."""
+    out: List[str] = []
+    backslashes = 0
+    for ch in body:
+        if ch == quote and backslashes % 2 == 0:
+            out.append("\\")
+        out.append(ch)
+        backslashes = backslashes + 1 if ch == "\\" else 0
+    return "".join(out)
+
+
+def normalize_primes(ops: List[Op]) -> List[Op]:
+    """
+    Normalize prime notation inside insert_equation/insert_latex_equation strings.
+    - Replace \\prime or \\Prime or unicode primes with apostrophe (')
+    The rules see the decoded string, so the result is re-quoted with repr().
+    """
+    out: List[Op] = []
+    for op in ops:
+        if op.name in ("insert_equation", "insert_latex_equation"):
+            value = op.str_arg
+            if value is not None:
+                fixed = _fix_primes(value)
+                if fixed != value:
+                    op = op.reparse(f"{op.indent}{op.name}({fixed!r})")
+            elif op.first_span is not None and op.source[op.first_span[1] + 1 : op.first_span[1] + 2] == ")":
+                # Undecodable literal: fix the raw body and keep it quoted.
+                start, end = op.first_span
+                body = op.source[start:end]
+                fixed = _fix_primes(body)
+                if fixed != body:
+                    fixed = _escape_quote(fixed, op.source[start - 1])
+                    op = op.reparse(op.source[:start] + fixed + op.source[end:])
+        out.append(op)
+    return out
+
+
+def promote_math_insert_text_calls(ops: List[Op]) -> List[Op]:
+    """
+    If a line uses insert_text(...) but the payload clearly looks like
+    HwpEqn syntax, promote it to insert_equation(...).
+    """
+    out: List[Op] = []
+    for op in ops:
+        text_arg = op.str_arg if op.name == "insert_text" else None
+        if text_arg is not None and looks_like_hwpeq_text(text_arg):
+            op = op.reparse(f"{op.indent}insert_equation({text_arg!r})")
+        out.append(op)
+    return out
+
+
+def normalize_placeholders(ops: List[Op]) -> List[Op]:
+    """
+    Ensure placeholder usage order is stable.
+    - After entering the box placeholder (###), any later @@@ is treated as
+      "move after box" to type choices outside.
+    """
+    out: List[Op] = []
+    seen_inside = False
+    inserted_inside = False
+    saw_template = False
+    has_choices_placeholder = False
+    saw_outside = False
+    saw_after_box = False
+    # --- Dual template detection (header.hwp + box.hwp/box_white.hwp) ---
+    # When both templates are present, their ### placeholders collide.
+    # Fix: skip the plain-box template and use insert_box() instead.
+    has_header_tpl = any(op.template_has("header.hwp") for op in ops)
+    has_plain_box_tpl = any(
+        op.template_has("box.hwp", "box_white.hwp") and "header.hwp" not in op.source for op in ops
+    )
+    dual_mode = has_header_tpl and has_plain_box_tpl
+    dual_hash_count = 0
+    dual_box_phase = 0  # 0=before, 1=in condition box, 2=exited condition box
+    # Positions in `out` of the last exit_box() / box entry, indexed up to `scanned`
+    # so the &&& check below never walks back over `out`.
+    last_exit = -1
+    last_entry = -1
+    scanned = 0
+    for op in ops:
+        if op.template_has(*_TEMPLATES):
+            # Dual mode: skip plain box template (replaced by insert_box())
+            if dual_mode and op.template_has("box.hwp", "box_white.hwp") and "header.hwp" not in op.source:
+                continue
+            saw_template = True
+            has_choices_placeholder = True
+            out.append(op)
+            continue
+        marker = op.marker
+        if marker is None:
+            # Dual mode: track condition box exit to reset box state
+            if dual_mode and dual_box_phase == 1 and op.bare("exit_box"):
+                dual_box_phase = 2
+                seen_inside = False
+                inserted_inside = False
+            if saw_template and not saw_outside and op.name in _CONTENT_NAMES:
+                out.append(call("focus_placeholder", "@@@"))
+                saw_outside = True
+            if (
+                not seen_inside
+                and saw_template
+                and has_choices_placeholder
+                and saw_outside
+                and not saw_after_box
+                and (op.bare("set_align_justify_next_line") or _is_box_item(op) or _is_box_start(op))
+            ):
+                out.append(call("focus_placeholder", "###"))
+                seen_inside = True
+                inserted_inside = True
+            if not seen_inside and saw_template and saw_outside and _is_box_item(op):
+                if out and out[-1].bare("set_align_justify_next_line"):
+                    align = out.pop()
+                    scanned = min(scanned, len(out))
+                    out.append(call("focus_placeholder", "###"))
+                    out.append(align)
+                else:
+                    out.append(call("focus_placeholder", "###"))
+                seen_inside = True
+                inserted_inside = True
+            if seen_inside and saw_template and has_choices_placeholder and not saw_after_box and _is_choice(op):
+                out.append(call("exit_box"))
+                out.append(call("insert_enter"))
+                out.append(call("focus_placeholder", "&&&"))
+                saw_after_box = True
+            out.append(op)
+            continue
+        if marker == "###":
+            if dual_mode:
+                dual_hash_count += 1
+                if dual_hash_count == 1:
+                    # First ### in dual mode → create condition box via insert_box()
+                    out.append(call("insert_box"))
+                    seen_inside = True
+                    dual_box_phase = 1
+                else:
+                    # Second+ ### → navigate to header.hwp's 보기 box
+                    if dual_box_phase == 1:
+                        # Still in condition box; exit first
+                        out.append(call("exit_box"))
+                        out.append(call("insert_enter"))
+                        dual_box_phase = 2
+                        seen_inside = False
+                    out.append(op)
+                    seen_inside = True
+                continue
+            if not inserted_inside:
+                seen_inside = True
+                out.append(op)
+            continue
+        if marker == "@@@":
+            saw_outside = True
+            if seen_inside:
+                out.append(call("exit_box"))
+                out.append(call("insert_enter"))
+                continue
+            # If we're using a template with placeholders, consume @@@ here.
+            if saw_template:
+                out.append(op)
+            continue
+        if marker == "&&&":
+            if has_choices_placeholder:
+                saw_after_box = True
+                if seen_inside:
+                    # Only add exit_box() if not already present after the last ### / box entry
+                    # (looking back at most 19 ops, as before).
+                    for j in range(scanned, len(out)):
+                        prev = out[j]
+                        if prev.bare("exit_box"):
+                            last_exit = j
+                        elif prev.marker == "###" or prev.bare("insert_box") or prev.bare("insert_view_box"):
+                            last_entry = j
+                    scanned = len(out)
+                    already_exited = last_exit > last_entry and last_exit >= len(out) - 19
+                    if not already_exited:
+                        out.append(call("exit_box"))
+                        out.append(call("insert_enter"))
+                    out.append(op)
+                    continue
+                out.append(op)
+                continue
+            # If template has no &&& placeholder, ignore this marker.
+            continue
+        out.append(op)
+    return out
+
+
+def split_dual_content_in_header(ops: List[Op]) -> List[Op]:
+    """
+    When header.hwp template is used and its ### block contains both
+    condition text (ⓐ/ⓑ/ⓒ etc.) AND 보기 items (ㄱ/ㄴ/ㄷ), split them:
+      - condition text  → insert_box()  (separate plain box)
+      - question text   → outside any box
+      - 보기 items      → keep in header's ### block
+    This handles the case where the AI puts everything into a single
+    header.hwp box instead of using two separate templates.
+    """
+    # Only apply when header.hwp template is present
+    if not any("insert_template(" in op.source and "header.hwp" in op.source for op in ops):
+        return ops
+    # Skip if dual mode already created an insert_box()
+    if any(op.bare("insert_box") for op in ops):
+        return ops
+
+    # Find the ### entry and the matching exit_box()
+    hash_idx = -1
+    exit_idx = -1
+    for i, op in enumerate(ops):
+        if hash_idx < 0 and op.marker == "###":
+            hash_idx = i
+        elif hash_idx >= 0 and exit_idx < 0 and op.bare("exit_box"):
+            exit_idx = i
+    if hash_idx < 0 or exit_idx < 0:
+        return ops
+
+    # Find first 보기 item (ㄱ./ㄴ./ㄷ.) inside the ### block
+    first_bogi_idx = -1
+    for i in range(hash_idx + 1, exit_idx):
+        if _is_box_item(ops[i]):
+            first_bogi_idx = i
+            break
+    if first_bogi_idx < 0:
+        return ops  # No 보기 items; nothing to split
+
+    # Check if there's substantial text content BEFORE the first 보기 item
+    if not any(_is_text_or_eq(ops[i]) for i in range(hash_idx + 1, first_bogi_idx)):
+        return ops  # No condition text before 보기 items
+
+    # --- Detect question-text boundary by scanning backward from ㄱ. ---
+    question_start = first_bogi_idx  # default: no question text detected
+    found_question = False
+    i = first_bogi_idx - 1
+    while i > hash_idx:
+        op = ops[i]
+        # Skip paragraph / blank lines
+        if op.blank or _is_para(op) or op.bare("insert_small_paragraph"):
+            i -= 1
+            continue
+        # Skip formatting-only lines
+        if op.bare("set_align_justify_next_line") or (op.name == "set_bold" and op.args in ((True,), (False,))):
+            if found_question:
+                question_start = i
+            i -= 1
+            continue
+        # Check text/equation content
+        if _is_text_or_eq(op):
+            chunk = re.split(r"['\"]", op.first_raw)[0] if op.first_raw else ""
+            if chunk and _QUESTION_RE.search(chunk):
+                question_start = i
+                found_question = True
+                i -= 1
+                continue
+            break  # Not question text → end of condition text
+        break
+
+    # Include preceding paragraph break(s) in question section
+    while question_start > hash_idx + 1 and (ops[question_start - 1].blank or _is_para(ops[question_start - 1])):
+        question_start -= 1
+
+    # Determine condition text end (strip trailing paragraphs)
+    condition_end = question_start
+    while condition_end > hash_idx + 1 and (ops[condition_end - 1].blank or _is_para(ops[condition_end - 1])):
+        condition_end -= 1
+
+    # Verify there's actual condition text remaining after stripping
+    if not any(_is_text_or_eq(ops[j]) for j in range(hash_idx + 1, condition_end)):
+        return ops
+
+    # --- Build the new output ---
+    out: List[Op] = list(ops[:hash_idx])
+    # Condition box (insert_box replaces the original focus_placeholder('###'))
+    out.append(call("insert_box"))
+    content_start = hash_idx + 1
+    # Carry over set_align_justify_next_line if present right after ###
+    if content_start < condition_end and ops[content_start].bare("set_align_justify_next_line"):
+        out.append(ops[content_start])
+        content_start += 1
+    out.extend(ops[content_start:condition_end])
+    out.append(call("exit_box"))
+    out.append(call("insert_enter"))
+
+    # Question text (outside any box)
+    has_question_content = False
+    for j in range(question_start, first_bogi_idx):
+        op = ops[j]
+        if op.bare("set_align_justify_next_line"):
+            continue  # Don't carry box alignment into outside text
+        out.append(op)
+        if _is_text_or_eq(op):
+            has_question_content = True
+    # Ensure paragraph break before 보기 block
+    if has_question_content and (not out or not _is_para(out[-1])):
+        out.append(call("insert_enter"))
+
+    # 보기 items in header's ### block
+    out.append(call("focus_placeholder", "###"))
+    out.append(call("set_align_justify_next_line"))
+    out.extend(ops[first_bogi_idx:exit_idx])
+    out.append(ops[exit_idx])  # exit_box()
+    out.extend(ops[exit_idx + 1 :])
+    return out
+
+
+def normalize_box_paragraphs(ops: List[Op]) -> List[Op]:
+    """
+    Inside a box, collapse multiple blank lines and avoid trailing blanks.
+    This keeps <보기> content compact (single-spaced list items).
+    """
+    out: List[Op] = []
+    in_box = False
+    last_was_para_in_box = False
+    for op in ops:
+        marker = op.marker
+        if marker is not None:
+            if marker == "###":
+                in_box = True
+                last_was_para_in_box = False
+            elif marker in ("&&&", "@@@"):
+                if in_box and out and _is_para(out[-1]):
+                    out.pop()
+                in_box = False
+                last_was_para_in_box = False
+            out.append(op)
+            continue
+        if op.bare("insert_box") or op.bare("insert_view_box"):
+            in_box = True
+            last_was_para_in_box = False
+            out.append(op)
+            continue
+        if op.bare("exit_box"):
+            if in_box and out and _is_para(out[-1]):
+                out.pop()
+            in_box = False
+            last_was_para_in_box = False
+            out.append(op)
+            continue
+        if in_box and (
+            _is_para(op) or op.bare("insert_small_paragraph") or op.bare("insert_small_paragraph_3px")
+        ):
+            if last_was_para_in_box:
+                continue
+            out.append(call("insert_enter"))
+            last_was_para_in_box = True
+            continue
+        if not op.blank:
+            last_was_para_in_box = False
+        out.append(op)
+    return out
+
+
+def normalize_box_template_order(ops: List[Op]) -> List[Op]:
+    """
+    When box.hwp is used, ensure focus_placeholder('@@@') appears
+    immediately after insert_template('box.hwp').
+    """
+    last_box_tpl = -1
+    for i, op in enumerate(ops):
+        if op.template_has("box.hwp"):
+            last_box_tpl = i
+    if last_box_tpl < 0:
+        return ops
+    out: List[Op] = []
+    i = 0
+    while i < len(ops):
+        op = ops[i]
+        if op.template_has("box.hwp"):
+            out.append(op)
+            # Skip any existing @@@ right after; reinsert if missing.
+            j = i + 1
+            while j < len(ops) and ops[j].blank:
+                out.append(ops[j])
+                j += 1
+            if j < len(ops) and ops[j].marker == "@@@":
+                out.append(ops[j])
+                i = j + 1
+                continue
+            out.append(call("focus_placeholder", "@@@"))
+            i = j
+            continue
+        if op.marker == "@@@":
+            # If @@@ appears before box.hwp, drop it (will be reinserted after template).
+            if i < last_box_tpl:
+                i += 1
+                continue
+        out.append(op)
+        i += 1
+    return out
+
+
+def ensure_exit_after_plain_box(ops: List[Op]) -> List[Op]:
+    """
+    If a plain box is opened with insert_box() and never closed,
+    insert exit_box() before the next outside marker or at EOF.
+    """
+    out: List[Op] = []
+    in_box = False
+    for op in ops:
+        if op.bare("insert_box"):
+            in_box = True
+            out.append(op)
+            continue
+        if op.bare("exit_box"):
+            in_box = False
+            out.append(op)
+            continue
+        # If we're in a plain box and we hit an outside marker, close first.
+        if in_box and (op.name == "insert_template" or op.marker in ("@@@", "###", "&&&")):
+            out.append(call("exit_box"))
+            in_box = False
+        out.append(op)
+    if in_box:
+        out.append(call("exit_box"))
+    return out
+
+
+def drop_enter_after_exit_box(ops: List[Op]) -> List[Op]:
+    """
+    Avoid extra blank lines caused by exit_box() followed by insert_enter().
+    exit_box() already moves the cursor below the box.
+    """
+    out: List[Op] = []
+    skip_next = False
+    for op in ops:
+        if skip_next:
+            skip_next = False
+            if _is_para(op):
+                continue
+        out.append(op)
+        if op.bare("exit_box"):
+            skip_next = True
+    return out
+
+
+def fix_header_view_box_order(ops: List[Op]) -> List[Op]:
+    """
+    When header.hwp is used, ensure the <보기> content (ㄱ/ㄴ/ㄷ) is
+    inside the ### placeholder and choices are after &&&.
+    """
+    if not any(op.template_has("header.hwp") for op in ops):
+        return ops
+
+    first_box_idx = -1
+    last_box_idx = -1
+    first_choice_idx = -1
+    hash_idx = -1
+    amp_idx = -1
+    for i, op in enumerate(ops):
+        if _is_box_item(op):
+            if first_box_idx < 0:
+                first_box_idx = i
+            last_box_idx = i
+        if first_choice_idx < 0 and _is_choice(op):
+            first_choice_idx = i
+        marker = op.marker
+        if hash_idx < 0 and marker == "###":
+            hash_idx = i
+        if amp_idx < 0 and marker == "&&&":
+            amp_idx = i
+    if first_box_idx < 0:
+        return ops
+
+    # Edits are keyed by original index and applied in one rebuild at the end.
+    before: Dict[int, List[Op]] = {}
+    drop = -1
+    # Ensure ### is placed right before the <보기> items.
+    if hash_idx >= 0 and hash_idx > first_box_idx:
+        drop = hash_idx
+        hash_idx = -1
+    if hash_idx < 0:
+        insert_at = first_box_idx
+        if insert_at > 0 and ops[insert_at - 1].bare("set_align_justify_next_line"):
+            insert_at -= 1
+        before.setdefault(insert_at, []).append(call("focus_placeholder", "###"))
+
+    # Ensure choices are after &&&, and exit_box appears before choices.
+    if first_choice_idx >= 0:
+        if amp_idx < 0 or amp_idx > first_choice_idx:
+            before.setdefault(first_choice_idx, []).extend(
+                (call("exit_box"), call("focus_placeholder", "&&&"))
+            )
+    # Ensure we exit the <보기> box immediately after the last item.
+    # Find first non-box content after last item
+    next_idx = last_box_idx + 1
+    while next_idx < len(ops) and (ops[next_idx].blank or next_idx == drop) and next_idx not in before:
+        next_idx += 1
+    if next_idx < len(ops):
+        pending = before.get(next_idx)
+        following = pending[0] if pending else ops[next_idx]
+        if not following.bare("exit_box"):
+            before.setdefault(next_idx, []).insert(0, call("exit_box"))
+
+    out: List[Op] = []
+    for i, op in enumerate(ops):
+        pending = before.get(i)
+        if pending:
+            out.extend(pending)
+        if i != drop:
+            out.append(op)
+    return out
+
+
+def normalize_choice_leading_space(ops: List[Op]) -> List[Op]:
+    """
+    Ensure choices start with insert_text('①') (no leading space).
+    """
+    out: List[Op] = []
+    for op in ops:
+        span = op.first_span
+        if (
+            op.kind == "call"
+            and op.name == "insert_text"
+            and span is not None
+            and _LEADING_CHOICE_RE.fullmatch(op.first_raw or "")
+            and op.source[span[1] + 1 :].strip() == ")"
+        ):
+            op = op.reparse((op.source[: span[0]] + "①" + op.source[span[1] :]).strip())
+        out.append(op)
+    return out
+
+
+def drop_unused_choices_placeholder(ops: List[Op]) -> List[Op]:
+    """
+    Ensure focus_placeholder('&&&') is handled correctly.
+    - If no choices exist, move cursor to &&& once and remove the marker.
+    - If choices exist, drop any &&& that appear after the last choice.
+    """
+    has_choices_placeholder = any(op.template_has(*_TEMPLATES) for op in ops)
+    last_choice_idx = -1
+    for i, op in enumerate(ops):
+        if _is_choice(op):
+            last_choice_idx = i
+    if last_choice_idx < 0:
+        # No choices anywhere: ensure we still clear &&& once.
+        out = [op for op in ops if op.marker != "&&&"]
+        if has_choices_placeholder:
+            insert_at = len(out)
+            for i in range(len(out) - 1, -1, -1):
+                if out[i].bare("exit_box"):
+                    insert_at = i + 1
+                    break
+            out.insert(insert_at, call("focus_placeholder", "&&&"))
+        return out
+    return [op for i, op in enumerate(ops) if not (op.marker == "&&&" and i > last_choice_idx)]
+
+
+def ensure_score_right_align(ops: List[Op]) -> List[Op]:
+    out: List[Op] = []
+    need_extra_blank_line = False
+    for op in ops:
+        # Track whether the current line already has content (since last paragraph break)
+        if _is_para(op) or op.bare("insert_small_paragraph"):
+            # This paragraph can serve as the blank line after score.
+            need_extra_blank_line = False
+            out.append(op)
+            continue
+
+        if need_extra_blank_line and not op.blank:
+            # Ensure exactly one blank line after score before the next content.
+            out.append(call("insert_enter"))
+            need_extra_blank_line = False
+
+        score = op.str_arg if op.name in _TEXT_CALLS and not op.source[:1].isspace() else None
+        m = _SCORE_RE.fullmatch(score) if score is not None else None
+        if m:
+            # Remove extra blank lines before score (keep at most ONE paragraph break)
+            while out and (_is_para(out[-1]) or out[-1].bare("insert_small_paragraph")):
+                if _is_para(out[-1]):
+                    # If there is another paragraph right before, drop extras
+                    if len(out) >= 2 and _is_para(out[-2]):
+                        out.pop()
+                        continue
+                    # Keep exactly one paragraph break
+                    break
+                # Small paragraph before score creates visible blank space; remove it
+                out.pop()
+
+            # Ensure score starts on a new line (single paragraph break only)
+            if out and not _is_para(out[-1]):
+                out.append(call("insert_enter"))
+
+            # Right align score line
+            if not (out and out[-1].bare("set_align_right_next_line")):
+                out.append(call("set_align_right_next_line"))
+
+            # Force score to be plain text (not equation)
+            out.append(call("insert_text", f"[{m.group(1)}점]"))
+            out.append(call("insert_enter"))  # move to next line after score
+            need_extra_blank_line = True  # ensure one blank line below the score
+            continue
+
+        out.append(op)
+    return out
+
+
+def sanitize_tabs(ops: List[Op]) -> List[Op]:
+    """
+    Only keep insert_text('\\t') when it immediately precedes an insert_equation(...) line.
+    Otherwise replace it with a single space.
+    """
+    out: List[Op] = []
+    # next_is_eq[i]: the first non-blank op after i is insert_equation(...)
+    next_is_eq = [False] * len(ops)
+    following = False
+    for i in range(len(ops) - 1, -1, -1):
+        next_is_eq[i] = following
+        if not ops[i].blank:
+            following = ops[i].name == "insert_equation"
+    for i, op in enumerate(ops):
+        if op.name == "insert_text" and op.first_raw == "\\t" and op.source.strip()[-1:] == ")":
+            if next_is_eq[i]:
+                out.append(op)
+            else:
+                out.append(call("insert_space"))
+            continue
+        out.append(op)
+    return out
+
+
+Pass = Callable[[List[Op]], List[Op]]
+
+PASSES: Tuple[Tuple[str, Pass], ...] = (
+    ("normalize_primes", normalize_primes),
+    ("promote_math_insert_text_calls", promote_math_insert_text_calls),
+    ("normalize_placeholders", normalize_placeholders),
+    ("split_dual_content_in_header", split_dual_content_in_header),
+    ("normalize_box_paragraphs", normalize_box_paragraphs),
+    ("normalize_box_template_order", normalize_box_template_order),
+    ("ensure_exit_after_plain_box", ensure_exit_after_plain_box),
+    ("drop_enter_after_exit_box", drop_enter_after_exit_box),
+    ("fix_header_view_box_order", fix_header_view_box_order),
+    ("normalize_choice_leading_space", normalize_choice_leading_space),
+    ("drop_unused_choices_placeholder", drop_unused_choices_placeholder),
+    ("ensure_score_right_align", ensure_score_right_align),
+    ("sanitize_tabs", sanitize_tabs),
+)
+
+
+# Passes that rewrite each op on its own; StreamNormalizer applies them as ops arrive.
+PER_OP_PASSES = 2
+
+
+def normalize(
+    ops: List[Op], timings: Optional[Dict[str, float]] = None, passes: Sequence[Tuple[str, Pass]] = PASSES
+) -> List[Op]:
+    """Run every pass in order; `timings` (if given) accumulates seconds per pass name."""
+    if timings is None:
+        for _name, transform in passes:
+            ops = transform(ops)
+        return ops
+    for name, transform in passes:
+        started = time.perf_counter()
+        ops = transform(ops)
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - started
+    return ops
+
+
+# --------------------------------------------------------------------------
+# Peephole optimizer (after normalization)
+# --------------------------------------------------------------------------
+
+_TOGGLE = object()
+_CHAR_SETTERS = ("set_bold", "set_underline", "set_char_width_ratio")
+_ALIGN_SETTERS = frozenset({"set_align_right_next_line", "set_align_justify_next_line"})
+# Type at the cursor: they commit pending char-shape changes and consume one-line alignment.
+# Equations are not listed: they step the cursor over the new control
+# (MoveRight), after which HWP reads the char shape from the document again.
+_TYPING_CALLS = frozenset({"insert_text", "insert_space", "insert_paragraph"})
+# Neither type nor move the cursor.
+_NEUTRAL_CALLS = frozenset({"insert_enter", "insert_small_paragraph"})
+_REMOVED_KEYS = {
+    "set_bold": "bold",
+    "set_underline": "underline",
+    "set_char_width_ratio": "char_width",
+}
+
+
+def _setter_value(op: Op) -> Any:
+    """Value a char-shape setter applies (_TOGGLE for set_underline() with no value)."""
+    if op.name == "set_bold":
+        return bool(op.kwargs.get("enabled", op.args[0] if op.args else True))
+    if op.name == "set_underline":
+        value = op.kwargs.get("enabled", op.args[0] if op.args else None)
+        return _TOGGLE if value is None else bool(value)
+    try:
+        return int(op.kwargs.get("percent", op.args[0] if op.args else 100))
+    except (TypeError, ValueError):
+        return _TOGGLE  # never equal to a known value, so always kept
+
+
+def peephole(ops: List[Op], removed: Optional[Dict[str, int]] = None) -> List[Op]:
+    """
+    Drop formatting ops that cannot change the document:
+    - set_bold / set_underline / set_char_width_ratio to the value already in
+      effect, or overridden by a later setter before anything is typed
+      (two set_underline() toggles in a row cancel out);
+    - a repeated set_align_*_next_line() before the line is typed;
+    - insert_text('').
+    Char-shape state is only known after an explicit setter in this script and
+    is forgotten whenever the cursor moves (equations, templates, placeholders,
+    boxes, tables) or the script leaves plain top-level calls (loops, broken
+    lines).
+    `removed` (if given) accumulates counts per kind.
+    """
+    stage = Peephole(removed)
+    out: List[Op] = []
+    for op in ops:
+        out.extend(stage.feed(op))
+    out.extend(stage.finish())
+    return out
+
+
+class Peephole:
+    """
+    peephole() one op at a time. A char-shape setter can still be dropped
+    until something is typed after it, so feed() holds everything from the
+    oldest such setter on and returns the ops that are final.
+    """
+
+    def __init__(self, removed: Optional[Dict[str, int]] = None) -> None:
+        self._counts = removed if removed is not None else {}
+        self._out: List[Optional[Op]] = []
+        self._known: Dict[str, Any] = {}
+        # setter name -> (index in _out, value it set or _TOGGLE, value known before it)
+        self._pending: Dict[str, Tuple[int, Any, Any]] = {}
+        self._align_pending: set = set()
+        self._holes = False  # _out has dropped (None) entries
+
+    @property
+    def held(self) -> int:
+        return len(self._out)
+
+    def _drop(self, key: str) -> None:
+        self._counts[key] = self._counts.get(key, 0) + 1
+
+    def _release(self) -> List[Op]:
+        if self._pending:
+            return []
+        out = self._out
+        self._out = []
+        if self._holes:
+            self._holes = False
+            return [op for op in out if op is not None]
+        return out  # type: ignore[return-value]
+
+    def finish(self) -> List[Op]:
+        self._pending.clear()
+        return self._release()
+
+    def feed(self, op: Op) -> List[Op]:
+        out = self._out
+        known = self._known
+        pending = self._pending
+        align_pending = self._align_pending
+        if op.kind in ("blank", "comment"):
+            out.append(op)
+            return self._release()
+        name = op.name
+        if op.kind != "call" or not op.literal or op.source[:1].isspace():
+            known.clear()
+            pending.clear()
+            align_pending.clear()
+            out.append(op)
+            return self._release()
+        if name == "insert_text" and op.args == ("",) and not op.kwargs:
+            self._drop("empty_text")
+            return self._release()
+        if name in _CHAR_SETTERS:
+            key = _REMOVED_KEYS[name]
+            value = _setter_value(op)
+            prev = pending.pop(name, None)
+            if prev is not None:
+                # Nothing typed since the previous setter: it has no effect of its own.
+                idx, prev_value, known_before = prev
+                out[idx] = None
+                self._holes = True
+                self._drop(key)
+                if known_before is None:
+                    known.pop(name, None)
+                else:
+                    known[name] = known_before
+                if value is _TOGGLE and name == "set_underline":
+                    if prev_value is _TOGGLE:
+                        self._drop(key)  # toggle + toggle
+                        return self._release()
+                    value = not prev_value
+                    op = op.reparse(f"{op.indent}set_underline({value!r})")
+            if value is _TOGGLE and name == "set_underline":
+                current = known.get(name)
+                pending[name] = (len(out), _TOGGLE, current)
+                if current is None:
+                    known.pop(name, None)
+                else:
+                    known[name] = not current
+                out.append(op)
+                return []
+            if value is not _TOGGLE and known.get(name) == value:
+                self._drop(key)
+                return self._release()
+            pending[name] = (len(out), value, known.get(name))
+            if value is _TOGGLE:
+                known.pop(name, None)
+            else:
+                known[name] = value
+            out.append(op)
+            return []
+        if name in _ALIGN_SETTERS:
+            if name in align_pending:
+                self._drop("align")
+                return self._release()
+            align_pending.add(name)
+            out.append(op)
+            return self._release()
+        if name in _NEUTRAL_CALLS:
+            out.append(op)
+            return self._release()
+        if name in _TYPING_CALLS:
+            pending.clear()
+            align_pending.clear()
+            out.append(op)
+            return self._release()
+        # Equations, cursor moves (templates, placeholders, boxes, tables) and anything unknown.
+        known.clear()
+        pending.clear()
+        align_pending.clear()
+        out.append(op)
+        return self._release()
+
+
+# --------------------------------------------------------------------------
+# Streaming: normalize + peephole while the script is still arriving
+# --------------------------------------------------------------------------
+
+# Rules that decide from the whole script (dual templates, header <보기> order,
+# unused &&&): once an op they look at appears, the rest waits for the end.
+_WHOLE_SCRIPT_SOURCES = ("insert_template(", "focus_placeholder(", "insert_box", "insert_view_box", "exit_box")
+
+
+def _whole_script_rule(op: Op) -> Optional[str]:
+    if any(needle in op.source for needle in _WHOLE_SCRIPT_SOURCES):
+        return "normalize_placeholders"
+    if _is_box_item(op) or _is_choice(op):
+        return "fix_header_view_box_order"
+    return None
+
+
+def _is_score(op: Op) -> bool:
+    if op.name not in _TEXT_CALLS or op.source[:1].isspace():
+        return False
+    score = op.str_arg
+    return score is not None and _SCORE_RE.fullmatch(score) is not None
+
+
+def _is_tab_text(op: Op) -> bool:
+    return op.name == "insert_text" and op.first_raw == "\\t" and op.source.strip()[-1:] == ")"
+
+
+class StreamNormalizer:
+    """
+    prepare_source + parse + normalize + peephole for a script that arrives a
+    few lines at a time (e.g. while the model is still writing it). feed()
+    returns the ops no later text can change; finish() returns the rest. The
+    result is the same op list compile gives for the whole script.
+
+    The passes look at the whole op list, so the stream is cut into sections
+    that every pass treats independently, and each section is normalized when
+    it is closed. A section is closed in front of the next plain op (not a
+    paragraph, score line or blank) unless:
+    - an op a whole-script rule looks at was seen (templates, placeholders,
+      boxes, <보기> items, choices): everything after it waits for the end;
+    - the section ends with insert_text('\\t') (sanitize_tabs needs the next
+      op) or a score line still waiting for its blank line.
+    Ops are final one op later at best: a score line may still pull a
+    paragraph break in front of it (ensure_score_right_align).
+
+    `lookahead` records, per rule, the most ops it kept waiting (peephole:
+    setters waiting for typed text); `held_to_end` names the rule that made
+    the stream wait for the end, if any. Input lines are dedented by the first
+    line's indentation (prepare_source uses the common one).
+    """
+
+    def __init__(
+        self, removed: Optional[Dict[str, int]] = None, timings: Optional[Dict[str, float]] = None
+    ) -> None:
+        self._tokenizer = Tokenizer()
+        self._peephole = Peephole(removed)
+        self._timings = timings
+        self._pending: List[Op] = []
+        self._reasons: set = set()
+        self._score_open = False
+        self._tab_last = False
+        self.held_to_end: Optional[str] = None
+        self.lookahead: Dict[str, int] = {}
+        # line cleanup state (prepare_source, one line at a time)
+        self._started = False
+        self._fenced = False
+        self._strip_next = False
+        self._margin = ""
+        self._held_lines: List[str] = []
+
+    def feed(self, text: str) -> List[Op]:
+        """Add one or more whole lines (the final newline is implied)."""
+        lines = self._clean(text)
+        if not lines:
+            return []
+        return self._push(self._timed("parse", self._tokenizer.feed, "\n".join(lines) + "\n"))
+
+    def finish(self) -> List[Op]:
+        out = self._push(self._timed("parse", self._tokenizer.close))
+        if self._pending:
+            if self.held_to_end:
+                self._reasons = {self.held_to_end}
+            self._close(out)
+        out.extend(self._timed("peephole", self._peephole.finish))
+        return out
+
+    def _timed(self, name: str, fn: Callable[..., Any], *args: Any) -> Any:
+        if self._timings is None:
+            return fn(*args)
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._timings[name] = self._timings.get(name, 0.0) + time.perf_counter() - started
+
+    def _clean(self, text: str) -> List[str]:
+        text = text.replace("\r\n", "\n").replace("\r", "\n").replace("\u2028", "\n").replace("\u2029", "\n")
+        if text.endswith("\n"):
+            text = text[:-1]
+        kept: List[str] = []
+        for line in text.split("\n"):
+            stripped = line.strip()
+            if not self._started:
+                if not stripped:
+                    continue
+                if not self._fenced:
+                    self._margin = line[: len(line) - len(line.lstrip())]
+                    if stripped.startswith("```"):
+                        self._fenced = True
+                        self._strip_next = True
+                        continue
+                self._started = True
+            if stripped in ("[CODE]", "[/CODE]", "CODE"):
+                continue
+            if self._margin and line.startswith(self._margin):
+                line = line[len(self._margin) :]
+            if self._strip_next:
+                line = line.lstrip()
+                self._strip_next = False
+            if not stripped:
+                # Blank lines (and a closing fence) count only if more text follows.
+                self._held_lines.append(line)
+                continue
+            if self._fenced and stripped == "```":
+                kept.extend(self._held_lines)
+                self._held_lines = [line]
+                continue
+            kept.extend(self._held_lines)
+            self._held_lines = []
+            kept.append(line)
+        return kept
+
+    def _push(self, ops: List[Op]) -> List[Op]:
+        out: List[Op] = []
+        for op in ops:
+            for _name, transform in PASSES[:PER_OP_PASSES]:
+                op = transform([op])[0]
+            if self.held_to_end is None and self._pending and self._can_close(op):
+                self._close(out)
+            self._pending.append(op)
+            if self.held_to_end is None:
+                self.held_to_end = _whole_script_rule(op)
+            if _is_score(op):
+                self._score_open = True
+            elif not op.blank:
+                self._score_open = False
+                self._tab_last = _is_tab_text(op)
+        return out
+
+    def _can_close(self, op: Op) -> bool:
+        ok = True
+        if _is_para(op) or op.bare("insert_small_paragraph") or _is_score(op) or self._score_open:
+            self._reasons.add("ensure_score_right_align")
+            ok = False
+        if self._tab_last:
+            self._reasons.add("sanitize_tabs")
+            ok = False
+        if _whole_script_rule(op) is not None:
+            ok = False
+        return ok
+
+    def _close(self, out: List[Op]) -> None:
+        held = len(self._pending)
+        for rule in self._reasons or ("ensure_score_right_align",):
+            self.lookahead[rule] = max(self.lookahead.get(rule, 0), held)
+        self._reasons = set()
+        section = normalize(self._pending, self._timings, PASSES[PER_OP_PASSES:])
+        self._pending = []
+        started = time.perf_counter() if self._timings is not None else 0.0
+        peephole = self._peephole
+        most = self.lookahead.get("peephole", 0)
+        for op in section:
+            out.extend(peephole.feed(op))
+            if peephole.held > most:
+                most = peephole.held
+        if most:
+            self.lookahead["peephole"] = most
+        if self._timings is not None:
+            self._timings["peephole"] = self._timings.get("peephole", 0.0) + time.perf_counter() - started
+
+
+def compile_script(script: str) -> List[Op]:
+    """prepare_source + parse + every normalization pass."""
+    return normalize(parse(prepare_source(script)))
@@ -0,0 +1,198 @@
+"""
+Wall-time profile of ScriptRunner: every stage (parse, each normalization
+pass, peephole, ast, execute) and every controller call.
+
+ScriptProfiler is a `timings` dict, so it goes wherever ScriptRunner takes
+one: stage totals add up as before, and each update is also kept as a span.
+When execute() or run_stream() get a ScriptProfiler they also time each
+controller call, keyed by function name and argument size (calls made by the
+fallback parser are only covered by the "execute" stage). Text the controller
+buffered for write-combining and types inside a later call shows up as a
+"flush" call nested in it; summary() counts each call's own time only, so the
+flush is not charged to e.g. insert_equation. Without a profiler the hot path
+is unchanged: execute() does a single isinstance check.
+
+    profiler = ScriptProfiler()
+    ScriptRunner(controller).run(script, timings=profiler)
+    print(profiler.table())
+    profiler.write_chrome_trace("trace.json")  # chrome://tracing, Perfetto
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+# Upper bounds (characters of all arguments) of the per-call size buckets.
+SIZE_BUCKETS = (16, 64, 256, 1024)
+_PREVIEW_CHARS = 40
+
+
+@dataclass(frozen=True)
+class Span:
+    """One stage or controller call; times in perf_counter seconds."""
+
+    category: str  # "stage" | "call"
+    name: str
+    start: float
+    duration: float
+    thread: int
+    size: int = 0  # argument characters (calls only)
+    preview: str = ""
+    own: float = -1.0  # duration minus nested calls (calls only; -1 = duration)
+
+    @property
+    def own_duration(self) -> float:
+        return self.duration if self.own < 0 else self.own
+
+
+def arg_size(args: tuple, kwargs: dict) -> int:
+    """Characters in a call's arguments: strings as they are, anything else as repr()."""
+    size = 0
+    for value in (*args, *kwargs.values()):
+        size += len(value) if isinstance(value, str) else len(repr(value))
+    return size
+
+
+def size_bucket(size: int) -> str:
+    if size == 0:
+        return "0"
+    lower = 1
+    for upper in SIZE_BUCKETS:
+        if size <= upper:
+            return f"{lower}-{upper}"
+        lower = upper + 1
+    return f">{SIZE_BUCKETS[-1]}"
+
+
+def _preview(args: tuple) -> str:
+    for value in args:
+        if isinstance(value, str):
+            return value if len(value) <= _PREVIEW_CHARS else value[:_PREVIEW_CHARS] + "..."
+    return ""
+
+
+def _wall_s(spans: List[Span]) -> float:
+    if not spans:
+        return 0.0
+    return max(s.start + s.duration for s in spans) - min(s.start for s in spans)
+
+
+class ScriptProfiler(dict):
+    """A `timings` dict that also keeps every stage and controller call as a Span."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.origin = time.perf_counter()
+        self._stages: List[Span] = []
+        # (name, start, duration, own, thread, args, kwargs); sized when reported
+        self._calls: List[Tuple[str, float, float, float, int, tuple, dict]] = []
+        # seconds spent in wrapped calls made from inside the running one
+        self._nested = [0.0]
+
+    def __setitem__(self, key: str, value: float) -> None:
+        elapsed = value - self.get(key, 0.0)
+        super().__setitem__(key, value)
+        if elapsed > 0:
+            # Stages store their running total right after they finish.
+            self._stages.append(Span("stage", key, time.perf_counter() - elapsed, elapsed, threading.get_ident()))
+
+    def wrap(self, name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """`fn` with each call recorded as a span."""
+        record = self._calls.append
+        clock = time.perf_counter
+        get_ident = threading.get_ident
+        nested = self._nested
+
+        def _call(*args: Any, **kwargs: Any) -> Any:
+            outer = nested[0]
+            nested[0] = 0.0
+            started = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = clock() - started
+                own = elapsed - nested[0]
+                nested[0] = outer + elapsed
+                record((name, started, elapsed, own, get_ident(), args, kwargs))
+
+        return _call
+
+    @property
+    def spans(self) -> List[Span]:
+        """Stages and calls in the order they finished within each kind."""
+        calls = [
+            Span("call", name, start, duration, thread, arg_size(args, kwargs), _preview(args), own)
+            for name, start, duration, own, thread, args, kwargs in self._calls
+        ]
+        return self._stages + calls
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """
+        One row per stage and per (call name, argument size bucket), slowest
+        first: count, total / mean / max ms and share of the profiled wall time.
+        Calls count their own time, without the calls nested in them.
+        """
+        groups: Dict[Tuple[str, str, str], List[float]] = {}
+        spans = self.spans
+        for span in spans:
+            bucket = size_bucket(span.size) if span.category == "call" else ""
+            groups.setdefault((span.category, span.name, bucket), []).append(span.own_duration)
+        wall = _wall_s(spans)
+        rows = []
+        for (category, name, bucket), durations in groups.items():
+            total = sum(durations)
+            rows.append(
+                {
+                    "category": category,
+                    "name": name,
+                    "size": bucket,
+                    "count": len(durations),
+                    "total_ms": round(total * 1000.0, 3),
+                    "mean_ms": round(total * 1000.0 / len(durations), 3),
+                    "max_ms": round(max(durations) * 1000.0, 3),
+                    "share": round(total / wall, 4) if wall else 0.0,
+                }
+            )
+        rows.sort(key=lambda row: row["total_ms"], reverse=True)
+        return rows
+
+    def wall_s(self) -> float:
+        return _wall_s(self.spans)
+
+    def table(self, limit: int = 30) -> str:
+        """summary() as fixed-width text (calls are nested in the execute stage)."""
+        lines = [f"{'kind':<6} {'name':<32} {'size':>9} {'count':>7} {'total ms':>10} {'mean ms':>9} {'max ms':>9} {'share':>6}"]
+        for row in self.summary()[:limit]:
+            lines.append(
+                f"{row['category']:<6} {row['name']:<32} {row['size']:>9} {row['count']:>7} "
+                f"{row['total_ms']:>10.2f} {row['mean_ms']:>9.3f} {row['max_ms']:>9.2f} {row['share']:>6.1%}"
+            )
+        lines.append(f"wall {self.wall_s() * 1000.0:.2f} ms, {len(self._stages) + len(self._calls)} spans")
+        return "\n".join(lines)
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Trace Event Format ("X" complete events, microseconds since `origin`)."""
+        pid = os.getpid()
+        events = []
+        for span in self.spans:
+            event: Dict[str, Any] = {
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": round((span.start - self.origin) * 1e6, 3),
+                "dur": round(span.duration * 1e6, 3),
+                "pid": pid,
+                "tid": span.thread,
+            }
+            if span.category == "call":
+                event["args"] = {"size": span.size, "text": span.preview}
+            events.append(event)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str | Path) -> None:
+        Path(path).write_text(json.dumps(self.chrome_trace(), ensure_ascii=False), encoding="utf-8")
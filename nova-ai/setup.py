@@ -28,11 +28,19 @@ setup(
     py_modules=[
         "ai_client",
         "app",
+        "debug_log",
         "equation",
         "hwp_controller",
+        "hwp_recorder",
+        "layout_batch",
+        "layout_cache",
         "layout_detector",
+        "ocr_context",
         "ocr_pipeline",
         "prompt_loader",
+        "script_ast",
+        "script_ir",
+        "script_profile",
         "script_runner",
         "gui_app",
     ],